@@ -0,0 +1,114 @@
+import argparse
+import functools
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import rag_backend.services.embedding_service as embedding_service
+from rag_backend.benchmarks.fakes import *
+from rag_backend.benchmarks.fixtures import *
+from rag_backend.services.embedding_pool_service import *
+
+# Chunks/sec for document embedding in-process versus through the worker pool,
+# with several callers at once as during an upload burst. The hash embedder
+# stands in for the model unless --model is given, with --embed-ms-per-text
+# simulating its cost. The run ends by killing a worker mid-load to check that
+# the pool restarts it without failing callers.
+
+
+def _texts(count: int, seed: int = 0):
+    return paragraphs(random.Random(seed), count, words=90)
+
+
+def _throughput(embed_fn, texts, callers: int, batch: int):
+    batches = [texts[i : i + batch] for i in range(0, len(texts), batch)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        results = list(pool.map(embed_fn, batches))
+    elapsed = time.perf_counter() - started
+    return np.concatenate(results), round(len(texts) / elapsed, 1)
+
+
+def _kill_one_worker(pool: Embedding_Pool, delay: float):
+    time.sleep(delay)
+    worker = pool._workers[0]
+    os.kill(worker.process.pid, 9)
+    return worker.process.pid
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare in-process embedding with the embedding worker pool."
+    )
+    parser.add_argument("--texts", type=int, default=4096)
+    parser.add_argument("--batch", type=int, default=256, help="Texts per call.")
+    parser.add_argument("--callers", type=int, default=4)
+    parser.add_argument(
+        "--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2)
+    )
+    parser.add_argument("--embed-ms-per-text", type=float, default=0.5)
+    parser.add_argument(
+        "--model", action="store_true", help="Use the real fastembed model."
+    )
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    args = parser.parse_args()
+
+    texts = _texts(args.texts)
+    if args.model:
+        factory = load_text_embedding
+    else:
+        factory = functools.partial(
+            Hash_Embedding, EMBEDDING_DIM, args.embed_ms_per_text
+        )
+        embedding_service._engine = factory()
+    results = {"texts": args.texts, "batch": args.batch, "callers": args.callers}
+
+    expected, results["in_process_chunks_per_s"] = _throughput(
+        Embedding_Service.embed_documents, texts, args.callers, args.batch
+    )
+    print(f"in-process      {results['in_process_chunks_per_s']:>10} chunks/s")
+
+    pool = Embedding_Pool(
+        core_groups=default_core_groups(args.workers), engine_factory=factory
+    )
+    started = time.perf_counter()
+    pool.start()
+    results["pool_startup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    try:
+        vectors, results["pool_chunks_per_s"] = _throughput(
+            pool.embed_documents, texts, args.callers, args.batch
+        )
+        print(
+            f"pool ({args.workers} workers) {results['pool_chunks_per_s']:>10} "
+            f"chunks/s, startup {results['pool_startup_ms']} ms"
+        )
+        results["pool_matches_in_process"] = bool(
+            np.allclose(vectors, expected, atol=1e-5)
+        )
+
+        with ThreadPoolExecutor(max_workers=1) as killer:
+            killed = killer.submit(_kill_one_worker, pool, 0.05)
+            vectors, _ = _throughput(
+                pool.embed_documents, texts, args.callers, args.batch
+            )
+            killed.result()
+        results["survived_worker_kill"] = bool(
+            np.allclose(vectors, expected, atol=1e-5)
+        )
+        deadline = time.time() + EMBEDDING_POOL_START_TIMEOUT_SECONDS
+        while pool.stats()["restarts"] < 1 and time.time() < deadline:
+            time.sleep(0.1)
+        results["pool"] = pool.stats()
+    finally:
+        pool.stop()
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import itertools
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+from typing import Iterator, List
+
+import numpy as np
+
+# In-process stand-ins for Supabase and the embedding model, so the benchmark
+# suite runs without network access. They implement only the calls the
+# services make.
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+        self.error = None
+
+
+class _Query:
+    def __init__(self, table: "_Table"):
+        self._table = table
+        self._action = "select"
+        self._values = None
+        self._columns = "*"
+        self._filters = []
+        self._order = None
+        self._limit = None
+
+    def select(self, columns="*"):
+        self._columns = columns
+        return self
+
+    def insert(self, values):
+        self._action, self._values = "insert", values
+        return self
+
+    def update(self, values):
+        self._action, self._values = "update", values
+        return self
+
+    def delete(self):
+        self._action = "delete"
+        return self
+
+    def eq(self, column, value):
+        self._filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self._filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def lt(self, column, value):
+        self._filters.append(lambda row: row.get(column) < value)
+        return self
+
+    def order(self, column, desc=False):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def _project(self, row):
+        if self._columns == "*":
+            return dict(row)
+        return {column: row.get(column) for column in self._columns.split(",")}
+
+    def execute(self):
+        with self._table.lock:
+            if self._action == "insert":
+                return _Response(self._table.insert(self._values))
+            matched = [
+                row
+                for row in self._table.rows.values()
+                if all(check(row) for check in self._filters)
+            ]
+            if self._action == "update":
+                for row in matched:
+                    row.update(self._values)
+                return _Response([dict(row) for row in matched])
+            if self._action == "delete":
+                for row in matched:
+                    del self._table.rows[row["id"]]
+                return _Response([dict(row) for row in matched])
+            if self._order is not None:
+                column, desc = self._order
+                matched.sort(key=lambda row: row.get(column), reverse=desc)
+            if self._limit is not None:
+                matched = matched[: self._limit]
+            return _Response([self._project(row) for row in matched])
+
+
+class _Table:
+    def __init__(self):
+        self.rows = {}
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def insert(self, values):
+        inserted = []
+        for value in values if isinstance(values, list) else [values]:
+            row = {"id": next(self._ids), "created_at": time.time(), **value}
+            self.rows[row["id"]] = row
+            inserted.append(dict(row))
+        return inserted
+
+
+class _Bucket:
+    def __init__(self, name: str, objects: dict):
+        self.name = name
+        self.objects = objects
+
+    def upload(self, path, file, file_options=None):
+        self.objects[path] = file.read() if hasattr(file, "read") else file
+        return SimpleNamespace(path=path, full_path=f"{self.name}/{path}")
+
+    def remove(self, paths):
+        return [{"name": path} for path in paths if self.objects.pop(path, None)]
+
+    def create_signed_url(self, path, expires_in, options=None):
+        url = f"memory://{self.name}/{path}?expires_in={expires_in}"
+        return {"signedURL": url, "signedUrl": url}
+
+    def create_signed_urls(self, paths, expires_in, options=None):
+        return [
+            {"path": path, "error": None, **self.create_signed_url(path, expires_in)}
+            for path in paths
+        ]
+
+    def get_public_url(self, path, options=None):
+        return f"memory://{self.name}/{path}"
+
+
+class _Storage:
+    def __init__(self):
+        self._buckets = {}
+
+    def from_(self, bucket: str) -> _Bucket:
+        return _Bucket(bucket, self._buckets.setdefault(bucket, {}))
+
+
+class _Auth:
+    def __init__(self, users: dict):
+        self._users = users
+
+    def get_user(self, token):
+        user = self._users.get(token)
+        return SimpleNamespace(user=user)
+
+
+class Fake_Supabase:
+    # one object serves as database, storage and auth client alike
+    def __init__(self):
+        self._tables = {}
+        self.storage = _Storage()
+        self.users = {}
+        self.auth = _Auth(self.users)
+
+    def table(self, name: str) -> _Query:
+        return _Query(self._tables.setdefault(name, _Table()))
+
+    def add_user(self, token: str, user_id: str):
+        self.users[token] = SimpleNamespace(
+            id=user_id,
+            email=f"{user_id}@bench.local",
+            role="authenticated",
+            app_metadata={},
+            user_metadata={},
+            created_at=None,
+            aud="authenticated",
+        )
+
+
+class Hash_Embedding:
+    # bag-of-words feature hashing: deterministic, and texts sharing words
+    # still land close together, so retrieval and the answer cache behave
+    # roughly as they would with the real model
+    # threads is accepted, and ignored, so it can stand in for TextEmbedding
+    # inside the embedding worker pool
+    def __init__(self, dim: int, ms_per_text: float = 0.0, threads: int = None):
+        self.dim = dim
+        self.ms_per_text = ms_per_text
+
+    def embed(self, texts: List[str], batch_size: int = 64) -> Iterator[np.ndarray]:
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start : start + batch_size]
+            if self.ms_per_text:
+                time.sleep(self.ms_per_text * len(batch) / 1000)
+            for text in batch:
+                vector = np.zeros(self.dim, dtype=np.float32)
+                for token in text.lower().split():
+                    digest = zlib.crc32(token.encode("utf-8"))
+                    vector[digest % self.dim] += 1 if digest & 1 << 31 else -1
+                norm = np.linalg.norm(vector)
+                yield vector / norm if norm else vector
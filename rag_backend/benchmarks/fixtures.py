@@ -0,0 +1,127 @@
+import os
+import random
+from typing import Dict, List
+
+from docx import Document
+from PIL import Image, ImageDraw, ImageFont
+
+# Synthetic documents for the benchmark suite, generated on demand so the
+# repository does not carry binary fixtures. Every format gets the same kind
+# of prose, so per-format numbers are comparable.
+
+WORDS = (
+    "retrieval augmented generation combines a search index with a language "
+    "model the index stores document chunks as vectors and the model answers "
+    "questions using the most similar chunks as context quarterly revenue grew "
+    "while operating costs fell the contract renews every year unless either "
+    "party gives notice the patient reported mild symptoms after treatment"
+).split()
+
+PDF_MIME_TYPE = "application/pdf"
+WORD_MIME_TYPE = (
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+)
+
+
+def paragraphs(rng: random.Random, count: int, words: int = 80) -> List[str]:
+    return [" ".join(rng.choice(WORDS) for _ in range(words)) for _ in range(count)]
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: List[List[str]]):
+    # a minimal text PDF: one Helvetica content stream per page
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for lines in pages:
+        content = ["BT /F1 10 Tf 12 TL 50 760 Td"]
+        content += [f"({_pdf_escape(line)}) Tj T*" for line in lines]
+        content.append("ET")
+        stream = "\n".join(content).encode("latin-1")
+        objects.append(
+            b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        )
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (len(objects))
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objects) + 1, xref)
+        )
+
+
+def _wrap(text: str, width: int = 95) -> List[str]:
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}".strip()
+    return lines + ([line] if line else [])
+
+
+def make_fixtures(directory: str, scale: int = 1, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed)
+    fixtures = []
+
+    text_path = os.path.join(directory, "notes.txt")
+    with open(text_path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(paragraphs(rng, 200 * scale)))
+    fixtures.append(
+        {"name": "notes.txt", "path": text_path, "mime_type": "text/plain"}
+    )
+
+    pdf_path = os.path.join(directory, "report.pdf")
+    pages = []
+    for _ in range(20 * scale):
+        lines = []
+        for paragraph in paragraphs(rng, 5):
+            lines += _wrap(paragraph)
+        pages.append(lines[:55])
+    write_pdf(pdf_path, pages)
+    fixtures.append(
+        {"name": "report.pdf", "path": pdf_path, "mime_type": PDF_MIME_TYPE}
+    )
+
+    docx_path = os.path.join(directory, "contract.docx")
+    document = Document()
+    for paragraph in paragraphs(rng, 150 * scale):
+        document.add_paragraph(paragraph)
+    document.save(docx_path)
+    fixtures.append(
+        {"name": "contract.docx", "path": docx_path, "mime_type": WORD_MIME_TYPE}
+    )
+
+    image_path = os.path.join(directory, "scan.png")
+    image = Image.new("L", (2550, 3300), 255)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=36)
+    y = 150
+    for line in _wrap(" ".join(paragraphs(rng, 6)), width=70):
+        draw.text((150, y), line, fill=0, font=font)
+        y += 60
+    image.save(image_path, dpi=(300, 300))
+    fixtures.append({"name": "scan.png", "path": image_path, "mime_type": "image/png"})
+    return fixtures
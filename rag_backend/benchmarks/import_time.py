@@ -0,0 +1,90 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Cold-start guard: imports rag_backend.main in a fresh interpreter and fails
+# when it takes longer than the budget or loads a module that the services
+# are supposed to import on first use. fastembed, onnxruntime and PIL are not
+# listed because qdrant_client imports them itself when they are installed.
+DEFERRED_MODULES = (
+    "docx",
+    "google.generativeai",
+    "pypdf",
+    "pypdfium2",
+    "pytesseract",
+)
+
+IMPORT_BUDGET_MS = 3000
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import rag_backend.main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def measure(env=None) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report["slowest"] = _slowest(result.stderr)
+    return report
+
+
+def _slowest(importtime_log: str, top: int = 10):
+    # "import time: self [us] | cumulative | imported package" per line; a
+    # package's first import carries the cost of everything it pulls in
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        name = name.strip()
+        if "." not in name and name != "rag_backend":
+            rows.append((int(cumulative) / 1000, name))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check the import time of rag_backend.main against a budget."
+    )
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3, help="Best of N runs.")
+    args = parser.parse_args()
+
+    env = dict(os.environ, LOG_LEVEL="WARNING")
+    reports = [measure(env) for _ in range(args.runs)]
+    best = min(reports, key=lambda report: report["seconds"])
+    elapsed_ms = round(best["seconds"] * 1000, 1)
+
+    print(f"import rag_backend.main: {elapsed_ms} ms (best of {args.runs})")
+    print("slowest top-level imports:")
+    for cumulative_ms, name in best["slowest"]:
+        print(f"  {cumulative_ms:>9.1f} ms  {name}")
+
+    loaded = set(best["modules"])
+    eager = [name for name in DEFERRED_MODULES if name in loaded]
+    failed = False
+    if eager:
+        print(f"\n❌ Imported at startup but should be lazy: {', '.join(eager)}")
+        failed = True
+    if elapsed_ms > args.budget_ms:
+        print(f"\n❌ Over the {args.budget_ms:g} ms import budget.")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print(f"\n✅ Within the {args.budget_ms:g} ms budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+import rag_backend.services.ocr_service as ocr_service
+from PIL import Image, ImageDraw, ImageFont
+from rag_backend.parsers import *
+
+# Pages/sec for scanned (image-only) PDFs, generated here so the numbers are
+# reproducible without shipping fixture files. Each setting runs cold, with an
+# empty page cache, and then warm.
+
+WORDS = (
+    "invoice total amount payment due date account number customer service "
+    "report quarterly revenue growth margin analysis summary section table "
+    "policy coverage claim insured premium contract signature witness page"
+).split()
+
+
+def make_scanned_pdf(path, pages, dpi, rng):
+    width, height = int(8.5 * dpi), int(11 * dpi)
+    font = ImageFont.load_default(size=dpi // 8)
+    line_height = dpi // 5
+    images, truth = [], []
+    for _ in range(pages):
+        image = Image.new("L", (width, height), 255)
+        draw = ImageDraw.Draw(image)
+        words = []
+        for row in range(dpi // 2, height - dpi // 2, line_height):
+            line = " ".join(rng.choice(WORDS) for _ in range(8))
+            draw.text((dpi // 2, row), line, fill=0, font=font)
+            words.extend(line.split())
+        # scanner noise and a slightly grey background
+        pixels = np.asarray(image, dtype=np.int16)
+        noise = np.random.default_rng(rng.getrandbits(32)).normal(0, 18, pixels.shape)
+        pixels = np.clip(pixels - 25 + noise, 0, 255).astype(np.uint8)
+        images.append(Image.fromarray(pixels))
+        truth.append(words)
+    images[0].save(path, save_all=True, append_images=images[1:], resolution=dpi)
+    return truth
+
+
+def make_fixtures(directory, documents, pages, dpi):
+    rng = random.Random(0)
+    fixtures = []
+    for i in range(documents):
+        path = os.path.join(directory, f"scan-{i}.pdf")
+        fixtures.append((path, make_scanned_pdf(path, pages, dpi, rng)))
+    return fixtures
+
+
+def run_setting(fixtures, workers, cache_dir):
+    ocr_service.OCR_WORKERS = workers
+    ocr_service.OCR_CACHE_DIR = cache_dir
+    pages = 0
+    found = expected = 0
+    started = time.perf_counter()
+    for path, truth in fixtures:
+        text = "".join(Parsers.pdf_pages_from_path(path)).lower().split()
+        pages += len(truth)
+        recognised = set(text)
+        for words in truth:
+            expected += len(words)
+            found += sum(word in recognised for word in words)
+    elapsed = time.perf_counter() - started
+    return {
+        "pages": pages,
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(pages / elapsed, 2),
+        "word_recall": round(found / max(1, expected), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR throughput on scanned PDFs.")
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument(
+        "--source-dpi",
+        type=int,
+        default=400,
+        help="Scan resolution of the fixtures; above OCR_TARGET_DPI exercises "
+        "downscaling.",
+    )
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}")
+    parser.add_argument("--json", help="Also write the results to this path.")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="ocr-bench-") as directory:
+        fixtures = make_fixtures(directory, args.documents, args.pages, args.source_dpi)
+        print(
+            f"{'workers':>8}{'cache':>7}{'pages':>7}{'seconds':>10}"
+            f"{'pages/s':>10}{'recall':>9}"
+        )
+        for workers in sorted({int(x) for x in args.workers.split(",")}):
+            cache_dir = tempfile.mkdtemp(dir=directory, prefix="cache-")
+            for cache in ("cold", "warm"):
+                row = {
+                    "workers": workers,
+                    "cache": cache,
+                    **run_setting(fixtures, workers, cache_dir),
+                }
+                results.append(row)
+                print(
+                    f"{workers:>8}{cache:>7}{row['pages']:>7}{row['seconds']:>10}"
+                    f"{row['pages_per_second']:>10}{row['word_recall']:>9}"
+                )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "target_dpi": ocr_service.OCR_TARGET_DPI,
+                    "source_dpi": args.source_dpi,
+                    "pdfium": ocr_service.PDFIUM_AVAILABLE,
+                    "rows": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+# Everything below runs offline: Supabase, the embedding model and the LLM are
+# replaced with in-process stand-ins, and vectors go to Qdrant's in-memory
+# mode. Settings the services read at import time are fixed first.
+_workdir = tempfile.mkdtemp(prefix="rag-bench-")
+BENCH_JWT_SECRET = "benchmark-secret"
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ["SUPABASE_JWT_SECRET"] = BENCH_JWT_SECRET
+os.environ["AUTH_STRICT_REMOTE"] = "false"
+# the in-process qdrant client is not thread-safe, so one upsert at a time
+os.environ["UPSERT_MAX_IN_FLIGHT"] = "1"
+os.environ.setdefault("JOBS_DB_PATH", os.path.join(_workdir, "jobs.sqlite3"))
+os.environ.setdefault("OCR_CACHE_DIR", os.path.join(_workdir, "ocr_cache"))
+os.environ.setdefault("CHUNK_STORE_ENABLED", "true")
+os.environ.setdefault("CHUNK_STORE_PATH", os.path.join(_workdir, "chunks.sqlite3"))
+# per-request access logs would drown out the report
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+import rag_backend.services.embedding_service as embedding_service  # noqa: E402
+from jose import jwt  # noqa: E402
+from qdrant_client import QdrantClient  # noqa: E402
+from rag_backend.benchmarks.fakes import *  # noqa: E402
+from rag_backend.benchmarks.fixtures import *  # noqa: E402
+from rag_backend.main import *  # noqa: E402
+from rag_backend.services.parsing_service import extract_text_to_file  # noqa: E402
+
+BENCH_USER_ID = "00000000-0000-0000-0000-00000000b3c4"
+QUESTIONS = (
+    "how does retrieval augmented generation use the index",
+    "what happened to quarterly revenue and operating costs",
+    "when does the contract renew",
+    "what symptoms did the patient report after treatment",
+    "how are document chunks stored",
+)
+
+
+def _percentile(values, q):
+    return round(float(np.percentile(values, q)), 3) if values else None
+
+
+def _timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def _bench_token() -> str:
+    return jwt.encode(
+        {
+            "sub": BENCH_USER_ID,
+            "aud": "authenticated",
+            "role": "authenticated",
+            "exp": int(time.time()) + 3600,
+        },
+        BENCH_JWT_SECRET,
+        algorithm="HS256",
+    )
+
+
+def _vector_store(backend: str):
+    if backend == "memory":
+        vdb = QdrantClient(":memory:")
+    else:
+        vdb = Local_Vector_Store(os.path.join(_workdir, "vectors"))
+    bootstrap_vector_schema(vdb)
+    return vdb
+
+
+def ingest_fixture(vdb, db, fixture):
+    if fixture["mime_type"].startswith("image/") and not shutil.which("tesseract"):
+        return {"skipped": "tesseract is not installed"}
+    size = os.path.getsize(fixture["path"])
+    text_path = os.path.join(_workdir, fixture["name"] + ".txt")
+    # the same function the parsing pool runs, called in-process
+    _, parse_s = _timed(
+        extract_text_to_file, fixture["mime_type"], fixture["path"], text_path
+    )
+    chunks, chunk_s = _timed(
+        lambda: list(
+            Ingestion_Service.iter_chunks(Parsers.text_blocks_from_path(text_path))
+        )
+    )
+    embeddings, embed_s = _timed(Embedding_Service.embed_documents, chunks)
+    doc_id = File_Services.create_document(
+        db=db, user_id=BENCH_USER_ID, file_name=fixture["name"], file_size=size
+    )
+    _, upsert_s = _timed(
+        File_Services.store_embeddings,
+        chunks=chunks,
+        embeddings=embeddings,
+        vdb=vdb,
+        file_name=fixture["name"],
+        doc_id=doc_id,
+        user_id=BENCH_USER_ID,
+        doc_hash=fixture["name"],
+    )
+    os.remove(text_path)
+    return {
+        "bytes": size,
+        "chunks": len(chunks),
+        "parse_mb_per_s": round(size / 2**20 / parse_s, 3),
+        "chunk_chunks_per_s": round(len(chunks) / chunk_s, 1) if chunk_s else None,
+        "embed_chunks_per_s": round(len(chunks) / embed_s, 1) if embed_s else None,
+        "upsert_points_per_s": round(len(chunks) / upsert_s, 1) if upsert_s else None,
+        "parse_ms": round(parse_s * 1000, 3),
+        "chunk_ms": round(chunk_s * 1000, 3),
+        "embed_ms": round(embed_s * 1000, 3),
+        "upsert_ms": round(upsert_s * 1000, 3),
+    }
+
+
+async def ask_load(app, file_names, requests, concurrency, stream):
+    headers = {"Authorization": f"Bearer {_bench_token()}"}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def ask(client, i):
+        nonlocal errors
+        # a distinct suffix per request keeps the search and answer caches
+        # from serving the whole run
+        body = {
+            "question": f"{QUESTIONS[i % len(QUESTIONS)]} case {i}",
+            "file_names": file_names,
+            "chat_space": f"bench-{i % 8}",
+            "stream": stream,
+        }
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/ask", json=body, headers=headers)
+            await response.aread()
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        started = time.perf_counter()
+        await asyncio.gather(*(ask(c, i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "stream": stream,
+        "errors": errors,
+        "requests_per_s": round(requests / elapsed, 2),
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+        "answer_cache": answer_cache.stats(),
+    }
+
+
+def flatten(results) -> dict:
+    metrics = {}
+    for name, stats in results["ingestion"].items():
+        for key, value in stats.items():
+            if isinstance(value, (int, float)) and key not in ("bytes", "chunks"):
+                metrics[f"ingest.{name}.{key}"] = value
+    for key in ("requests_per_s", "p50_ms", "p95_ms", "p99_ms"):
+        metrics[f"ask.{key}"] = results["ask"][key]
+    return metrics
+
+
+def compare(metrics: dict, baseline: dict, tolerance: float):
+    regressions = []
+    print(f"\n{'metric':<44}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, current in sorted(metrics.items()):
+        previous = baseline.get(name)
+        if previous in (None, 0) or current is None:
+            continue
+        change = (current - previous) / previous
+        # latencies should go down, everything else is a rate
+        worse = change > tolerance if name.endswith("_ms") else change < -tolerance
+        flag = "  ✗" if worse else ""
+        print(f"{name:<44}{previous:>12}{current:>12}{change:>+10.1%}{flag}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+async def run(args):
+    embedding_service._engine = Hash_Embedding(EMBEDDING_DIM, args.embed_ms_per_text)
+    db = Fake_Supabase()
+    vdb = _vector_store(args.vector_backend)
+
+    ingestion = {}
+    fixtures_dir = os.path.join(_workdir, "fixtures")
+    os.makedirs(fixtures_dir, exist_ok=True)
+    for fixture in make_fixtures(fixtures_dir, scale=args.scale):
+        ingestion[fixture["name"]] = ingest_fixture(vdb, db, fixture)
+        print(f"ingest {fixture['name']:<16} {ingestion[fixture['name']]}")
+
+    file_names = [name for name, stats in ingestion.items() if "skipped" not in stats]
+    app.dependency_overrides[database] = lambda: db
+    app.dependency_overrides[storage] = lambda: db
+    app.dependency_overrides[vector_database] = lambda: vdb
+    await query_batcher.start()
+    try:
+        # one request first so import-time and first-call costs stay out
+        await ask_load(app, file_names, 1, 1, args.stream)
+        ask = await ask_load(
+            app, file_names, args.requests, args.concurrency, args.stream
+        )
+    finally:
+        await query_batcher.stop()
+        app.dependency_overrides.clear()
+    print(f"ask {ask}")
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "vector_backend": args.vector_backend,
+            "embedder": "hash",
+            "embed_ms_per_text": args.embed_ms_per_text,
+            "llm_first_token_ms": FAKE_LLM_FIRST_TOKEN_MS,
+            "scale": args.scale,
+        },
+        "ingestion": ingestion,
+        "ask": ask,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline ingestion and /ask benchmarks with local stand-ins."
+    )
+    parser.add_argument("--scale", type=int, default=1, help="Fixture size factor.")
+    parser.add_argument(
+        "--vector-backend", choices=("memory", "local"), default="memory"
+    )
+    parser.add_argument(
+        "--embed-ms-per-text",
+        type=float,
+        default=0.0,
+        help="Simulated embedding cost per chunk for the hash embedder.",
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--stream", action="store_true", help="Benchmark SSE /ask.")
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    parser.add_argument("--baseline", help="Compare against a previous --output.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.10,
+        help="Relative change counted as a regression when comparing.",
+    )
+    args = parser.parse_args()
+
+    try:
+        results = asyncio.run(run(args))
+        results["metrics"] = flatten(results)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)["metrics"]
+            regressions = compare(results["metrics"], baseline, args.tolerance)
+            if regressions:
+                print(f"\n❌ {len(regressions)} metrics regressed.")
+                sys.exit(1)
+            print("\n✅ No regressions against the baseline.")
+    finally:
+        shutil.rmtree(_workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
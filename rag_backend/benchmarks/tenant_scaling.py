@@ -0,0 +1,156 @@
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+from rag_backend.dependencies import *
+from rag_backend.services.embedding_service import *
+from rag_backend.services.file_services import *
+
+# Search latency for one tenant while the number of other tenants grows. With
+# tenant scoping the scoped column should stay flat; the unscoped column
+# (file_name filter only, the old behaviour) grows with the whole corpus.
+
+
+def _vector_store(backend: str):
+    if backend == "local":
+        return Local_Vector_Store(tempfile.mkdtemp(prefix="tenant-bench-"))
+    if backend == "memory":
+        return QdrantClient(":memory:")
+    return QdrantClient(url=backend, api_key=QDRANT_API_KEY)
+
+
+def _populate(vdb, rng, first_tenant, tenants, points_per_tenant, files_per_tenant):
+    for tenant in range(first_tenant, tenants):
+        user_id = f"tenant-{tenant}"
+        shard_key = Tenant_Service.ensure_shard(vdb, user_id)
+        # one batch at a time: the in-process qdrant client is not thread-safe
+        writer = Bulk_Upserter(vdb, shard_key=shard_key, wait=True, max_in_flight=1)
+        vectors = rng.standard_normal((points_per_tenant, EMBEDDING_DIM))
+        vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(
+            np.float32
+        )
+        chunks = [f"chunk {i}" for i in range(points_per_tenant)]
+        for file_index in range(files_per_tenant):
+            rows = slice(file_index, None, files_per_tenant)
+            writer.add(
+                File_Services.build_points(
+                    chunks=chunks[rows],
+                    embeddings=vectors[rows],
+                    file_name=f"file-{file_index}.pdf",
+                    doc_hash=f"{user_id}-{file_index}",
+                    chunk_hashes=[f"{i}" for i in range(points_per_tenant)][rows],
+                    doc_id=tenant * files_per_tenant + file_index,
+                    user_id=user_id,
+                )
+            )
+        writer.flush()
+
+
+def _latencies(vdb, rng, queries, query_filter, shard_key):
+    latencies = []
+    for _ in range(queries):
+        query = rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+        started = time.perf_counter()
+        vdb.search(
+            collection_name="user_docs",
+            query_vector=query.tolist(),
+            query_filter=query_filter,
+            limit=5,
+            search_params=Quantization_Service.search_params(),
+            shard_key_selector=shard_key,
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def _percentile(values, q):
+    return round(float(np.percentile(values, q)), 3)
+
+
+def run(backend, tenant_counts, points_per_tenant, files_per_tenant, queries):
+    vdb = _vector_store(backend)
+    bootstrap_vector_schema(vdb)
+    rng = np.random.default_rng(0)
+    file_names = [f"file-{i}.pdf" for i in range(files_per_tenant)]
+    file_condition = qmodels.FieldCondition(
+        key="file_name", match=qmodels.MatchAny(any=file_names)
+    )
+    rows = []
+    populated = 0
+    for tenants in tenant_counts:
+        _populate(vdb, rng, populated, tenants, points_per_tenant, files_per_tenant)
+        populated = tenants
+        user_id = "tenant-0"
+        scoped = _latencies(
+            vdb,
+            rng,
+            queries,
+            Tenant_Service.user_filter(user_id, [file_condition]),
+            Tenant_Service.shard_key(user_id),
+        )
+        unscoped = _latencies(
+            vdb, rng, queries, qmodels.Filter(must=[file_condition]), None
+        )
+        rows.append(
+            {
+                "tenants": tenants,
+                "points": tenants * points_per_tenant,
+                "scoped_p50_ms": _percentile(scoped, 50),
+                "scoped_p95_ms": _percentile(scoped, 95),
+                "unscoped_p50_ms": _percentile(unscoped, 50),
+                "unscoped_p95_ms": _percentile(unscoped, 95),
+            }
+        )
+        row = rows[-1]
+        print(
+            f"{row['tenants']:>8}{row['points']:>10}"
+            f"{row['scoped_p50_ms']:>12}{row['scoped_p95_ms']:>12}"
+            f"{row['unscoped_p50_ms']:>14}{row['unscoped_p95_ms']:>14}"
+        )
+    vdb.close()
+    return {
+        "backend": backend,
+        "tenancy": VECTOR_TENANCY,
+        "points_per_tenant": points_per_tenant,
+        "queries": queries,
+        "rows": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scoped vs unscoped search latency as the tenant count grows."
+    )
+    parser.add_argument(
+        "--backend",
+        default="local",
+        help="local, memory (unindexed, so it always scans) or a scratch Qdrant URL.",
+    )
+    parser.add_argument("--tenants", default="1,10,50,100")
+    parser.add_argument("--points-per-tenant", type=int, default=500)
+    parser.add_argument("--files-per-tenant", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--json", help="Also write the results to this path.")
+    args = parser.parse_args()
+    print(
+        f"{'tenants':>8}{'points':>10}{'scoped p50':>12}{'scoped p95':>12}"
+        f"{'unscoped p50':>14}{'unscoped p95':>14}"
+    )
+    results = run(
+        args.backend,
+        tenant_counts=sorted(int(x) for x in args.tenants.split(",")),
+        points_per_tenant=args.points_per_tenant,
+        files_per_tenant=args.files_per_tenant,
+        queries=args.queries,
+    )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,188 @@
+import importlib.util
 import os
+import threading
 
+import httpx
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, Request
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as qmodels
-from qdrant_client.http.exceptions import UnexpectedResponse
-from supabase import Client, create_client
+from rag_backend.services.auth_services import *
+from rag_backend.services.embedding_service import *
+from rag_backend.services.logging_service import *
+from rag_backend.services.quantization_service import *
+from rag_backend.services.tenant_service import *
+from rag_backend.services.vector_store import *
+from supabase import Client, ClientOptions, create_client
 
 load_dotenv()
 
 _db: Client = None
 _storage: Client = None
-_vdb = None
+_vdb: Vector_Store = None
+_http_clients = []
+_clients_lock = threading.Lock()
+_schema_ready = False
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+QDRANT_URL = os.getenv(
+    "QDRANT_URL",
+    "https://d03eed59-6786-4359-8a9d-2efdb3676ea0.eu-west-1-0.aws.cloud.qdrant.io",
+)
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+PAYLOAD_INDEXES = (
+    ("doc_id", qmodels.PayloadSchemaType.INTEGER),
+    ("user_id", Tenant_Service.user_index_schema()),
+    ("file_name", qmodels.PayloadSchemaType.KEYWORD),
+    ("doc_hash", qmodels.PayloadSchemaType.KEYWORD),
+    ("chunk_hash", qmodels.PayloadSchemaType.KEYWORD),
+)
 
 
-def database():
-    global _db
-    _db = create_client(
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_POOL_SIZE,
+        max_keepalive_connections=HTTP_POOL_SIZE,
+        keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+    )
+
+
+def _supabase_client(key) -> Client:
+    http_client = httpx.Client(
+        http2=HTTP2_ENABLED,
+        limits=_pool_limits(),
+        timeout=HTTP_TIMEOUT_SECONDS,
+    )
+    _http_clients.append(http_client)
+    return create_client(
         SUPABASE_URL,
-        SUPABASE_ANON_KEY,
+        key,
+        options=ClientOptions(httpx_client=http_client),
     )
+
+
+def database():
+    global _db
+    if _db is None:
+        with _clients_lock:
+            if _db is None:
+                _db = _supabase_client(SUPABASE_ANON_KEY)
     return _db
 
 
-QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+def storage():
+    global _storage
+    if _storage is None:
+        with _clients_lock:
+            if _storage is None:
+                _storage = _supabase_client(SUPABASE_SERVICE_ROLE_KEY)
+    return _storage
 
 
 def vector_database():
     global _vdb
-    _vdb = QdrantClient(
-        url="https://d03eed59-6786-4359-8a9d-2efdb3676ea0.eu-west-1-0.aws.cloud.qdrant.io",
-        api_key=QDRANT_API_KEY,
-    )
-    try:
-        _vdb.create_collection(
-            collection_name="user_docs",
-            vectors_config=qmodels.VectorParams(
-                size=384,
-                distance=qmodels.Distance.COSINE,
-            ),
-            optimizers_config=qmodels.OptimizersConfigDiff(default_segment_number=2),
-            hnsw_config=qmodels.HnswConfigDiff(
-                m=16,
-                ef_construct=100,
-            ),
-        )
-        _vdb.create_payload_index(
-            collection_name="user_docs",
-            field_name="file_name",
-            field_schema=qmodels.PayloadSchemaType.KEYWORD,
-        )
-        print("✅ Qdrant collection created.")
-    except UnexpectedResponse as e:
-        if "already exists" in str(e):
-            print("ℹ️ Collection already exists — using existing one.")
-        else:
-            raise e
+    if _vdb is None:
+        with _clients_lock:
+            if _vdb is None and VECTOR_BACKEND == "local":
+                _vdb = Local_Vector_Store(path=LOCAL_VECTOR_PATH)
+            elif _vdb is None:
+                _vdb = QdrantClient(
+                    url=QDRANT_URL,
+                    api_key=QDRANT_API_KEY,
+                    prefer_grpc=QDRANT_PREFER_GRPC,
+                    grpc_port=QDRANT_GRPC_PORT,
+                    timeout=int(HTTP_TIMEOUT_SECONDS),
+                    http2=HTTP2_ENABLED,
+                    limits=_pool_limits(),
+                )
+    if not _schema_ready:
+        bootstrap_vector_schema(_vdb)
     return _vdb
 
 
+def bootstrap_vector_schema(vdb):
+    global _schema_ready
+    with _clients_lock:
+        if _schema_ready:
+            return
+        if not vdb.collection_exists(collection_name="user_docs"):
+            vdb.create_collection(
+                collection_name="user_docs",
+                vectors_config=qmodels.VectorParams(
+                    size=EMBEDDING_DIM,
+                    distance=qmodels.Distance.COSINE,
+                ),
+                optimizers_config=qmodels.OptimizersConfigDiff(
+                    default_segment_number=2
+                ),
+                quantization_config=Quantization_Service.quantization_config(),
+                **Tenant_Service.collection_options(),
+            )
+            logger.info("Qdrant collection created")
+        else:
+            params = vdb.get_collection(collection_name="user_docs").config.params
+            size = params.vectors.size
+            if size != EMBEDDING_DIM:
+                raise RuntimeError(
+                    f"user_docs holds {size}-dimensional vectors but "
+                    f"EMBEDDING_DIM is {EMBEDDING_DIM}; re-index into a new "
+                    "collection before switching embedding models"
+                )
+            logger.info("Qdrant collection already exists, using it")
+        for field_name, field_schema in PAYLOAD_INDEXES:
+            vdb.create_payload_index(
+                collection_name="user_docs",
+                field_name=field_name,
+                field_schema=field_schema,
+            )
+        _schema_ready = True
+
+
+class Client_Registry:
+    # clients are built once per process and shared by every request
+    @staticmethod
+    def startup():
+        database()
+        storage()
+        vector_database()
+
+    @staticmethod
+    def shutdown():
+        global _db, _storage, _vdb, _schema_ready
+        with _clients_lock:
+            if _vdb is not None:
+                _vdb.close()
+            for http_client in _http_clients:
+                http_client.close()
+            _http_clients.clear()
+            _db = _storage = _vdb = None
+            _schema_ready = False
+
+
+def _remote_user(db, token):
+    response = db.auth.get_user(token)
+    user_data = response.user
+    if not user_data:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    return {
+        "id": user_data.id,
+        "email": user_data.email,
+        "role": user_data.role,
+        "app_metadata": user_data.app_metadata,
+        "user_metadata": user_data.user_metadata,
+        "created_at": user_data.created_at,
+        "aud": user_data.aud,
+    }
+
+
 def verify_token(request: Request, db=Depends(database)):
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
@@ -71,30 +190,34 @@ def verify_token(request: Request, db=Depends(database)):
             status_code=401, detail="Authorization header missing or invalid"
         )
     token = auth_header.split(" ")[1]
+    if not AUTH_STRICT_REMOTE:
+        cached_user = Auth_Services.cached_user(token)
+        if cached_user is not None:
+            return cached_user
     try:
-        response = db.auth.get_user(token)
-        user_data = response.user
-        if not user_data:
-            raise HTTPException(status_code=401, detail="Invalid or expired token")
-        return {
-            "id": user_data.id,
-            "email": user_data.email,
-            "role": user_data.role,
-            "app_metadata": user_data.app_metadata,
-            "user_metadata": user_data.user_metadata,
-            "created_at": user_data.created_at,
-            "aud": user_data.aud,
-        }
+        if Auth_Services.can_verify_locally(token):
+            claims = Auth_Services.decode_token(token)
+            if AUTH_STRICT_REMOTE:
+                # strict mode still asks Supabase, e.g. to catch revoked sessions
+                return _remote_user(db, token)
+            user = Auth_Services.user_from_claims(claims)
+        else:
+            user = _remote_user(db, token)
+            claims = jwt.get_unverified_claims(token)
+        Auth_Services.cache_user(token, user, expires_at=claims.get("exp", 0))
+        return user
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=401, detail=f"Token verification failed: {str(e)}"
         )
 
 
-def storage():
-    global _storage
-    _storage = create_client(
-        SUPABASE_URL,
-        SUPABASE_SERVICE_ROLE_KEY,
-    )
-    return _storage
+def user_details(request: Request, db=Depends(database)):
+    user = verify_token(request, db)
+    # access tokens carry no signup time, so a locally verified user is
+    # completed from Supabase for the profile endpoint
+    if user["created_at"] is None:
+        user = _remote_user(db, request.headers["Authorization"].split(" ")[1])
+    return user
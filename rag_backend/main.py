@@ -1,32 +1,80 @@
+import asyncio
+import time
 from contextlib import asynccontextmanager
 
 from rag_backend.dependencies import *
-from fastapi import APIRouter, Depends, FastAPI, File, Request, UploadFile
+from fastapi import APIRouter, Depends, FastAPI, File, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from starlette.routing import Match
 from rag_backend.serilalizers import *
 from rag_backend.services.file_services import *
-from typing import List
+from typing import List, Optional
 
 load_dotenv()
+configure_logging()
 
 my_resources = {}
+readiness = {"clients": False, "error": None}
+
+
+def warm_up():
+    # runs off the event loop so the process answers /health straight away;
+    # /ready turns green once clients are up and the model is warm
+    try:
+        Client_Registry.startup()
+        readiness["clients"] = True
+        logger.info("Database connection established")
+        Embedding_Service.load()
+        Embedding_Service.warm_up()
+        logger.info("Embedding model loaded")
+        if embedding_pool.enabled:
+            embedding_pool.start()
+    except Exception as e:
+        readiness["error"] = str(e)
+        logger.exception("Warm-up failed")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("Application starting up...")
+    logger.info("Application starting up")
     my_resources["database_connection"] = "connected_to_database"
-    database()
-    storage()
-    vector_database()
-    print("Database connection established.")
+    warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    if PROFILE_SLOW_REQUEST_MS > 0:
+        profiler.start()
+    await query_batcher.start()
+    await document_batcher.start()
+    Parsing_Service.start()
+    await get_job_queue().start(handler=run_ingestion_job)
     yield
-    print("Application shutting down...")
+    logger.info("Application shutting down")
+    await warm_up_task
+    profiler.stop()
+    await get_job_queue().stop()
+    await query_batcher.stop()
+    await document_batcher.stop()
+    Parsing_Service.shutdown()
+    embedding_pool.stop()
+    Client_Registry.shutdown()
     if "database_connection" in my_resources:
-        print("Closing database connection.")
+        logger.info("Closing database connection")
         del my_resources["database_connection"]
 
 
+async def run_ingestion_job(job, on_stage):
+    tokens = bind_request(job["id"], "job:ingest")
+    try:
+        return await File_Services.run_ingestion_job(
+            job=job,
+            on_stage=on_stage,
+            db=database(),
+            vdb=vector_database(),
+            store=storage(),
+        )
+    finally:
+        reset_request(tokens)
+
+
 app = FastAPI(lifespan=lifespan)
 router = APIRouter()
 
@@ -44,15 +92,65 @@ app.add_middleware(
 )
 
 
+def _route_template(request: Request) -> str:
+    # label by route template rather than raw path, so ids don't explode the
+    # number of series
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", request.url.path)
+    return "unmatched"
+
+
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    request_id = request_id_from(request.headers.get("X-Request-ID"))
+    route = _route_template(request)
+    tokens = bind_request(request_id, route)
+    totals_token = stage_totals_var.set({})
+    started = time.perf_counter()
+    profile_started = profiler.enter() if profiler.enabled else None
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        try:
+            elapsed = time.perf_counter() - started
+            request_seconds.observe(elapsed, route, request.method, status)
+            elapsed_ms = round(elapsed * 1000, 2)
+            logger.info(
+                "request",
+                extra={
+                    "method": request.method,
+                    "status": status,
+                    "elapsed_ms": elapsed_ms,
+                    "stages_ms": stage_totals_var.get(),
+                },
+            )
+            if profile_started is not None:
+                profiler.exit(profile_started, request_id, elapsed_ms)
+        finally:
+            stage_totals_var.reset(totals_token)
+            reset_request(tokens)
+
+
 class Get_Doc_Url(BaseModel):
     id: int
 
 
 @router.post("/get/user/single/doc")
 def get_user_single_doc_public_path(
-    data: Get_Doc_Url, store=Depends(storage), db=Depends(database)
+    data: Get_Doc_Url,
+    store=Depends(storage),
+    db=Depends(database),
+    user=Depends(verify_token),
 ):
-    return File_Services.get_user_single_doc_public_path(id=data.id, store=store, db=db)
+    return File_Services.get_user_single_doc_public_path(
+        id=data.id, store=store, db=db, user_id=user["id"]
+    )
 
 
 @router.post("/get/user/mulitple/docs")
@@ -64,19 +162,28 @@ def get_user_multiple_docs_public_path(
     )
 
 
-@router.post("/upload/single/file")
+@router.post("/upload/single/file", status_code=202)
 async def upload_file(
     file: UploadFile = File(...),
-    store=Depends(storage),
-    db=Depends(database),
-    vdb=Depends(vector_database),
+    priority: int = 0,
     user=Depends(verify_token),
 ):
-    return await File_Services.upload_single_file(
-        file=file, store=store, db=db, vdb=vdb, user_id=user["id"]
+    return await File_Services.enqueue_upload(
+        queue=get_job_queue(),
+        file=file,
+        user_id=user["id"],
+        priority=allowed_priority(user, priority),
     )
 
 
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str, user=Depends(verify_token)):
+    job = get_job_queue().get(job_id, user_id=user["id"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 @router.post("/upload/multiple/files")
 async def upload_multiple_files(
     files: List[UploadFile] = File(...),
@@ -98,9 +205,12 @@ class Delete_File(BaseModel):
 def delete_file(
     doc: Delete_File,
     db=Depends(database),
+    vdb=Depends(vector_database),
     user=Depends(verify_token),
 ):
-    return File_Services.delete_file(doc_id=doc.doc_id, db=db, user_id=user["id"])
+    return File_Services.delete_file(
+        doc_id=doc.doc_id, db=db, vdb=vdb, user_id=user["id"]
+    )
 
 
 class Delete_Session(BaseModel):
@@ -120,12 +230,16 @@ def delete_session(
 
 @router.post("/get/user/context")
 def get_user_context(
-    question: str, file_names: List[str], vdb=Depends(vector_database)
+    question: str,
+    file_names: List[str],
+    vdb=Depends(vector_database),
+    user=Depends(verify_token),
 ):
     return File_Services.vector_db_semantic_search(
         vdb=vdb,
         question=question,
         file_names=file_names,
+        user_id=user["id"],
     )
 
 
@@ -136,6 +250,15 @@ def ask_question(
     db=Depends(database),
     user=Depends(verify_token),
 ):
+    if data.stream:
+        return File_Services.stream_from_context(
+            vdb=vdb,
+            chat_space=data.chat_space,
+            question=data.question,
+            file_names=data.file_names,
+            db=db,
+            user_id=user["id"],
+        )
     response = File_Services.generate_from_context(
         vdb=vdb,
         chat_space=data.chat_space,
@@ -147,13 +270,75 @@ def ask_question(
     return response
 
 
+@router.get("/health")
+def health():
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+def ready(response: Response):
+    checks = {
+        "clients": readiness["clients"],
+        "embedding_model": Embedding_Service.is_warm(),
+        "embedding_workers": embedding_pool.is_warm(),
+    }
+    error = readiness["error"] or embedding_pool.error
+    is_ready = all(checks.values())
+    if not is_ready:
+        response.status_code = 503
+    if is_ready:
+        status = "ready"
+    else:
+        status = "failed" if error else "starting"
+    return {
+        "status": status,
+        "checks": checks,
+        "error": error,
+    }
+
+
+@router.get("/get/batcher/stats")
+def get_batcher_stats():
+    return {
+        "query": query_batcher.stats(),
+        "document": document_batcher.stats(),
+        "embedding_pool": embedding_pool.stats(),
+    }
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(
+        metrics_registry.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@router.get("/get/llm/stats")
+def get_llm_stats():
+    return {
+        "time_to_first_token": LlmService.ttft_stats(),
+        "answer_cache": answer_cache.stats(),
+    }
+
+
 @router.get("/get/user/history")
-def get_user_history(db=Depends(database), user=Depends(verify_token)):
-    return File_Services.get_user_history(user_id=user["id"], db=db)
+def get_user_history(
+    cursor: Optional[int] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    db=Depends(database),
+    user=Depends(verify_token),
+):
+    return File_Services.get_user_history(
+        user_id=user["id"], db=db, cursor=cursor, limit=limit, fields=fields
+    )
 
 
 class Get_User_Chats(BaseModel):
     chat_space: str
+    cursor: Optional[int] = None
+    limit: Optional[int] = None
+    fields: Optional[str] = None
 
 
 @router.post("/get/user/chats")
@@ -161,18 +346,56 @@ def get_user_history(
     chat: Get_User_Chats, db=Depends(database), user=Depends(verify_token)
 ):
     return File_Services.get_user_chat(
-        chat_space=chat.chat_space, user_id=user["id"], db=db
+        chat_space=chat.chat_space,
+        user_id=user["id"],
+        db=db,
+        cursor=chat.cursor,
+        limit=chat.limit,
+        fields=chat.fields,
     )
 
 
 @router.get("/get/user/docs")
-def get_user_docs(db=Depends(database), user=Depends(verify_token)):
-    return File_Services.get_user_docs(user_id=user["id"], db=db)
+def get_user_docs(
+    cursor: Optional[int] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    db=Depends(database),
+    user=Depends(verify_token),
+):
+    return File_Services.get_user_docs(
+        user_id=user["id"], db=db, cursor=cursor, limit=limit, fields=fields
+    )
+
+
+@router.get("/export/user/history")
+def export_user_history(
+    chat_space: Optional[str] = None,
+    fields: Optional[str] = None,
+    db=Depends(database),
+    user=Depends(verify_token),
+):
+    return File_Services.export_ndjson(
+        db=db,
+        table="questions",
+        user_id=user["id"],
+        filters={"chat_space": chat_space} if chat_space else None,
+        fields=fields,
+    )
+
+
+@router.get("/export/user/docs")
+def export_user_docs(
+    fields: Optional[str] = None, db=Depends(database), user=Depends(verify_token)
+):
+    return File_Services.export_ndjson(
+        db=db, table="documents", user_id=user["id"], fields=fields
+    )
 
 
 @router.get("/get/user/details")
-def get_user_details(request: Request, db=Depends(database)):
-    return verify_token(db=db, request=request)
+def get_user_details(user=Depends(user_details)):
+    return user
 
 
 @router.get("/get")
@@ -1,20 +1,16 @@
-from pypdf import PdfReader
-from PIL import Image
-import pytesseract
-from docx import Document
 import io
+from typing import Iterator
+from rag_backend.services.ocr_service import *
+
+TEXT_READ_BLOCK_SIZE = 64 * 1024
 
 
 class Parsers:
     @staticmethod
     def pdf_parser_from_upload(pdf_bytes) -> str:
-        text_content = ""
         try:
-            reader = PdfReader(io.BytesIO(pdf_bytes))
-            for page in reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text_content += page_text + "\n"
+            # image-only pages go through OCR instead of coming back empty
+            text_content = "".join(Ocr_Service.pdf_pages(io.BytesIO(pdf_bytes)))
         except Exception as e:
             raise RuntimeError(f"Failed to parse PDF: {e}")
         return text_content.strip()
@@ -22,14 +18,15 @@ class Parsers:
     @staticmethod
     def image_parser_from_upload(image_bytes) -> str:
         try:
-            image = Image.open(io.BytesIO(image_bytes))
-            text = pytesseract.image_to_string(image)
+            text = "".join(Ocr_Service.image_text(io.BytesIO(image_bytes)))
             return text.strip()
         except Exception as e:
             raise RuntimeError(f"Failed to parse image: {e}")
 
     @staticmethod
     def word_parser_from_upload(file_bytes) -> str:
+        from docx import Document
+
         try:
             file_bytes = file_bytes
             doc = Document(io.BytesIO(file_bytes))
@@ -37,3 +34,39 @@ class Parsers:
             return text.strip()
         except Exception as e:
             raise RuntimeError(f"Failed to parse Word document: {e}")
+
+    @staticmethod
+    def pdf_pages_from_path(path) -> Iterator[str]:
+        try:
+            for page_text in Ocr_Service.pdf_pages(path):
+                if page_text:
+                    yield page_text
+        except Exception as e:
+            raise RuntimeError(f"Failed to parse PDF: {e}")
+
+    @staticmethod
+    def image_text_from_path(path) -> Iterator[str]:
+        try:
+            yield from Ocr_Service.image_text(path)
+        except Exception as e:
+            raise RuntimeError(f"Failed to parse image: {e}")
+
+    @staticmethod
+    def word_paragraphs_from_path(path) -> Iterator[str]:
+        from docx import Document
+
+        try:
+            doc = Document(path)
+            for para in doc.paragraphs:
+                yield para.text + "\n"
+        except Exception as e:
+            raise RuntimeError(f"Failed to parse Word document: {e}")
+
+    @staticmethod
+    def text_blocks_from_path(path) -> Iterator[str]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                while block := f.read(TEXT_READ_BLOCK_SIZE):
+                    yield block
+        except UnicodeDecodeError as e:
+            raise RuntimeError(f"Failed to decode text file: {e}")
@@ -0,0 +1,149 @@
+import argparse
+from collections import defaultdict
+
+from qdrant_client.http import models as qmodels
+from rag_backend.dependencies import *
+from rag_backend.services.file_services import *
+
+# Points stored before payloads carried user_id and doc_id only have a
+# file_name. Search is scoped by user_id and deletes go by doc_id, so these
+# points have to be tagged from the documents table before that code ships.
+
+LEGACY_FILTER = qmodels.Filter(
+    must=[qmodels.IsEmptyCondition(is_empty=qmodels.PayloadField(key="user_id"))]
+)
+
+
+def documents_by_name(db, doc_names, batch_size: int):
+    doc_names = list(doc_names)
+    rows = defaultdict(list)
+    for start in range(0, len(doc_names), batch_size):
+        batch = doc_names[start : start + batch_size]
+        response = safe_supabase_database_action(
+            lambda: db.table("documents")
+            .select("id,user_id,doc_name")
+            .in_("doc_name", batch)
+            .execute()
+        )
+        for row in response["data"]:
+            rows[row["doc_name"]].append(row)
+    return rows
+
+
+def owner_payload(rows):
+    # one row: the point belongs to that document. Several rows of one user:
+    # the owner is known but not which upload, so doc_id stays empty. Rows of
+    # several users cannot be told apart by name alone.
+    if len({row["user_id"] for row in rows}) != 1:
+        return None
+    payload = {"user_id": rows[0]["user_id"]}
+    if len(rows) == 1:
+        payload["doc_id"] = rows[0]["id"]
+    return payload
+
+
+def legacy_points(vdb, batch_size: int):
+    offset = None
+    while True:
+        points, offset = vdb.scroll(
+            collection_name="user_docs",
+            scroll_filter=LEGACY_FILTER,
+            limit=batch_size,
+            offset=offset,
+            with_payload=["file_name"],
+            with_vectors=False,
+        )
+        yield points
+        if offset is None:
+            return
+
+
+def plan(vdb, db, batch_size: int):
+    point_ids_by_name = defaultdict(list)
+    for points in legacy_points(vdb, batch_size):
+        for point in points:
+            point_ids_by_name[(point.payload or {}).get("file_name")].append(
+                point.id
+            )
+    unnamed = point_ids_by_name.pop(None, [])
+    rows_by_name = documents_by_name(db, point_ids_by_name, batch_size)
+
+    updates, ambiguous, unmatched = [], {}, {}
+    for file_name, point_ids in point_ids_by_name.items():
+        rows = rows_by_name.get(file_name)
+        if not rows:
+            unmatched[file_name] = len(point_ids)
+            continue
+        payload = owner_payload(rows)
+        if payload is None:
+            ambiguous[file_name] = len(point_ids)
+        else:
+            updates.append((payload, point_ids))
+    return {
+        "updates": updates,
+        "ambiguous": ambiguous,
+        "unmatched": unmatched,
+        "unnamed": len(unnamed),
+    }
+
+
+def backfill(vdb, db, batch_size: int, dry_run: bool):
+    result = plan(vdb, db, batch_size)
+    tagged = owner_only = 0
+    for payload, point_ids in result["updates"]:
+        if "doc_id" in payload:
+            tagged += len(point_ids)
+        else:
+            owner_only += len(point_ids)
+        if dry_run:
+            continue
+        for start in range(0, len(point_ids), batch_size):
+            vdb.set_payload(
+                collection_name="user_docs",
+                payload=payload,
+                points=point_ids[start : start + batch_size],
+                wait=True,
+            )
+    verb = "Would tag" if dry_run else "Tagged"
+    print(f"✅ {verb} {tagged} points with user_id and doc_id.")
+    if owner_only:
+        print(
+            f"ℹ️ {verb} {owner_only} points with user_id only; the user has "
+            "several documents of that name. reconcile_vectors.py deletes them "
+            "once none is left."
+        )
+    for file_name, count in sorted(result["ambiguous"].items()):
+        print(f"⚠️ {count} points of {file_name!r}: several users own that name.")
+    for file_name, count in sorted(result["unmatched"].items()):
+        print(f"⚠️ {count} points of {file_name!r}: no documents row.")
+    if result["unnamed"]:
+        print(f"⚠️ {result['unnamed']} points without a file_name.")
+    return {
+        "tagged": tagged,
+        "owner_only": owner_only,
+        "ambiguous": result["ambiguous"],
+        "unmatched": result["unmatched"],
+        "unnamed": result["unnamed"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Tag legacy user_docs points with user_id and doc_id by matching "
+            "their file_name against the documents table."
+        )
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    backfill(
+        vector_database(),
+        storage(),
+        batch_size=args.batch_size,
+        dry_run=args.dry_run,
+    )
+
+
+if __name__ == "__main__":
+    main()
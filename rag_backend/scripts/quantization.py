@@ -0,0 +1,125 @@
+import argparse
+import json
+import time
+
+import numpy as np
+from qdrant_client.http import models as qmodels
+from rag_backend.dependencies import *
+from rag_backend.services.embedding_service import *
+
+
+def migrate(vdb, mode: str):
+    quantization_config = Quantization_Service.quantization_config(mode)
+    vdb.update_collection(
+        collection_name="user_docs",
+        quantization_config=quantization_config or qmodels.Disabled.DISABLED,
+    )
+    print(f"✅ user_docs quantization set to {mode}.")
+
+
+def _timed_search(vdb, query, limit, search_params):
+    started = time.perf_counter()
+    hits = vdb.search(
+        collection_name="user_docs",
+        query_vector=query.tolist(),
+        limit=limit,
+        search_params=search_params,
+        with_payload=False,
+    )
+    return [str(hit.id) for hit in hits], (time.perf_counter() - started) * 1000
+
+
+def _percentile(values, q):
+    return round(float(np.percentile(values, q)), 3)
+
+
+def report(vdb, queries_path: str, limit: int, oversampling: list, mode: str):
+    with open(queries_path, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+    queries = Embedding_Service.embed_documents(questions)
+
+    exact_ids, exact_latency = [], []
+    for query in queries:
+        ids, latency = _timed_search(
+            vdb, query, limit, qmodels.SearchParams(exact=True)
+        )
+        exact_ids.append(set(ids))
+        exact_latency.append(latency)
+    rows = [
+        {
+            "setting": "exact",
+            "recall": 1.0,
+            "p50_ms": _percentile(exact_latency, 50),
+            "p95_ms": _percentile(exact_latency, 95),
+        }
+    ]
+    settings = [("no rescore", 1.0, False)] + [
+        (f"rescore x{factor:g}", factor, True) for factor in oversampling
+    ]
+    for name, factor, rescore in settings:
+        search_params = Quantization_Service.search_params(
+            mode=mode, oversampling=factor, rescore=rescore
+        )
+        recalls, latencies = [], []
+        for query, truth in zip(queries, exact_ids):
+            ids, latency = _timed_search(vdb, query, limit, search_params)
+            recalls.append(len(truth & set(ids)) / max(1, len(truth)))
+            latencies.append(latency)
+        rows.append(
+            {
+                "setting": name,
+                "recall": round(float(np.mean(recalls)), 4),
+                "p50_ms": _percentile(latencies, 50),
+                "p95_ms": _percentile(latencies, 95),
+            }
+        )
+    print(f"{'setting':<16}{'recall@' + str(limit):>12}{'p50 ms':>10}{'p95 ms':>10}")
+    for row in rows:
+        print(
+            f"{row['setting']:<16}{row['recall']:>12}"
+            f"{row['p50_ms']:>10}{row['p95_ms']:>10}"
+        )
+    return {"mode": mode, "limit": limit, "queries": len(questions), "rows": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage user_docs quantization.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = commands.add_parser(
+        "migrate", help="Convert the existing collection to a quantization mode."
+    )
+    migrate_parser.add_argument("mode", choices=QUANTIZATION_MODES)
+    report_parser = commands.add_parser(
+        "report", help="Recall vs latency against a held-out query set."
+    )
+    report_parser.add_argument(
+        "queries", help="Text file with one held-out question per line."
+    )
+    report_parser.add_argument("--limit", type=int, default=10)
+    report_parser.add_argument("--oversampling", default="1,2,4")
+    report_parser.add_argument(
+        "--mode",
+        default=VECTOR_QUANTIZATION if VECTOR_QUANTIZATION != "none" else "scalar",
+        choices=QUANTIZATION_MODES[1:],
+    )
+    report_parser.add_argument("--json", help="Also write the report to this path.")
+    args = parser.parse_args()
+
+    vdb = vector_database()
+    if args.command == "migrate":
+        migrate(vdb, args.mode)
+        return
+    results = report(
+        vdb,
+        queries_path=args.queries,
+        limit=args.limit,
+        oversampling=[float(x) for x in args.oversampling.split(",")],
+        mode=args.mode,
+    )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
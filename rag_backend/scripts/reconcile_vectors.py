@@ -0,0 +1,206 @@
+import argparse
+from collections import defaultdict
+
+from qdrant_client.http import models as qmodels
+from rag_backend.dependencies import *
+from rag_backend.scripts.backfill_payloads import *
+from rag_backend.services.file_services import *
+
+
+def existing_doc_ids(db, doc_ids):
+    response = safe_supabase_database_action(
+        lambda: db.table("documents").select("id").in_("id", list(doc_ids)).execute()
+    )
+    return {row["id"] for row in response["data"]}
+
+
+# backfilled points whose user had several documents of that name carry
+# user_id but no doc_id, so deleting one of those documents cannot find them
+OWNER_ONLY_FILTER = qmodels.Filter(
+    must=[qmodels.IsEmptyCondition(is_empty=qmodels.PayloadField(key="doc_id"))],
+    must_not=[
+        qmodels.IsEmptyCondition(is_empty=qmodels.PayloadField(key="user_id"))
+    ],
+)
+
+
+def owner_only_names(vdb, batch_size: int):
+    counts = defaultdict(int)
+    offset = None
+    while True:
+        points, offset = vdb.scroll(
+            collection_name="user_docs",
+            scroll_filter=OWNER_ONLY_FILTER,
+            limit=batch_size,
+            offset=offset,
+            with_payload=["user_id", "file_name"],
+            with_vectors=False,
+        )
+        for point in points:
+            file_name = point.payload.get("file_name")
+            if file_name is not None:
+                counts[(point.payload["user_id"], file_name)] += 1
+        if offset is None:
+            return counts
+
+
+def delete_owner_only(vdb, user_id, file_name):
+    vdb.delete(
+        collection_name="user_docs",
+        points_selector=qmodels.FilterSelector(
+            filter=qmodels.Filter(
+                must=[
+                    qmodels.FieldCondition(
+                        key="user_id", match=qmodels.MatchValue(value=user_id)
+                    ),
+                    qmodels.FieldCondition(
+                        key="file_name", match=qmodels.MatchValue(value=file_name)
+                    ),
+                    *OWNER_ONLY_FILTER.must,
+                ]
+            )
+        ),
+        wait=True,
+        shard_key_selector=Tenant_Service.shard_key(user_id),
+    )
+
+
+def reconcile(vdb, db, batch_size: int, dry_run: bool, purge_legacy: bool):
+    scanned = 0
+    orphaned_docs = {}
+    offset = None
+    while True:
+        points, offset = vdb.scroll(
+            collection_name="user_docs",
+            scroll_filter=qmodels.Filter(
+                must_not=[
+                    qmodels.IsEmptyCondition(
+                        is_empty=qmodels.PayloadField(key="doc_id")
+                    )
+                ]
+            ),
+            limit=batch_size,
+            offset=offset,
+            with_payload=["doc_id", "user_id"],
+            with_vectors=False,
+        )
+        scanned += len(points)
+        owners = {
+            point.payload["doc_id"]: point.payload.get("user_id")
+            for point in points
+            if point.payload["doc_id"] not in orphaned_docs
+        }
+        if owners:
+            for doc_id in owners.keys() - existing_doc_ids(db, owners):
+                orphaned_docs[doc_id] = owners[doc_id]
+        if offset is None:
+            break
+    print(f"ℹ️ Scanned {scanned} points, {len(orphaned_docs)} orphaned documents.")
+
+    if orphaned_docs and not dry_run:
+        # deleted per owner so sharded collections route to the right shard
+        by_user = defaultdict(list)
+        for doc_id, user_id in orphaned_docs.items():
+            by_user[user_id].append(doc_id)
+        for user_id, doc_ids in by_user.items():
+            for start in range(0, len(doc_ids), batch_size):
+                File_Services.delete_document_vectors(
+                    vdb, doc_ids[start : start + batch_size], user_id
+                )
+        print(f"✅ Purged vectors of {len(orphaned_docs)} orphaned documents.")
+
+    # those points go once their user has no document of that name left
+    owner_only = owner_only_names(vdb, batch_size)
+    rows_by_name = documents_by_name(
+        db, {file_name for _, file_name in owner_only}, batch_size
+    )
+    owners_by_name = {
+        file_name: {row["user_id"] for row in rows}
+        for file_name, rows in rows_by_name.items()
+    }
+    orphaned_names = {
+        (user_id, file_name): count
+        for (user_id, file_name), count in owner_only.items()
+        if user_id not in owners_by_name.get(file_name, ())
+    }
+    print(
+        f"ℹ️ {sum(orphaned_names.values())} points without a doc_id whose "
+        "user has no document of that name left."
+    )
+    if orphaned_names and not dry_run:
+        for user_id, file_name in orphaned_names:
+            delete_owner_only(vdb, user_id, file_name)
+        print(f"✅ Purged {sum(orphaned_names.values())} points without a doc_id.")
+
+    # points written before payloads carried an owner; only those the
+    # backfill could not attribute to a documents row are ever purged
+    legacy = vdb.count(
+        collection_name="user_docs", count_filter=LEGACY_FILTER, exact=True
+    ).count
+    if legacy:
+        print(f"ℹ️ {legacy} legacy points without a user_id.")
+        if purge_legacy and not dry_run:
+            pending = sum(
+                len(point_ids) for _, point_ids in plan(vdb, db, batch_size)["updates"]
+            )
+            if pending:
+                raise SystemExit(
+                    f"❌ {pending} legacy points can still be attributed to a "
+                    "document; run scripts/backfill_payloads.py first."
+                )
+            vdb.delete(
+                collection_name="user_docs",
+                points_selector=qmodels.FilterSelector(filter=LEGACY_FILTER),
+                wait=True,
+            )
+            print(f"✅ Purged {legacy} legacy points.")
+
+    # chunk text whose documents row is gone, e.g. from an upload that died
+    # between writing text and writing points
+    stale_chunk_docs = []
+    if CHUNK_STORE_ENABLED:
+        chunk_store = get_chunk_store()
+        for doc_ids in chunk_store.doc_ids(batch_size):
+            stale_chunk_docs += sorted(set(doc_ids) - existing_doc_ids(db, doc_ids))
+        print(f"ℹ️ {len(stale_chunk_docs)} orphaned documents in the chunk store.")
+        if stale_chunk_docs and not dry_run:
+            deleted = chunk_store.delete_documents(stale_chunk_docs)
+            print(f"✅ Purged {deleted} orphaned chunks.")
+    return {
+        "scanned": scanned,
+        "orphaned_docs": sorted(orphaned_docs),
+        "orphaned_owner_only": sorted(orphaned_names),
+        "legacy_points": legacy,
+        "orphaned_chunk_docs": stale_chunk_docs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Purge user_docs vectors and stored chunk text whose documents row "
+            "no longer exists."
+        )
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument(
+        "--purge-legacy",
+        action="store_true",
+        help=(
+            "Also delete legacy points that backfill_payloads.py could not "
+            "attribute to a document."
+        ),
+    )
+    args = parser.parse_args()
+    reconcile(
+        vector_database(),
+        storage(),
+        batch_size=args.batch_size,
+        dry_run=args.dry_run,
+        purge_legacy=args.purge_legacy,
+    )
+
+
+if __name__ == "__main__":
+    main()
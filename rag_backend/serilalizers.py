@@ -19,6 +19,7 @@ class Generate_Content_Serializer(BaseModel):
     question: str
     file_names: Optional[List[str]] = None
     chat_space: str
+    stream: bool = False
 
 
 class Output_Response_Serializer(BaseModel):
@@ -1,14 +1,143 @@
-from fastapi import HTTPException, Header
-from jose import jwt
+import hashlib
 import os
+import threading
+import time
+
+import httpx
+from cachetools import TLRUCache
 from dotenv import load_dotenv
+from fastapi import HTTPException, Header
+from jose import JWTError, jwt
 
 load_dotenv()
 
+SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL") or (
+    f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json" if SUPABASE_URL else None
+)
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+AUTH_STRICT_REMOTE = os.getenv("AUTH_STRICT_REMOTE", "false").lower() == "true"
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+AUTH_TOKEN_CACHE_MAX_TTL = int(os.getenv("AUTH_TOKEN_CACHE_MAX_TTL", "300"))
+JWKS_CACHE_TTL = int(os.getenv("JWKS_CACHE_TTL", "600"))
+# an unknown kid refetches the JWKS at most this often; kids seen in between
+# are rejected, so forged headers cannot turn every request into a fetch
+JWKS_MIN_REFRESH_SECONDS = float(os.getenv("JWKS_MIN_REFRESH_SECONDS", "30"))
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256")
+
+# entries expire at the token's own exp, or sooner if the max TTL is shorter
+_verified_tokens = TLRUCache(
+    maxsize=AUTH_TOKEN_CACHE_SIZE,
+    ttu=lambda _key, value, now: min(value[1], now + AUTH_TOKEN_CACHE_MAX_TTL),
+    timer=time.time,
+)
+_verified_tokens_lock = threading.Lock()
+_jwks = {"keys": {}, "fetched_at": 0.0, "attempted_at": 0.0}
+_jwks_lock = threading.Lock()
 
 
 class Auth_Services:
+    @staticmethod
+    def can_verify_locally(token: str) -> bool:
+        # only tokens whose algorithm has key material here are checked
+        # locally; the JWKS URL alone is not enough, since it is derived from
+        # SUPABASE_URL and an HS256 project serves no keys there
+        algorithm = jwt.get_unverified_header(token).get("alg")
+        if algorithm == "HS256":
+            return bool(SUPABASE_JWT_SECRET)
+        if algorithm not in ASYMMETRIC_ALGORITHMS or not SUPABASE_JWKS_URL:
+            return False
+        try:
+            return bool(Auth_Services._fetch_jwks())
+        except (httpx.HTTPError, KeyError, ValueError):
+            return False
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def cached_user(token: str):
+        with _verified_tokens_lock:
+            entry = _verified_tokens.get(Auth_Services._token_key(token))
+        return entry[0] if entry else None
+
+    @staticmethod
+    def cache_user(token: str, user: dict, expires_at: float):
+        if expires_at <= time.time():
+            return
+        with _verified_tokens_lock:
+            _verified_tokens[Auth_Services._token_key(token)] = (user, expires_at)
+
+    @staticmethod
+    def _fetch_jwks(force: bool = False):
+        keys = _jwks["keys"]
+        if force:
+            if time.time() - _jwks["attempted_at"] < JWKS_MIN_REFRESH_SECONDS:
+                return keys
+        elif keys and time.time() - _jwks["fetched_at"] <= JWKS_CACHE_TTL:
+            return keys
+        # with keys in hand, requests don't queue behind a refresh already
+        # under way; only the very first fetch has to be waited for
+        if not _jwks_lock.acquire(blocking=not keys):
+            return keys
+        try:
+            # someone else refreshed while this request waited for the lock
+            # a failed or empty fetch is not retried before the interval either
+            recent = time.time() - _jwks["attempted_at"] < JWKS_MIN_REFRESH_SECONDS
+            if recent:
+                return _jwks["keys"]
+            _jwks["attempted_at"] = time.time()
+            response = httpx.get(SUPABASE_JWKS_URL, timeout=10)
+            response.raise_for_status()
+            _jwks["keys"] = {key["kid"]: key for key in response.json()["keys"]}
+            _jwks["fetched_at"] = time.time()
+            return _jwks["keys"]
+        finally:
+            _jwks_lock.release()
+
+    @staticmethod
+    def _signing_key(header: dict):
+        algorithm = header.get("alg")
+        if algorithm == "HS256":
+            if not SUPABASE_JWT_SECRET:
+                raise JWTError("HS256 token but SUPABASE_JWT_SECRET is not set")
+            return SUPABASE_JWT_SECRET
+        if algorithm not in ASYMMETRIC_ALGORITHMS or not SUPABASE_JWKS_URL:
+            raise JWTError(f"Unsupported signing algorithm: {algorithm}")
+        kid = header.get("kid")
+        key = Auth_Services._fetch_jwks().get(kid)
+        if key is None:
+            # keys may have rotated since the last fetch
+            key = Auth_Services._fetch_jwks(force=True).get(kid)
+        if key is None:
+            raise JWTError(f"Unknown signing key: {kid}")
+        return key
+
+    @staticmethod
+    def decode_token(token: str) -> dict:
+        header = jwt.get_unverified_header(token)
+        return jwt.decode(
+            token,
+            Auth_Services._signing_key(header),
+            algorithms=[header.get("alg")],
+            audience=SUPABASE_JWT_AUDIENCE,
+        )
+
+    @staticmethod
+    def user_from_claims(claims: dict) -> dict:
+        return {
+            "id": claims["sub"],
+            "email": claims.get("email"),
+            "role": claims.get("role"),
+            "app_metadata": claims.get("app_metadata"),
+            "user_metadata": claims.get("user_metadata"),
+            # not part of the access token; user_details asks Supabase for it
+            "created_at": None,
+            "aud": claims.get("aud"),
+        }
+
     @staticmethod
     def verify_token(authorization: str = Header(...)):
         if not authorization.startswith("Bearer "):
@@ -16,7 +145,7 @@ class Auth_Services:
         token = authorization.split(" ")[1]
 
         try:
-            payload = jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=["HS256"])
+            payload = Auth_Services.decode_token(token)
             return payload  # contains user info like sub, email, etc.
         except Exception as e:
             raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
@@ -0,0 +1,162 @@
+import asyncio
+import os
+from collections import Counter
+from typing import Callable, List
+
+import numpy as np
+from dotenv import load_dotenv
+from rag_backend.services.embedding_pool_service import *
+
+load_dotenv()
+
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+QUERY_BATCH_MAX_WAIT_MS = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "3"))
+DOCUMENT_BATCH_MAX_SIZE = int(
+    os.getenv("DOCUMENT_BATCH_MAX_SIZE", str(EMBEDDING_BATCH_SIZE))
+)
+DOCUMENT_BATCH_MAX_WAIT_MS = float(os.getenv("DOCUMENT_BATCH_MAX_WAIT_MS", "10"))
+
+
+# Texts submitted within max_wait_ms (or until max_batch is reached) share one
+# embedding call; each caller awaits its own future for its row of the result.
+class Embedding_Batcher:
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], np.ndarray],
+        max_batch: int,
+        max_wait_ms: float,
+    ):
+        self.embed_fn = embed_fn
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self._loop: asyncio.AbstractEventLoop = None
+        self._queue: asyncio.Queue = None
+        self._task: asyncio.Task = None
+        # requests taken off the queue but not yet answered, failed by stop()
+        self._in_flight = []
+        self._batch_sizes = Counter()
+        self._batches = 0
+        self._items = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        pending = list(self._in_flight)
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Embedding batcher stopped"))
+        self._in_flight = []
+        self._task = None
+
+    async def embed(self, text: str) -> np.ndarray:
+        if not self.running:
+            return await asyncio.to_thread(lambda: self.embed_fn([text])[0])
+        future = self._loop.create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        if not self.running:
+            return await asyncio.to_thread(self.embed_fn, texts)
+        futures = []
+        for text in texts:
+            future = self._loop.create_future()
+            self._queue.put_nowait((text, future))
+            futures.append(future)
+        return np.stack(await asyncio.gather(*futures))
+
+    def embed_threadsafe(self, text: str) -> np.ndarray:
+        # sync endpoints run in the threadpool and hand their text to the loop
+        if not self.running or self._on_loop_thread():
+            return self.embed_fn([text])[0]
+        return asyncio.run_coroutine_threadsafe(self.embed(text), self._loop).result()
+
+    def stats(self) -> dict:
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": self._batches,
+            "items": self._items,
+            "mean_batch_size": (
+                round(self._items / self._batches, 2) if self._batches else 0
+            ),
+            "batch_size_counts": dict(sorted(self._batch_sizes.items())),
+        }
+
+    def _on_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    async def _collect(self) -> list:
+        batch = self._in_flight = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # requests whose callers went away are dropped before embedding
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await self._loop.run_in_executor(None, self.embed_fn, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                self._in_flight = []
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+            self._in_flight = []
+            self._batches += 1
+            self._items += len(batch)
+            self._batch_sizes[len(batch)] += 1
+
+
+query_batcher = Embedding_Batcher(
+    embed_fn=Embedding_Service.embed_documents,
+    max_batch=QUERY_BATCH_MAX_SIZE,
+    max_wait_ms=QUERY_BATCH_MAX_WAIT_MS,
+)
+
+# ingestion goes to the worker pool when EMBEDDING_WORKERS is set; queries stay
+# on the in-process session so they never queue behind a bulk upload
+document_batcher = Embedding_Batcher(
+    embed_fn=embedding_pool.embed_documents,
+    max_batch=DOCUMENT_BATCH_MAX_SIZE,
+    max_wait_ms=DOCUMENT_BATCH_MAX_WAIT_MS,
+)
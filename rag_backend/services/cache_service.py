@@ -0,0 +1,196 @@
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import List
+
+import numpy as np
+from cachetools import TTLCache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", "3600"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "2048"))
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "1800"))
+ANSWER_CACHE_BUCKET_SIZE = int(os.getenv("ANSWER_CACHE_BUCKET_SIZE", "32"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+
+def normalize_question(question: str) -> str:
+    question = re.sub(r"\s+", " ", question).strip().lower()
+    return question.rstrip("?!. ")
+
+
+class _File_Indexed_Cache(TTLCache):
+    # keeps a file_name -> keys index in step with evictions and expiry, so
+    # every entry built from a file can be dropped when that file changes
+    def __init__(self, maxsize, ttl, files_of):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self._files_of = files_of
+        self._keys_by_file = defaultdict(set)
+
+    def set(self, key, value):
+        self[key] = value
+        for file_name in self._files_of(key):
+            self._keys_by_file[file_name].add(key)
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._unindex(key)
+        return key, value
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        for key, _ in expired:
+            self._unindex(key)
+        return expired
+
+    def invalidate_files(self, file_names: List[str]):
+        for file_name in file_names:
+            # a key built from several files is unindexed from all of them
+            for key in list(self._keys_by_file.get(file_name, ())):
+                self.pop(key, None)
+                self._unindex(key)
+
+    def clear(self):
+        super().clear()
+        self._keys_by_file.clear()
+
+    def _unindex(self, key):
+        for file_name in self._files_of(key):
+            keys = self._keys_by_file.get(file_name)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_file[file_name]
+
+
+class Search_Cache:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._embeddings = TTLCache(
+            maxsize=EMBEDDING_CACHE_SIZE, ttl=EMBEDDING_CACHE_TTL
+        )
+        self._results = _File_Indexed_Cache(
+            maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL, files_of=lambda key: key[1]
+        )
+
+    @staticmethod
+    def results_key(question: str, file_names: List[str], user_id) -> tuple:
+        return (
+            normalize_question(question),
+            tuple(sorted(set(file_names))),
+            user_id,
+        )
+
+    def get_embedding(self, question: str):
+        with self._lock:
+            return self._embeddings.get(normalize_question(question))
+
+    def set_embedding(self, question: str, embedding):
+        with self._lock:
+            self._embeddings[normalize_question(question)] = embedding
+
+    def get_results(self, question: str, file_names: List[str], user_id):
+        with self._lock:
+            return self._results.get(self.results_key(question, file_names, user_id))
+
+    def set_results(self, question: str, file_names: List[str], user_id, contexts):
+        with self._lock:
+            self._results.set(
+                self.results_key(question, file_names, user_id), contexts
+            )
+
+    def invalidate_files(self, file_names: List[str]):
+        with self._lock:
+            self._results.invalidate_files(file_names)
+
+    def clear(self):
+        with self._lock:
+            self._embeddings.clear()
+            self._results.clear()
+
+
+# Answers are bucketed by (sorted file set, retrieved chunk ids, user); the
+# user keeps questions without documents, which share empty file and chunk
+# sets, from being answered across tenants. Within a bucket a stored answer is
+# served when its question embedding is close enough to the new one.
+class Answer_Cache:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._buckets = _File_Indexed_Cache(
+            maxsize=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, files_of=lambda key: key[0]
+        )
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def bucket_key(file_names: List[str], chunk_ids: List[str], user_id) -> tuple:
+        return (
+            tuple(sorted(set(file_names or []))),
+            tuple(sorted(chunk_ids)),
+            user_id,
+        )
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(
+        self, question_vector, file_names: List[str], chunk_ids: List[str], user_id
+    ):
+        key = self.bucket_key(file_names, chunk_ids, user_id)
+        now = time.monotonic()
+        with self._lock:
+            entries = [
+                entry
+                for entry in self._buckets.get(key, [])
+                if now - entry[2] < ANSWER_CACHE_TTL
+            ]
+            if entries:
+                matrix = np.stack([entry[0] for entry in entries])
+                similarities = matrix @ self._unit(question_vector)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= ANSWER_CACHE_SIMILARITY:
+                    self.hits += 1
+                    return entries[best][1]
+            self.misses += 1
+            return None
+
+    def store(self, question_vector, file_names, chunk_ids, user_id, answer: str):
+        key = self.bucket_key(file_names, chunk_ids, user_id)
+        with self._lock:
+            entries = list(self._buckets.get(key, []))
+            entries.append((self._unit(question_vector), answer, time.monotonic()))
+            self._buckets.set(key, entries[-ANSWER_CACHE_BUCKET_SIZE:])
+
+    def invalidate_files(self, file_names: List[str]):
+        with self._lock:
+            self._buckets.invalidate_files(file_names)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+                "buckets": len(self._buckets),
+                "similarity_threshold": ANSWER_CACHE_SIMILARITY,
+            }
+
+
+def invalidate_file_caches(file_names: List[str]):
+    search_cache.invalidate_files(file_names)
+    answer_cache.invalidate_files(file_names)
+
+
+search_cache = Search_Cache()
+answer_cache = Answer_Cache()
@@ -0,0 +1,161 @@
+import importlib.util
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# when disabled, chunk text stays in the Qdrant payload as before
+CHUNK_STORE_ENABLED = os.getenv("CHUNK_STORE_ENABLED", "false").lower() == "true"
+# no default: the store must outlive the container, or every point written
+# while it was on loses its text on redeploy
+CHUNK_STORE_PATH = os.getenv("CHUNK_STORE_PATH")
+CHUNK_STORE_COMPRESSION_LEVEL = int(os.getenv("CHUNK_STORE_COMPRESSION_LEVEL", "3"))
+ZSTD_AVAILABLE = importlib.util.find_spec("zstandard") is not None
+
+# SQLite caps bound parameters per statement
+_MAX_PARAMS = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    point_id TEXT PRIMARY KEY,
+    doc_id INTEGER,
+    codec TEXT NOT NULL,
+    body BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS chunks_doc ON chunks (doc_id);
+"""
+
+
+def _codec():
+    # the codec is stored per row, so installing or removing zstandard never
+    # makes existing rows unreadable
+    if ZSTD_AVAILABLE:
+        import zstandard
+
+        compressor = zstandard.ZstdCompressor(level=CHUNK_STORE_COMPRESSION_LEVEL)
+        return "zstd", compressor.compress
+    return "zlib", lambda data: zlib.compress(data, CHUNK_STORE_COMPRESSION_LEVEL)
+
+
+def _decompress(codec: str, body: bytes) -> str:
+    if codec == "zstd":
+        import zstandard
+
+        data = zstandard.ZstdDecompressor().decompress(body)
+    else:
+        data = zlib.decompress(body)
+    return data.decode("utf-8")
+
+
+def _batches(items: List, size: int = _MAX_PARAMS) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+# Chunk text lives here, compressed and keyed by Qdrant point id, so point
+# payloads only carry ids and filter fields. Search fetches the text of its
+# hits in one query.
+class Chunk_Store:
+    def __init__(self, path: str = CHUNK_STORE_PATH):
+        if not path:
+            raise RuntimeError(
+                "CHUNK_STORE_PATH must point at persistent storage when "
+                "CHUNK_STORE_ENABLED is on"
+            )
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def put_many(self, rows: Iterable[Tuple[str, int, str]]) -> int:
+        codec, compress = _codec()
+        # compressed outside the lock, written in one transaction
+        records = [
+            (point_id, doc_id, codec, compress(text.encode("utf-8")))
+            for point_id, doc_id, text in rows
+        ]
+        if not records:
+            return 0
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO chunks (point_id, doc_id, codec, body) "
+                    "VALUES (?, ?, ?, ?)",
+                    records,
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return len(records)
+
+    def get_many(self, point_ids: Iterable[str]) -> Dict[str, str]:
+        point_ids = list(dict.fromkeys(point_ids))
+        rows = []
+        with self._lock:
+            for batch in _batches(point_ids):
+                placeholders = ",".join("?" * len(batch))
+                rows.extend(
+                    self._db.execute(
+                        "SELECT point_id, codec, body FROM chunks "
+                        f"WHERE point_id IN ({placeholders})",
+                        batch,
+                    ).fetchall()
+                )
+        return {point_id: _decompress(codec, body) for point_id, codec, body in rows}
+
+    def delete_documents(self, doc_ids: Iterable[int]) -> int:
+        deleted = 0
+        with self._lock:
+            for batch in _batches(list(doc_ids)):
+                placeholders = ",".join("?" * len(batch))
+                deleted += self._db.execute(
+                    f"DELETE FROM chunks WHERE doc_id IN ({placeholders})", batch
+                ).rowcount
+        return deleted
+
+    def doc_ids(self, batch_size: int = 1000) -> Iterator[List[int]]:
+        after = None
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT DISTINCT doc_id FROM chunks "
+                    "WHERE doc_id IS NOT NULL AND (? IS NULL OR doc_id > ?) "
+                    "ORDER BY doc_id LIMIT ?",
+                    (after, after, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            yield [doc_id for (doc_id,) in rows]
+            after = rows[-1][0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            chunks, stored_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM chunks"
+            ).fetchone()
+        return {"chunks": chunks, "stored_bytes": stored_bytes}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+chunk_store: Chunk_Store = None
+_chunk_store_lock = threading.Lock()
+
+
+def get_chunk_store() -> Chunk_Store:
+    global chunk_store
+    if chunk_store is None:
+        with _chunk_store_lock:
+            if chunk_store is None:
+                chunk_store = Chunk_Store()
+    return chunk_store
@@ -0,0 +1,450 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import List
+
+import numpy as np
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from rag_backend.services.embedding_service import *
+from rag_backend.services.logging_service import *
+
+load_dotenv()
+
+# 0 keeps embedding in the API process
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "0"))
+# one worker per group, e.g. "0-3;4-7"; unset splits the usable cores evenly
+EMBEDDING_CORE_GROUPS = os.getenv("EMBEDDING_CORE_GROUPS", "")
+# 0 matches the ONNX thread count to the size of the worker's core group
+EMBEDDING_INTRA_OP_THREADS = int(os.getenv("EMBEDDING_INTRA_OP_THREADS", "0"))
+# rows in each worker's shared result buffer; larger calls are split
+EMBEDDING_POOL_MAX_ROWS = int(os.getenv("EMBEDDING_POOL_MAX_ROWS", "256"))
+EMBEDDING_POOL_QUEUE_TIMEOUT_SECONDS = float(
+    os.getenv("EMBEDDING_POOL_QUEUE_TIMEOUT_SECONDS", "30")
+)
+EMBEDDING_POOL_BATCH_TIMEOUT_SECONDS = float(
+    os.getenv("EMBEDDING_POOL_BATCH_TIMEOUT_SECONDS", "120")
+)
+EMBEDDING_POOL_START_TIMEOUT_SECONDS = float(
+    os.getenv("EMBEDDING_POOL_START_TIMEOUT_SECONDS", "300")
+)
+EMBEDDING_POOL_HEALTH_INTERVAL_SECONDS = float(
+    os.getenv("EMBEDDING_POOL_HEALTH_INTERVAL_SECONDS", "10")
+)
+
+
+def parse_core_groups(spec: str) -> List[List[int]]:
+    groups = []
+    for group in spec.split(";"):
+        cores = []
+        for part in group.split(","):
+            part = part.strip()
+            if "-" in part:
+                first, last = part.split("-")
+                cores.extend(range(int(first), int(last) + 1))
+            elif part:
+                cores.append(int(part))
+        if cores:
+            groups.append(cores)
+    return groups
+
+
+def default_core_groups(workers: int) -> List[List[int]]:
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    # contiguous ranges keep a worker on neighbouring cores; with more workers
+    # than cores, workers share single cores
+    size = max(1, len(cores) // max(1, workers))
+    return [
+        cores[i * size : (i + 1) * size] or [cores[i % len(cores)]]
+        for i in range(workers)
+    ]
+
+
+def load_text_embedding(threads: int = None):
+    from fastembed import TextEmbedding
+
+    return TextEmbedding(model_name=EMBEDDING_MODEL, threads=threads)
+
+
+def _worker_main(conn, buffer, cores, threads, engine_factory):
+    # runs in a spawned process: pin, size the ONNX session, then serve
+    # requests one at a time, writing vectors straight into shared memory
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    vectors = np.frombuffer(buffer, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+    engine = engine_factory(threads=threads)
+    try:
+        # also the warm-up run
+        Embedding_Service.check_dimension(engine)
+    except RuntimeError as e:
+        conn.send(("error", str(e)))
+        return
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if message is None:
+            return
+        if message[0] == "ping":
+            conn.send(("pong",))
+            continue
+        texts = message[1]
+        try:
+            for i, vector in enumerate(
+                engine.embed(texts, batch_size=EMBEDDING_BATCH_SIZE)
+            ):
+                vectors[i] = vector
+            conn.send(("ok", len(texts)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Worker_Failed(Exception):
+    pass
+
+
+class _Embedding_Worker:
+    def __init__(self, ctx, index, cores, threads, engine_factory):
+        self.index = index
+        self.cores = cores
+        self.buffer = ctx.RawArray("f", EMBEDDING_POOL_MAX_ROWS * EMBEDDING_DIM)
+        self.vectors = np.frombuffer(self.buffer, dtype=np.float32).reshape(
+            EMBEDDING_POOL_MAX_ROWS, EMBEDDING_DIM
+        )
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.buffer, cores, threads, engine_factory),
+            name=f"embedding-worker-{index}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def wait_ready(self, timeout: float):
+        message = self._receive(timeout)
+        if message[0] == "error":
+            # a misconfiguration, which no restart would fix
+            raise RuntimeError(message[1])
+        if message[0] != "ready":
+            raise _Worker_Failed(f"unexpected startup message {message[0]!r}")
+
+    def send(self, message):
+        try:
+            self.conn.send(message)
+        except (OSError, ValueError) as e:
+            raise _Worker_Failed(f"send failed: {e}")
+
+    def receive_vectors(self, out: np.ndarray, timeout: float):
+        message = self._receive(timeout)
+        if message[0] == "error":
+            raise RuntimeError(f"Embedding worker failed: {message[1]}")
+        out[:] = self.vectors[: message[1]]
+
+    def ping(self, timeout: float) -> bool:
+        try:
+            self.send(("ping",))
+            return self._receive(timeout)[0] == "pong"
+        except _Worker_Failed:
+            return False
+
+    def close(self, graceful: bool = True):
+        if graceful and self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+    def _receive(self, timeout: float):
+        try:
+            if not self.conn.poll(timeout):
+                raise _Worker_Failed(f"no reply within {timeout:g}s")
+            return self.conn.recv()
+        except (EOFError, OSError) as e:
+            raise _Worker_Failed(f"worker exited: {e}")
+
+
+# A fixed set of embedding processes, one per core group. Callers check out
+# idle workers, so at most one batch runs per worker and everyone else waits
+# (up to EMBEDDING_POOL_QUEUE_TIMEOUT_SECONDS) instead of oversubscribing the
+# cores. A call is split across every idle worker, each slice comes back
+# through that worker's shared buffer, and workers that die, hang or fail a
+# health check are replaced by the monitor thread.
+class Embedding_Pool:
+    def __init__(self, core_groups=None, threads: int = None, engine_factory=None):
+        self.core_groups = core_groups
+        self.threads = threads
+        self.engine_factory = engine_factory or load_text_embedding
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers = []
+        self._idle: queue.Queue = None
+        self._broken: queue.Queue = None
+        self._monitor: threading.Thread = None
+        self._replacing: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._error = None
+        self._restarts = 0
+        self._batches = 0
+        self._rows = 0
+        self._stats_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._monitor is not None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._core_groups())
+
+    def start(self):
+        if self.running:
+            return
+        self._idle = queue.Queue()
+        self._broken = queue.Queue()
+        self._stop.clear()
+        self._error = None
+        started = time.perf_counter()
+        self._workers = [
+            self._spawn(index, cores)
+            for index, cores in enumerate(self._core_groups())
+        ]
+        try:
+            for worker in self._workers:
+                worker.wait_ready(EMBEDDING_POOL_START_TIMEOUT_SECONDS)
+        except BaseException:
+            for worker in self._workers:
+                worker.close(graceful=False)
+            self._workers = []
+            raise
+        for worker in self._workers:
+            self._idle.put(worker)
+        self._monitor = threading.Thread(
+            target=self._run_monitor, name="embedding-pool-monitor", daemon=True
+        )
+        self._monitor.start()
+        logger.info(
+            "Embedding workers started",
+            extra={
+                "workers": len(self._workers),
+                "core_groups": [worker.cores for worker in self._workers],
+                "startup_ms": round((time.perf_counter() - started) * 1000, 1),
+            },
+        )
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        self._broken.put(None)
+        self._monitor.join()
+        self._monitor = None
+        for thread in self._replacing:
+            thread.join()
+        self._replacing = []
+        for worker in self._workers:
+            worker.close()
+        self._workers = []
+
+    @property
+    def error(self):
+        return self._error
+
+    def is_warm(self) -> bool:
+        if not self.enabled:
+            return True
+        return self.running and self._error is None
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        if not self.running:
+            return Embedding_Service.embed_documents(texts)
+        out = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        if not texts:
+            return out
+        rows = min(
+            EMBEDDING_POOL_MAX_ROWS, -(-len(texts) // max(1, len(self._workers)))
+        )
+        slices = deque((start, 0) for start in range(0, len(texts), rows))
+        workers = self._checkout(len(slices))
+        try:
+            while slices:
+                sent = []
+                for worker in list(workers):
+                    if not slices:
+                        break
+                    start, attempts = slices.popleft()
+                    try:
+                        worker.send(("embed", texts[start : start + rows]))
+                    except _Worker_Failed as e:
+                        slices.appendleft((start, attempts))
+                        self._retire(worker, workers, e)
+                        continue
+                    sent.append((worker, start, attempts))
+                # every sent slice is collected, even after a failure, so no
+                # worker is handed back with a reply still in its pipe
+                failure = None
+                for worker, start, attempts in sent:
+                    try:
+                        worker.receive_vectors(
+                            out[start : start + rows],
+                            EMBEDDING_POOL_BATCH_TIMEOUT_SECONDS,
+                        )
+                    except _Worker_Failed as e:
+                        self._retire(worker, workers, e)
+                        if attempts:
+                            failure = failure or RuntimeError(
+                                f"Embedding failed after a worker restart: {e}"
+                            )
+                        slices.append((start, attempts + 1))
+                    except RuntimeError as e:
+                        failure = failure or e
+                if failure is not None:
+                    raise failure
+                if slices and not workers:
+                    workers = self._checkout(len(slices))
+        finally:
+            for worker in workers:
+                self._idle.put(worker)
+        with self._stats_lock:
+            self._batches += 1
+            self._rows += len(texts)
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "idle": self._idle.qsize() if self.running else 0,
+            "core_groups": [worker.cores for worker in self._workers],
+            "restarts": self._restarts,
+            "batches": self._batches,
+            "rows": self._rows,
+        }
+
+    def _core_groups(self):
+        if self.core_groups is not None:
+            return self.core_groups
+        if EMBEDDING_CORE_GROUPS:
+            return parse_core_groups(EMBEDDING_CORE_GROUPS)
+        return default_core_groups(EMBEDDING_WORKERS) if EMBEDDING_WORKERS else []
+
+    def _spawn(self, index, cores):
+        threads = self.threads or EMBEDDING_INTRA_OP_THREADS or len(cores)
+        return _Embedding_Worker(self._ctx, index, cores, threads, self.engine_factory)
+
+    def _checkout(self, wanted: int) -> list:
+        # the first worker is waited for; any others only if already idle
+        try:
+            workers = [self._idle.get(timeout=EMBEDDING_POOL_QUEUE_TIMEOUT_SECONDS)]
+        except queue.Empty:
+            raise HTTPException(
+                status_code=503, detail="Embedding workers are saturated"
+            )
+        while len(workers) < wanted:
+            try:
+                workers.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        return workers
+
+    def _retire(self, worker, workers: list, error):
+        logger.warning(
+            "Embedding worker failed, restarting",
+            extra={"worker": worker.index, "error": str(error)},
+        )
+        workers.remove(worker)
+        self._broken.put(worker)
+
+    def _replace(self, worker):
+        worker.close(graceful=False)
+        while not self._stop.is_set():
+            replacement = self._spawn(worker.index, worker.cores)
+            try:
+                replacement.wait_ready(EMBEDDING_POOL_START_TIMEOUT_SECONDS)
+            except _Worker_Failed as e:
+                logger.error(
+                    "Embedding worker restart failed",
+                    extra={"worker": worker.index, "error": str(e)},
+                )
+                replacement.close(graceful=False)
+                self._stop.wait(EMBEDDING_POOL_HEALTH_INTERVAL_SECONDS)
+                continue
+            except RuntimeError as e:
+                # the worker came up but rejected its configuration; retrying
+                # cannot help, so the slot is dropped and /ready reports it
+                logger.error(
+                    "Embedding worker restart failed, not retrying",
+                    extra={"worker": worker.index, "error": str(e)},
+                )
+                replacement.close(graceful=False)
+                with self._stats_lock:
+                    self._workers.remove(worker)
+                    self._error = f"Embedding worker {worker.index}: {e}"
+                return
+            with self._stats_lock:
+                self._workers[self._workers.index(worker)] = replacement
+                self._restarts += 1
+            self._idle.put(replacement)
+            return
+
+    def _replace_async(self, worker):
+        # a restart can take up to the start timeout, so each runs on its own
+        # thread and neither health checks nor other restarts wait for it
+        self._replacing = [t for t in self._replacing if t.is_alive()]
+        thread = threading.Thread(
+            target=self._replace,
+            args=(worker,),
+            name=f"embedding-worker-{worker.index}-restart",
+            daemon=True,
+        )
+        self._replacing.append(thread)
+        thread.start()
+
+    def _health_check(self):
+        # only idle workers are pinged, one at a time, each handed back as
+        # soon as it answers; busy ones are covered by the batch timeout in
+        # embed_documents
+        for _ in range(self._idle.qsize()):
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if worker.process.is_alive() and worker.ping(timeout=5):
+                self._idle.put(worker)
+            else:
+                logger.warning(
+                    "Embedding worker failed its health check",
+                    extra={"worker": worker.index},
+                )
+                self._replace_async(worker)
+
+    def _run_monitor(self):
+        while not self._stop.is_set():
+            try:
+                worker = self._broken.get(
+                    timeout=EMBEDDING_POOL_HEALTH_INTERVAL_SECONDS
+                )
+            except queue.Empty:
+                worker = None
+            try:
+                if worker is not None:
+                    self._replace_async(worker)
+                elif not self._stop.is_set():
+                    self._health_check()
+            except Exception:
+                logger.exception("Embedding pool monitor error")
+
+
+embedding_pool = Embedding_Pool()
@@ -0,0 +1,70 @@
+import os
+import threading
+from typing import List
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# sizes every vector buffer and the collection before any model has loaded,
+# so it has to match EMBEDDING_MODEL; checked whenever a model loads
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
+
+# fastembed pulls in onnxruntime, so it is only imported when the model loads
+_engine = None
+_engine_lock = threading.Lock()
+_warm = threading.Event()
+
+
+class Embedding_Service:
+    @staticmethod
+    def load():
+        global _engine
+        if _engine is None:
+            with _engine_lock:
+                if _engine is None:
+                    from fastembed import TextEmbedding
+
+                    engine = TextEmbedding(model_name=EMBEDDING_MODEL)
+                    Embedding_Service.check_dimension(engine)
+                    _engine = engine
+        return _engine
+
+    @staticmethod
+    def check_dimension(engine):
+        vectors = list(engine.embed(["warm up"] * 2))
+        if len(vectors[0]) != EMBEDDING_DIM:
+            raise RuntimeError(
+                f"{EMBEDDING_MODEL} produces {len(vectors[0])}-dimensional "
+                f"vectors but EMBEDDING_DIM is {EMBEDDING_DIM}"
+            )
+
+    @staticmethod
+    def warm_up():
+        # the first ONNX run allocates its arena, so pay for it before the
+        # instance reports ready
+        Embedding_Service.embed_documents(["warm up"] * 2)
+        _warm.set()
+
+    @staticmethod
+    def is_warm() -> bool:
+        return _warm.is_set()
+
+    @staticmethod
+    def embed_documents(texts: List[str], batch_size: int = None) -> np.ndarray:
+        if not texts:
+            return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        engine = Embedding_Service.load()
+        vectors = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        for i, vector in enumerate(
+            engine.embed(texts, batch_size=batch_size or EMBEDDING_BATCH_SIZE)
+        ):
+            vectors[i] = vector
+        return vectors
+
+    @staticmethod
+    def embed_query(text: str) -> np.ndarray:
+        return Embedding_Service.embed_documents([text])[0]
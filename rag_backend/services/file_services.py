@@ -1,25 +1,48 @@
+import asyncio
+import json
 import os
+import time
 import uuid
 from typing import Any, Callable, Dict, List
 
+import numpy as np
 from dotenv import load_dotenv
 from fastapi import File, HTTPException, UploadFile
-from fastembed import TextEmbedding
-from qdrant_client import QdrantClient
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import StreamingResponse
 from qdrant_client.http import models as qmodels
 from rag_backend.parsers import *
 from rag_backend.serilalizers import *
+from rag_backend.services.batching_service import *
+from rag_backend.services.cache_service import *
+from rag_backend.services.chunk_store_service import *
+from rag_backend.services.embedding_service import *
+from rag_backend.services.ingestion_service import *
+from rag_backend.services.job_service import *
 from rag_backend.services.llm_service import *
+from rag_backend.services.metrics_service import *
+from rag_backend.services.parsing_service import *
+from rag_backend.services.profiler_service import *
+from rag_backend.services.quantization_service import *
+from rag_backend.services.signed_url_service import *
+from rag_backend.services.tenant_service import *
+from rag_backend.services.upsert_service import *
 
 load_dotenv()
 
-QDRANT_URL = os.getenv("QDRANT_URL")
-QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
-
-qdrant_client = QdrantClient(
-    url=QDRANT_URL,
-    api_key=QDRANT_API_KEY,
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+JOBS_SPOOL_DIR = os.getenv("JOBS_SPOOL_DIR") or os.path.join(
+    INGEST_SPOOL_DIR, "rag-jobs"
 )
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "200"))
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "500"))
+# columns a client may ask for when projecting a listing
+USER_TABLE_FIELDS = {
+    "questions": ("id", "created_at", "chat_space", "question", "response"),
+    "documents": ("id", "created_at", "doc_name", "doc_size"),
+}
+POINT_ID_NAMESPACE = uuid.UUID("657c9b34-2048-496d-9dae-f252291ad8ae")
 
 
 def safe_supabase_database_action(action: Callable[[], Any]) -> Dict[str, Any]:
@@ -66,22 +89,25 @@ def safe_supabase_storage_action(action: Callable[[], Any]) -> Dict[str, Any]:
         )
 
 
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _ignore_stage(stage: str, progress: dict = None):
+    # stage reports only matter to queued jobs
+    pass
+
+
 class File_Services:
     @staticmethod
     def chunk_to_embeddings(text):
-        chunk_size = 500
-        words = text.split()
-        chunks = [
-            " ".join(words[i : i + chunk_size])
-            for i in range(0, len(words), chunk_size)
-        ]
-        embeddings = TextEmbedding().embed(chunks)
-        return list(embeddings), chunks
+        chunks = list(Ingestion_Service.iter_chunks([text]))
+        embeddings = embedding_pool.embed_documents(chunks)
+        return embeddings, chunks
 
     @staticmethod
     def query_embedding(text):
-        embeddings = TextEmbedding().embed([text])
-        return list(embeddings)[0].tolist()
+        return query_batcher.embed_threadsafe(text).tolist()
 
     @staticmethod
     def insert_question(db, question, chat_space, user_id):
@@ -105,48 +131,231 @@ class File_Services:
         return response
 
     @staticmethod
-    def get_user_single_doc_public_path(db, id, store):
+    def get_user_single_doc_public_path(db, id, store, user_id):
         database_response = safe_supabase_database_action(
-            lambda: db.table("documents").select("*").eq("id", id).execute()
-        )
-        storage_response = safe_supabase_storage_action(
-            lambda: store.storage.from_("user_docs").create_signed_url(
-                str(database_response["data"][0]["id"]), 3600
-            )
+            lambda: db.table("documents")
+            .select("id")
+            .eq("id", id)
+            .eq("user_id", user_id)
+            .execute()
         )
-        print(storage_response)
-        return storage_response
+        if not database_response["data"]:
+            raise HTTPException(status_code=404, detail="Document not found")
+        path = str(database_response["data"][0]["id"])
+        url = safe_supabase_storage_action(
+            lambda: Signed_Url_Service.signed_urls(store, [path])
+        )["data"].get(path)
+        return {
+            "success": True,
+            "data": {"signedURL": url, "signedUrl": url},
+            "error": None,
+        }
 
     @staticmethod
     def get_user_multiple_docs_public_path(db, user_id, store):
         database_response = safe_supabase_database_action(
-            lambda: db.table("documents").select("*").eq("user_id", user_id).execute()
+            lambda: db.table("documents")
+            .select("id")
+            .eq("user_id", user_id)
+            .order("id", desc=True)
+            .execute()
         )
-        path = []
-        for docs in database_response["data"]:
-            storage_response = safe_supabase_storage_action(
-                lambda: store.storage.from_("user_docs").get_public_url(str(docs["id"]))
+        paths = [str(doc["id"]) for doc in database_response["data"]]
+        # one signing request per batch instead of one per document
+        urls = safe_supabase_storage_action(
+            lambda: Signed_Url_Service.signed_urls(store, paths)
+        )["data"]
+        return [urls.get(path) for path in paths]
+
+    @staticmethod
+    def point_id(doc_id, chunk_hash):
+        return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{doc_id}:{chunk_hash}"))
+
+    @staticmethod
+    def document_filter(doc_ids, user_id=None):
+        conditions = [
+            qmodels.FieldCondition(
+                key="doc_id", match=qmodels.MatchAny(any=list(doc_ids))
+            )
+        ]
+        if user_id is not None:
+            conditions.append(
+                qmodels.FieldCondition(
+                    key="user_id", match=qmodels.MatchValue(value=user_id)
+                )
             )
-            path.append(storage_response["data"]["result"])
-        return path
+        return qmodels.Filter(must=conditions)
 
     @staticmethod
-    def store_embeddings(chunks, embeddings, vdb, file_name):
-        if embeddings:
-            vector_db_response = vdb.upsert(
-                collection_name="user_docs",
-                points=[
-                    qmodels.PointStruct(
-                        id=str(uuid.uuid4()),
-                        vector=embedd,
-                        payload={
-                            "file_name": file_name,
-                            "text": chunk,
-                        },
-                    )
-                    for chunk, embedd in zip(chunks, embeddings)
+    def delete_document_vectors(vdb, doc_ids, user_id=None):
+        response = vdb.delete(
+            collection_name="user_docs",
+            points_selector=qmodels.FilterSelector(
+                filter=File_Services.document_filter(doc_ids, user_id)
+            ),
+            wait=True,
+            shard_key_selector=Tenant_Service.shard_key(user_id),
+        )
+        # text goes after the points, so no search hit is left without it
+        if CHUNK_STORE_ENABLED:
+            get_chunk_store().delete_documents(doc_ids)
+        return response
+
+    @staticmethod
+    def chunk_texts(points):
+        # text is either in the payload or in the chunk store; points whose
+        # text was in a chunk store that is now gone or switched off have none
+        texts = {
+            str(point.id): point.payload["text"]
+            for point in points
+            if point.payload and "text" in point.payload
+        }
+        missing = [str(point.id) for point in points if str(point.id) not in texts]
+        if missing and CHUNK_STORE_ENABLED:
+            with span("chunk_text"):
+                texts.update(get_chunk_store().get_many(missing))
+        return texts
+
+    @staticmethod
+    def find_document(vdb, user_id, file_name, doc_hash):
+        points, _ = vdb.scroll(
+            collection_name="user_docs",
+            scroll_filter=Tenant_Service.user_filter(
+                user_id,
+                [
+                    qmodels.FieldCondition(
+                        key="file_name", match=qmodels.MatchValue(value=file_name)
+                    ),
+                    qmodels.FieldCondition(
+                        key="doc_hash", match=qmodels.MatchValue(value=doc_hash)
+                    ),
                 ],
+            ),
+            shard_key_selector=Tenant_Service.shard_key(user_id),
+            limit=1,
+            with_payload=["doc_id", "text"],
+            with_vectors=False,
+        )
+        if not points:
+            return None
+        return {
+            "doc_id": points[0].payload.get("doc_id"),
+            "has_text": bool(File_Services.chunk_texts(points)),
+        }
+
+    @staticmethod
+    def lookup_chunk_vectors(vdb, chunk_hashes, user_id):
+        known = {}
+        wanted = set(chunk_hashes)
+        offset = None
+        while wanted:
+            points, offset = vdb.scroll(
+                collection_name="user_docs",
+                # only the caller's own points, so no tenant's vectors are
+                # reused for another, and sharded lookups stay on one shard
+                scroll_filter=Tenant_Service.user_filter(
+                    user_id,
+                    [
+                        qmodels.FieldCondition(
+                            key="chunk_hash", match=qmodels.MatchAny(any=list(wanted))
+                        )
+                    ],
+                ),
+                shard_key_selector=Tenant_Service.shard_key(user_id),
+                limit=len(wanted),
+                offset=offset,
+                with_payload=["chunk_hash"],
+                with_vectors=True,
+            )
+            for point in points:
+                chunk_hash = point.payload["chunk_hash"]
+                if chunk_hash in wanted:
+                    known[chunk_hash] = point.vector
+                    wanted.discard(chunk_hash)
+            if offset is None:
+                break
+        return known
+
+    @staticmethod
+    async def embed_chunks(vdb, chunks, chunk_hashes, user_id):
+        # chunks the user already stored in any document reuse their vectors
+        known = await run_in_threadpool(
+            File_Services.lookup_chunk_vectors, vdb, chunk_hashes, user_id
+        )
+        missing = [i for i, h in enumerate(chunk_hashes) if h not in known]
+        new_embeddings = await document_batcher.embed_many(
+            [chunks[i] for i in missing]
+        )
+        embeddings = np.empty((len(chunks), EMBEDDING_DIM), dtype=np.float32)
+        for i, chunk_hash in enumerate(chunk_hashes):
+            if chunk_hash in known:
+                embeddings[i] = known[chunk_hash]
+        embeddings[missing] = new_embeddings
+        return embeddings
+
+    @staticmethod
+    def build_points(
+        chunks, embeddings, file_name, doc_hash, chunk_hashes, doc_id, user_id
+    ):
+        points = []
+        for chunk, chunk_hash, embedd in zip(chunks, chunk_hashes, embeddings):
+            payload = {
+                "doc_id": doc_id,
+                "user_id": user_id,
+                "file_name": file_name,
+                "doc_hash": doc_hash,
+                "chunk_hash": chunk_hash,
+            }
+            # with the chunk store on, payloads carry only ids and filter fields
+            if not CHUNK_STORE_ENABLED:
+                payload["text"] = chunk
+            points.append(
+                qmodels.PointStruct(
+                    id=File_Services.point_id(doc_id, chunk_hash),
+                    vector=embedd.tolist(),
+                    payload=payload,
+                )
+            )
+        return points
+
+    @staticmethod
+    def store_embeddings(
+        chunks,
+        embeddings,
+        vdb,
+        file_name,
+        doc_id,
+        user_id,
+        doc_hash=None,
+        chunk_hashes=None,
+        writer: Bulk_Upserter = None,
+    ):
+        if len(embeddings):
+            if chunk_hashes is None:
+                chunk_hashes = [Ingestion_Service.hash_text(c) for c in chunks]
+            points = File_Services.build_points(
+                chunks=chunks,
+                embeddings=embeddings,
+                file_name=file_name,
+                doc_hash=doc_hash,
+                chunk_hashes=chunk_hashes,
+                doc_id=doc_id,
+                user_id=user_id,
             )
+            if CHUNK_STORE_ENABLED:
+                # text is stored before its point, so every hit can be resolved
+                get_chunk_store().put_many(
+                    (point.id, doc_id, chunk) for point, chunk in zip(points, chunks)
+                )
+            if writer is not None:
+                writer.add(points)
+                vector_db_response = {"queued": len(points)}
+            else:
+                writer = Bulk_Upserter(
+                    vdb, shard_key=Tenant_Service.shard_key(user_id)
+                )
+                writer.add(points)
+                vector_db_response = writer.flush()
             return {
                 "data": vector_db_response,
                 "success": True,
@@ -158,32 +367,12 @@ class File_Services:
             }
 
     @staticmethod
-    def parse_uploaded_docs(mime_type, file_bytes):
-        if mime_type == "application/pdf":
-            return {
-                "data": Parsers.pdf_parser_from_upload(pdf_bytes=file_bytes),
-                "success": True,
-            }
-        elif (
-            mime_type
-            == "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-        ):
-            return {
-                "data": Parsers.word_parser_from_upload(file_bytes=file_bytes),
-                "success": True,
-            }
-        elif (
-            mime_type == "image/png"
-            or mime_type == "image/jpeg"
-            or mime_type == "image/webp"
-        ):
-            return {
-                "data": Parsers.image_parser_from_upload(image_bytes=file_bytes),
-                "success": True,
-            }
-        elif mime_type == "text/plain":
+    async def parse_uploaded_docs(mime_type, file_path):
+        if Ingestion_Service.is_supported(mime_type):
             return {
-                "data": (file_bytes).decode("utf-8"),
+                "data": await Parsing_Service.extract_text(
+                    mime_type=mime_type, file_path=file_path
+                ),
                 "success": True,
             }
         else:
@@ -193,52 +382,109 @@ class File_Services:
             }
 
     @staticmethod
-    def vector_db_semantic_search(vdb, question: str, file_names: List[str]):
-        embeddings = File_Services.query_embedding(text=question)
-        print(file_names)
-        filter_condition = qmodels.Filter(
-            must=[
+    def cached_query_embedding(question: str):
+        embeddings = search_cache.get_embedding(question)
+        if embeddings is None:
+            with span("embed"):
+                embeddings = File_Services.query_embedding(text=question)
+            search_cache.set_embedding(question, embeddings)
+        return embeddings
+
+    @staticmethod
+    def vector_db_semantic_search(vdb, question: str, file_names: List[str], user_id):
+        cached_contexts = search_cache.get_results(question, file_names, user_id)
+        if cached_contexts is not None:
+            return cached_contexts
+        embeddings = File_Services.cached_query_embedding(question)
+        # always scoped to the caller, so only their own points are scored
+        filter_condition = Tenant_Service.user_filter(
+            user_id,
+            [
                 qmodels.FieldCondition(
                     key="file_name",
                     match=qmodels.MatchAny(any=file_names),
                 )
-            ]
+            ],
         )
-        search_result = vdb.search(
-            collection_name="user_docs",
-            query_vector=embeddings,
-            query_filter=filter_condition,
-            limit=5,
+        with span("search"):
+            search_result = vdb.search(
+                collection_name="user_docs",
+                query_vector=embeddings,
+                query_filter=filter_condition,
+                limit=5,
+                search_params=Quantization_Service.search_params(),
+                shard_key_selector=Tenant_Service.shard_key(user_id),
+                # only points written without the chunk store carry text
+                with_payload=["text", "file_name"],
+            )
+        texts = File_Services.chunk_texts(search_result)
+        lost = sorted(
+            {
+                hit.payload.get("file_name")
+                for hit in search_result
+                if str(hit.id) not in texts
+            }
         )
-        contexts = []
-        for hit in search_result:
-            payload = hit.payload
-            score = str(hit.score)
-            if "text" in payload:
-                contexts.append({"text": payload["text"], "score": score})
+        if lost:
+            # answering from the remaining hits would silently drop context
+            logger.error(
+                "Chunk text missing for search hits",
+                extra={"file_names": lost, "chunk_store": CHUNK_STORE_ENABLED},
+            )
+            raise HTTPException(
+                status_code=409,
+                detail=f"Stored text is missing for {', '.join(lost)}; "
+                "upload these documents again",
+            )
+        contexts = [
+            {
+                "id": str(hit.id),
+                "text": texts[str(hit.id)],
+                "score": str(hit.score),
+            }
+            for hit in search_result
+        ]
+        search_cache.set_results(question, file_names, user_id, contexts)
         return contexts
 
+    @staticmethod
+    def build_prompt(vdb, question, file_names, user_id):
+        if file_names:
+            vdb_context = File_Services.vector_db_semantic_search(
+                vdb=vdb, question=question, file_names=file_names, user_id=user_id
+            )[:3]
+            prompt = f"question: {question}, context: " + "\n\n".join(
+                [r["text"] for r in vdb_context]
+            )
+            return prompt, [r["id"] for r in vdb_context]
+        return question, []
+
     @staticmethod
     def generate_from_context(vdb, db, chat_space, question, file_names, user_id):
-        question_response = File_Services.insert_question(
-            db=db, chat_space=chat_space, question=question, user_id=user_id
-        )
+        with span("insert_question"):
+            question_response = File_Services.insert_question(
+                db=db, chat_space=chat_space, question=question, user_id=user_id
+            )
         if question_response["success"]:
-            if file_names:
-                vdb_context = File_Services.vector_db_semantic_search(
-                    vdb=vdb, question=question, file_names=file_names
+            context, chunk_ids = File_Services.build_prompt(
+                vdb=vdb, question=question, file_names=file_names, user_id=user_id
+            )
+            question_vector = File_Services.cached_query_embedding(question)
+            llm_response = answer_cache.lookup(
+                question_vector, file_names, chunk_ids, user_id
+            )
+            if llm_response is None:
+                with span("llm"):
+                    llm_response = LlmService.generate_blog(prompt=context)
+                answer_cache.store(
+                    question_vector, file_names, chunk_ids, user_id, llm_response
                 )
-                context = f"question: {question}, context: " + "\n\n".join(
-                    [r["text"] for r in vdb_context[:3]]
+            with span("insert_response"):
+                response_insertion = File_Services.insert_response(
+                    question_id=question_response["data"][0]["id"],
+                    response=llm_response,
+                    db=db,
                 )
-            else:
-                context = question
-            llm_response = LlmService.generate_blog(prompt=context)
-            response_insertion = File_Services.insert_response(
-                question_id=question_response["data"][0]["id"],
-                response=llm_response,
-                db=db,
-            )
             if response_insertion["success"]:
                 return {
                     "data": llm_response,
@@ -256,66 +502,377 @@ class File_Services:
             }
 
     @staticmethod
-    async def upload_single_file(
+    def stream_from_context(vdb, db, chat_space, question, file_names, user_id):
+        # storage and retrieval happen before the stream opens so their errors
+        # still surface as regular HTTP errors
+        with span("insert_question"):
+            question_response = File_Services.insert_question(
+                db=db, chat_space=chat_space, question=question, user_id=user_id
+            )
+        if not question_response["success"]:
+            return {
+                "data": "Error inserting data",
+                "success": False,
+            }
+        context, chunk_ids = File_Services.build_prompt(
+            vdb=vdb, question=question, file_names=file_names, user_id=user_id
+        )
+        answer_key = (
+            File_Services.cached_query_embedding(question),
+            file_names,
+            chunk_ids,
+            user_id,
+        )
+        return StreamingResponse(
+            File_Services.stream_answer(
+                db=db,
+                question_id=question_response["data"][0]["id"],
+                prompt=context,
+                answer_key=answer_key,
+                cached_answer=answer_cache.lookup(*answer_key),
+            ),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @staticmethod
+    async def stream_answer(db, question_id, prompt, answer_key, cached_answer=None):
+        started = time.perf_counter()
+        ttft_ms = None
+        parts = []
+        if cached_answer is not None:
+            tokens = File_Services._replay_answer(cached_answer)
+        else:
+            tokens = LlmService.stream_blog(prompt=prompt)
+        try:
+            with span("llm_stream"):
+                async for token in tokens:
+                    if ttft_ms is None:
+                        ttft_ms = round((time.perf_counter() - started) * 1000, 2)
+                    parts.append(token)
+                    yield sse_event("token", {"text": token})
+        except Exception as e:
+            logger.error("LLM stream failed: %s", e)
+            yield sse_event("error", {"data": str(e), "success": False})
+            return
+        llm_response = "".join(parts)
+        if cached_answer is None:
+            answer_cache.store(*answer_key, llm_response)
+        try:
+            with span("insert_response"):
+                response_insertion = await run_in_threadpool(
+                    File_Services.insert_response,
+                    question_id=question_id,
+                    response=llm_response,
+                    db=db,
+                )
+        except HTTPException as e:
+            response_insertion = {"success": False, "error": e.detail}
+        yield sse_event(
+            "done",
+            {
+                "success": response_insertion["success"],
+                "data": (
+                    None
+                    if response_insertion["success"]
+                    else "Your response was not stored"
+                ),
+                "cached": cached_answer is not None,
+                "ttft_ms": ttft_ms,
+                "total_ms": round((time.perf_counter() - started) * 1000, 2),
+            },
+        )
+
+    @staticmethod
+    async def _replay_answer(answer: str):
+        yield answer
+
+    @staticmethod
+    async def ingest_spooled_file(
+        vdb, file_path, mime_type, file_name, doc_hash, doc_id, user_id, on_stage=None
+    ):
+        on_stage = on_stage or _ignore_stage
+        await on_stage("parse")
+        with span("parse"):
+            parsing = await File_Services.parse_uploaded_docs(
+                mime_type=mime_type,
+                file_path=file_path,
+            )
+        if not parsing["success"]:
+            return parsing
+        text_path = parsing["data"]
+        stored_chunks = 0
+        shard_key = await run_in_threadpool(Tenant_Service.ensure_shard, vdb, user_id)
+        writer = Bulk_Upserter(vdb, shard_key=shard_key)
+        await on_stage("embed_upsert")
+        try:
+            chunks = Ingestion_Service.iter_chunks(
+                Parsers.text_blocks_from_path(text_path)
+            )
+            # extracted text is chunked, embedded and upserted one batch at a time
+            async for batch in iterate_in_threadpool(
+                Ingestion_Service.iter_batches(chunks)
+            ):
+                chunk_hashes = [Ingestion_Service.hash_text(c) for c in batch]
+                with span("embed"):
+                    embeddings = await File_Services.embed_chunks(
+                        vdb=vdb,
+                        chunks=batch,
+                        chunk_hashes=chunk_hashes,
+                        user_id=user_id,
+                    )
+                with span("upsert"):
+                    await run_in_threadpool(
+                        File_Services.store_embeddings,
+                        chunks=batch,
+                        embeddings=embeddings,
+                        vdb=vdb,
+                        file_name=file_name,
+                        doc_id=doc_id,
+                        user_id=user_id,
+                        doc_hash=doc_hash,
+                        chunk_hashes=chunk_hashes,
+                        writer=writer,
+                    )
+                stored_chunks += len(batch)
+                await on_stage("embed_upsert", {"chunks": stored_chunks})
+            with span("upsert"):
+                upsert_stats = await run_in_threadpool(writer.flush)
+            logger.info(
+                "Upserted points",
+                extra={
+                    "file_name": file_name,
+                    "doc_id": doc_id,
+                    "points": upsert_stats["points"],
+                    "points_per_second": upsert_stats["points_per_second"],
+                },
+            )
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            if text_path != file_path:
+                Ingestion_Service.remove_spool(text_path)
+        if not stored_chunks:
+            return {
+                "data": "Uploaded doc is not parsable",
+                "success": False,
+            }
+        return {
+            "data": stored_chunks,
+            "success": True,
+        }
+
+    @staticmethod
+    def create_document(db, user_id, file_name, file_size):
+        database_response = safe_supabase_database_action(
+            lambda: db.table("documents")
+            .insert(
+                {
+                    "doc_name": file_name,
+                    "user_id": user_id,
+                    "doc_size": round(file_size / 1024, 2),
+                }
+            )
+            .execute()
+        )
+        return database_response["data"][0]["id"]
+
+    @staticmethod
+    def upload_document(store, doc_id, file_path, mime_type):
+        with open(file_path, "rb") as spooled_file:
+            storage_response = safe_supabase_storage_action(
+                lambda: store.storage.from_("user_docs").upload(
+                    path=str(doc_id),
+                    file=spooled_file,
+                    file_options={
+                        "cache-control": "3600",
+                        "upsert": "false",
+                        "content-type": mime_type,
+                    },
+                )
+            )
+        return storage_response
+
+    @staticmethod
+    def discard_document(db, vdb, user_id, doc_id):
+        # undo a partially ingested document: its vectors, then its row
+        try:
+            File_Services.delete_document_vectors(vdb, [doc_id], user_id)
+        finally:
+            safe_supabase_database_action(
+                lambda: db.table("documents")
+                .delete()
+                .eq("id", doc_id)
+                .eq("user_id", user_id)
+                .execute()
+            )
+
+    @staticmethod
+    async def ingest_document(
         db,
         vdb,
         store,
         user_id,
-        file: UploadFile = File(...),
+        file_path,
+        file_name,
+        mime_type,
+        file_size,
+        doc_hash,
+        on_stage=None,
     ):
-        file_bytes = await file.read()
-        file_name = file.filename
-        mime_type = file.content_type
-        parsing = File_Services.parse_uploaded_docs(
-            mime_type=mime_type,
-            file_bytes=file_bytes,
-        )
-        if parsing["success"]:
-            embeddings, chunks = File_Services.chunk_to_embeddings(text=parsing["data"])
-            store_embeddings_response = File_Services.store_embeddings(
-                embeddings=embeddings,
+        on_stage = on_stage or _ignore_stage
+        await on_stage("dedup_check")
+        with span("dedup_check"):
+            existing = await run_in_threadpool(
+                File_Services.find_document,
+                vdb=vdb,
+                user_id=user_id,
+                file_name=file_name,
+                doc_hash=doc_hash,
+            )
+        if existing is not None and existing["has_text"]:
+            logger.info("Already indexed, skipping", extra={"file_name": file_name})
+            return {
+                "data": "Document already uploaded",
+                "success": True,
+            }
+        if existing is not None:
+            # its vectors outlived the chunk text, so the copy is replaced
+            logger.error(
+                "Indexed document lost its chunk text, re-ingesting",
+                extra={"file_name": file_name, "doc_id": existing["doc_id"]},
+            )
+            await run_in_threadpool(
+                File_Services.delete_file, db, vdb, user_id, existing["doc_id"]
+            )
+        # the documents row comes first so every point carries its doc_id
+        with span("create_document"):
+            doc_id = await run_in_threadpool(
+                File_Services.create_document,
+                db=db,
+                user_id=user_id,
                 file_name=file_name,
+                file_size=file_size,
+            )
+        try:
+            store_embeddings_response = await File_Services.ingest_spooled_file(
                 vdb=vdb,
-                chunks=chunks,
+                file_path=file_path,
+                mime_type=mime_type,
+                file_name=file_name,
+                doc_hash=doc_hash,
+                doc_id=doc_id,
+                user_id=user_id,
+                on_stage=on_stage,
             )
-            if store_embeddings_response["success"]:
-                print("✅ Embeddings stored successfully!")
-                database_response = safe_supabase_database_action(
-                    lambda: db.table("documents")
-                    .insert(
-                        {
-                            "doc_name": file_name,
-                            "user_id": user_id,
-                            "doc_size": round(len(file_bytes) / 1024, 2),
-                        }
-                    )
-                    .execute()
+            if not store_embeddings_response["success"]:
+                logger.error(
+                    "Failed to store embeddings",
+                    extra={"file_name": file_name, "doc_id": doc_id},
                 )
-                file_id = str(database_response["data"][0]["id"])
-                storage_response = safe_supabase_storage_action(
-                    lambda: store.storage.from_("user_docs").upload(
-                        path=file_id,
-                        file=file_bytes,
-                        file_options={
-                            "cache-control": "3600",
-                            "upsert": "false",
-                            "content-type": mime_type,
-                        },
-                    )
+                await run_in_threadpool(
+                    File_Services.discard_document, db, vdb, user_id, doc_id
                 )
-                return storage_response
-            else:
-                print("❌ Failed to store embeddings:", store_embeddings_response)
                 return {
                     "data": "Embeddings not stored",
                     "success": False,
                 }
-        else:
-            print(f"❌ {parsing['data']}")
+            invalidate_file_caches([file_name])
+            await on_stage("register")
+            with span("register"):
+                return await run_in_threadpool(
+                    File_Services.upload_document,
+                    store=store,
+                    doc_id=doc_id,
+                    file_path=file_path,
+                    mime_type=mime_type,
+                )
+        except BaseException:
+            await run_in_threadpool(
+                File_Services.discard_document, db, vdb, user_id, doc_id
+            )
+            raise
+
+    @staticmethod
+    async def upload_single_file(
+        db,
+        vdb,
+        store,
+        user_id,
+        file: UploadFile = File(...),
+    ):
+        file_name = file.filename
+        mime_type = file.content_type
+        if not Ingestion_Service.is_supported(mime_type):
+            logger.info("Unsupported file type", extra={"mime_type": mime_type})
             return {
-                "data": parsing["data"],
+                "data": "File of this type is not supported",
                 "success": False,
             }
+        with span("spool"):
+            file_path, file_size, doc_hash = await Ingestion_Service.spool_upload(
+                file, max_bytes=Parsing_Service.max_bytes(mime_type)
+            )
+        try:
+            return await File_Services.ingest_document(
+                db=db,
+                vdb=vdb,
+                store=store,
+                user_id=user_id,
+                file_path=file_path,
+                file_name=file_name,
+                mime_type=mime_type,
+                file_size=file_size,
+                doc_hash=doc_hash,
+            )
+        finally:
+            Ingestion_Service.remove_spool(file_path)
+
+    @staticmethod
+    async def enqueue_upload(queue: Job_Queue, user_id, priority, file: UploadFile):
+        mime_type = file.content_type
+        if not Ingestion_Service.is_supported(mime_type):
+            raise HTTPException(
+                status_code=415, detail="File of this type is not supported"
+            )
+        with span("spool"):
+            file_path, file_size, doc_hash = await Ingestion_Service.spool_upload(
+                file,
+                max_bytes=Parsing_Service.max_bytes(mime_type),
+                spool_dir=JOBS_SPOOL_DIR,
+            )
+        job_id = queue.enqueue(
+            user_id=user_id,
+            file_name=file.filename,
+            mime_type=mime_type,
+            file_path=file_path,
+            file_size=file_size,
+            doc_hash=doc_hash,
+            priority=priority,
+        )
+        return {
+            "data": {"job_id": job_id, "status_url": f"/jobs/{job_id}"},
+            "success": True,
+        }
+
+    @staticmethod
+    async def run_ingestion_job(job, on_stage, db, vdb, store):
+        try:
+            return await File_Services.ingest_document(
+                db=db,
+                vdb=vdb,
+                store=store,
+                user_id=job["user_id"],
+                file_path=job["file_path"],
+                file_name=job["file_name"],
+                mime_type=job["mime_type"],
+                file_size=job["file_size"],
+                doc_hash=job["doc_hash"],
+                on_stage=on_stage,
+            )
+        finally:
+            Ingestion_Service.remove_spool(job["file_path"])
 
     @staticmethod
     async def upload_multiple_files(
@@ -325,28 +882,39 @@ class File_Services:
         store,
         files: List[UploadFile] = File(...),
     ):
-        for file in files:
-            storage_response = await File_Services.upload_single_file(
-                db=db,
-                store=store,
-                file=file,
-                vdb=vdb,
-                user_id=user_id,
-            )
-            if storage_response["success"]:
-                continue
-            else:
+        semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+        async def upload(file: UploadFile):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await File_Services.upload_single_file(
+                        db=db,
+                        store=store,
+                        file=file,
+                        vdb=vdb,
+                        user_id=user_id,
+                    )
+                except HTTPException as e:
+                    response = {"data": e.detail, "success": False}
+                except Exception as e:
+                    response = {"data": str(e), "success": False}
                 return {
-                    "data": "files not uploaded",
-                    "success": False,
+                    "file_name": file.filename,
+                    "success": response["success"],
+                    "data": response["data"],
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 2),
                 }
+
+        # files run concurrently and one failure does not stop the others
+        results = await asyncio.gather(*(upload(file) for file in files))
         return {
-            "data": "files uploaded successfully",
-            "success": True,
+            "data": results,
+            "success": all(result["success"] for result in results),
         }
 
     @staticmethod
-    def delete_file(db, user_id, doc_id):
+    def delete_file(db, vdb, user_id, doc_id):
         db_response = safe_supabase_storage_action(
             lambda: db.table("documents")
             .delete()
@@ -355,6 +923,10 @@ class File_Services:
             .execute()
         )
         if db_response["success"]:
+            deleted_docs = db_response["data"].get("data") or []
+            File_Services.delete_document_vectors(vdb, [doc_id], user_id)
+            Signed_Url_Service.invalidate([str(doc_id)])
+            invalidate_file_caches([doc["doc_name"] for doc in deleted_docs])
             storage_response = safe_supabase_storage_action(
                 lambda: db.storage.from_("user_docs").remove([str(doc_id)])
             )
@@ -374,26 +946,119 @@ class File_Services:
         return db_response
 
     @staticmethod
-    def get_user_history(db, user_id):
-        user_history = safe_supabase_database_action(
-            lambda: db.table("questions").select("*").eq("user_id", user_id).execute()
-        )
-        return user_history
+    def select_columns(table, fields: str = None):
+        if not fields:
+            return "*"
+        wanted = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = set(wanted) - set(USER_TABLE_FIELDS[table])
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+            )
+        # the cursor is taken from the id of the last row
+        if "id" not in wanted:
+            wanted.insert(0, "id")
+        return ",".join(wanted)
 
     @staticmethod
-    def get_user_chat(db, chat_space, user_id):
-        user_history = safe_supabase_database_action(
-            lambda: db.table("questions")
-            .select("*")
-            .eq("chat_space", chat_space)
+    def fetch_page(db, table, user_id, filters=None, fields=None, cursor=None, limit=0):
+        # keyset pagination, newest first: each page is an index range scan on
+        # (user_id, id), so its cost does not depend on how deep the page is
+        query = (
+            db.table(table)
+            .select(File_Services.select_columns(table, fields))
             .eq("user_id", user_id)
-            .execute()
         )
-        return user_history
+        for column, value in (filters or {}).items():
+            query = query.eq(column, value)
+        if cursor is not None:
+            query = query.lt("id", cursor)
+        rows = safe_supabase_database_action(
+            lambda: query.order("id", desc=True).limit(limit + 1).execute()
+        )["data"]
+        next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
+    @staticmethod
+    def paginate(
+        db, table, user_id, filters=None, fields=None, cursor=None, limit=None
+    ):
+        limit = max(1, min(limit or PAGE_SIZE, PAGE_SIZE_MAX))
+        rows, next_cursor = File_Services.fetch_page(
+            db=db,
+            table=table,
+            user_id=user_id,
+            filters=filters,
+            fields=fields,
+            cursor=cursor,
+            limit=limit,
+        )
+        return {
+            "data": rows,
+            "next_cursor": next_cursor,
+            "success": True,
+        }
+
+    @staticmethod
+    def export_rows(db, table, user_id, filters=None, fields=None):
+        cursor = None
+        while True:
+            rows, cursor = File_Services.fetch_page(
+                db=db,
+                table=table,
+                user_id=user_id,
+                filters=filters,
+                fields=fields,
+                cursor=cursor,
+                limit=EXPORT_PAGE_SIZE,
+            )
+            for row in rows:
+                yield json.dumps(row, default=str) + "\n"
+            if cursor is None:
+                break
+
+    @staticmethod
+    def export_ndjson(db, table, user_id, filters=None, fields=None):
+        # validate before the stream opens so bad fields are still a 400
+        File_Services.select_columns(table, fields)
+        return StreamingResponse(
+            File_Services.export_rows(
+                db=db, table=table, user_id=user_id, filters=filters, fields=fields
+            ),
+            media_type="application/x-ndjson",
+        )
+
+    @staticmethod
+    def get_user_history(db, user_id, cursor=None, limit=None, fields=None):
+        return File_Services.paginate(
+            db=db,
+            table="questions",
+            user_id=user_id,
+            fields=fields,
+            cursor=cursor,
+            limit=limit,
+        )
+
+    @staticmethod
+    def get_user_chat(db, chat_space, user_id, cursor=None, limit=None, fields=None):
+        return File_Services.paginate(
+            db=db,
+            table="questions",
+            user_id=user_id,
+            filters={"chat_space": chat_space},
+            fields=fields,
+            cursor=cursor,
+            limit=limit,
+        )
 
     @staticmethod
-    def get_user_docs(db, user_id):
-        user_docs = safe_supabase_database_action(
-            lambda: db.table("documents").select("*").eq("user_id", user_id).execute()
+    def get_user_docs(db, user_id, cursor=None, limit=None, fields=None):
+        return File_Services.paginate(
+            db=db,
+            table="documents",
+            user_id=user_id,
+            fields=fields,
+            cursor=cursor,
+            limit=limit,
         )
-        return user_docs
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import tempfile
+from typing import Iterable, Iterator, List
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, UploadFile
+from rag_backend.parsers import *
+
+load_dotenv()
+
+CHUNK_SIZE = 500
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR") or tempfile.gettempdir()
+INGEST_READ_SIZE = int(os.getenv("INGEST_READ_SIZE", str(1024 * 1024)))
+INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64"))
+
+WORD_MIME_TYPE = (
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+)
+IMAGE_MIME_TYPES = ("image/png", "image/jpeg", "image/webp")
+
+
+class Ingestion_Service:
+    @staticmethod
+    async def spool_upload(file: UploadFile, max_bytes: int = None, spool_dir=None):
+        spool_dir = spool_dir or INGEST_SPOOL_DIR
+        os.makedirs(spool_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix="upload-", dir=spool_dir)
+        size = 0
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, "wb") as spool:
+                while block := await file.read(INGEST_READ_SIZE):
+                    size += len(block)
+                    if max_bytes is not None and size > max_bytes:
+                        limit_mb = max_bytes // (1024 * 1024)
+                        raise HTTPException(
+                            status_code=413,
+                            detail=f"{file.filename} exceeds the {limit_mb} MB limit",
+                        )
+                    spool.write(block)
+                    digest.update(block)
+        except Exception:
+            os.remove(path)
+            raise
+        return path, size, digest.hexdigest()
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def remove_spool(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def is_supported(mime_type) -> bool:
+        return mime_type in (
+            "application/pdf",
+            WORD_MIME_TYPE,
+            "text/plain",
+            *IMAGE_MIME_TYPES,
+        )
+
+    @staticmethod
+    def iter_text(mime_type, path) -> Iterator[str]:
+        if mime_type == "application/pdf":
+            return Parsers.pdf_pages_from_path(path)
+        elif mime_type == WORD_MIME_TYPE:
+            return Parsers.word_paragraphs_from_path(path)
+        elif mime_type in IMAGE_MIME_TYPES:
+            return Parsers.image_text_from_path(path)
+        elif mime_type == "text/plain":
+            return Parsers.text_blocks_from_path(path)
+        raise ValueError(f"Unsupported mime type: {mime_type}")
+
+    @staticmethod
+    def iter_chunks(pieces: Iterable[str], chunk_size=CHUNK_SIZE) -> Iterator[str]:
+        words: List[str] = []
+        carry = ""
+        for piece in pieces:
+            piece = carry + piece
+            carry = ""
+            piece_words = piece.split()
+            # a block boundary may fall in the middle of a word
+            if piece_words and not piece[-1].isspace():
+                carry = piece_words.pop()
+            words.extend(piece_words)
+            while len(words) >= chunk_size:
+                yield " ".join(words[:chunk_size])
+                del words[:chunk_size]
+        if carry:
+            words.append(carry)
+        if words:
+            yield " ".join(words)
+
+    @staticmethod
+    def iter_batches(items: Iterable, batch_size=INGEST_EMBED_BATCH_SIZE):
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
@@ -0,0 +1,370 @@
+import asyncio
+import functools
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable
+
+from dotenv import load_dotenv
+from rag_backend.services.logging_service import *
+
+load_dotenv()
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "./jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+# highest priority any user can be granted; ordinary users always get 0
+JOB_PRIORITY_MAX = int(os.getenv("JOB_PRIORITY_MAX", "2"))
+# a job interrupted this many times (e.g. it keeps crashing the process) fails
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# finished and failed jobs stay readable at /jobs/{id} this long, then go
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 86400)))
+JOB_PRUNE_INTERVAL_SECONDS = float(os.getenv("JOB_PRUNE_INTERVAL_SECONDS", "3600"))
+# a running job belongs to the process that claimed it while that process keeps
+# renewing its lease (every third of this); an expired lease means the process
+# is gone and the job is queued again
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    mime_type TEXT,
+    file_path TEXT NOT NULL,
+    file_size INTEGER,
+    doc_hash TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_until REAL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    stages TEXT NOT NULL DEFAULT '{}',
+    progress TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at);
+CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user_id, status, started_at);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+"""
+
+# Highest priority first. Within a priority, users with fewer running jobs
+# and then users served least recently go first, so one user's bulk upload
+# cannot starve everyone else.
+_CLAIM_NEXT = """
+SELECT j.id FROM jobs j
+WHERE j.status = 'queued'
+ORDER BY
+    j.priority DESC,
+    (SELECT COUNT(*) FROM jobs r
+        WHERE r.user_id = j.user_id AND r.status = 'running') ASC,
+    COALESCE((SELECT MAX(r.started_at) FROM jobs r
+        WHERE r.user_id = j.user_id AND r.started_at IS NOT NULL), 0) ASC,
+    j.created_at ASC
+LIMIT 1
+"""
+
+_JSON_COLUMNS = ("stages", "progress", "result")
+# columns added after the first release, created on databases that predate them
+_ADDED_COLUMNS = {
+    "attempts": "INTEGER NOT NULL DEFAULT 0",
+    "owner": "TEXT",
+    "lease_until": "REAL",
+}
+
+
+def allowed_priority(user: dict, requested: int) -> int:
+    # the client may ask for a priority, but only up to what the server
+    # granted in app_metadata, which users cannot edit themselves
+    granted = (user.get("app_metadata") or {}).get("job_priority", 0)
+    try:
+        granted = min(int(granted), JOB_PRIORITY_MAX)
+    except (TypeError, ValueError):
+        granted = 0
+    return max(0, min(requested, granted))
+
+
+class Job_Queue:
+    def __init__(self, path: str = JOBS_DB_PATH):
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for column, definition in _ADDED_COLUMNS.items():
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+        # several API processes can share one jobs database
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop = None
+        self._wakeup: asyncio.Event = None
+        self._workers = []
+        self._maintenance: asyncio.Task = None
+
+    def enqueue(
+        self,
+        user_id,
+        file_name,
+        mime_type,
+        file_path,
+        file_size,
+        doc_hash,
+        priority: int = 0,
+    ) -> str:
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, user_id, file_name, mime_type, file_path, "
+                "file_size, doc_hash, priority, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'queued', ?)",
+                (
+                    job_id,
+                    user_id,
+                    file_name,
+                    mime_type,
+                    file_path,
+                    file_size,
+                    doc_hash,
+                    priority,
+                    time.time(),
+                ),
+            )
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return job_id
+
+    def claim(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(_CLAIM_NEXT).fetchone()
+                if row is not None:
+                    now = time.time()
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ?, "
+                        "attempts = attempts + 1, owner = ?, lease_until = ? "
+                        "WHERE id = ?",
+                        (now, self.owner, now + JOB_LEASE_SECONDS, row["id"]),
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row is not None else None
+
+    def mark_stage(self, job_id: str, stage: str, progress: dict = None):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT stage, stages, progress FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            stages = json.loads(row["stages"])
+            if row["stage"] != stage:
+                self._close_stage(stages, row["stage"], now)
+                stages[stage] = {"started_at": now, "duration_ms": None}
+            current_progress = json.loads(row["progress"])
+            current_progress.update(progress or {})
+            self._db.execute(
+                "UPDATE jobs SET stage = ?, stages = ?, progress = ? WHERE id = ?",
+                (stage, json.dumps(stages), json.dumps(current_progress), job_id),
+            )
+
+    def finish(self, job_id: str, result: dict):
+        status = "succeeded" if result.get("success") else "failed"
+        error = None if result.get("success") else str(result.get("data"))
+        self._complete(job_id, status, result, error)
+
+    def fail(self, job_id: str, error: str):
+        self._complete(job_id, "failed", None, error)
+
+    def get(self, job_id: str, user_id: str = None):
+        query = "SELECT * FROM jobs WHERE id = ?"
+        params = [job_id]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        with self._lock:
+            row = self._db.execute(query, params).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for column in _JSON_COLUMNS:
+            if job[column] is not None:
+                job[column] = json.loads(job[column])
+        if user_id is not None:
+            # the server-side spool path and process are not exposed to clients
+            job.pop("file_path")
+            job.pop("owner")
+        return job
+
+    def renew_leases(self):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET lease_until = ? "
+                "WHERE status = 'running' AND owner = ?",
+                (time.time() + JOB_LEASE_SECONDS, self.owner),
+            )
+
+    def requeue_interrupted(self):
+        # jobs whose process stopped renewing their lease start over, unless
+        # they have already been interrupted JOB_MAX_ATTEMPTS times; jobs of
+        # live processes, this one's included, are left alone
+        expired = "status = 'running' AND (lease_until IS NULL OR lease_until < ?)"
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                exhausted = self._db.execute(
+                    f"SELECT id, file_path FROM jobs WHERE {expired} "
+                    "AND attempts >= ?",
+                    (now, JOB_MAX_ATTEMPTS),
+                ).fetchall()
+                self._db.executemany(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? "
+                    "WHERE id = ?",
+                    [
+                        (
+                            now,
+                            f"Interrupted {JOB_MAX_ATTEMPTS} times; giving up",
+                            row["id"],
+                        )
+                        for row in exhausted
+                    ],
+                )
+                requeued = self._db.execute(
+                    "UPDATE jobs SET status = 'queued', stage = NULL, "
+                    "stages = '{}', progress = '{}', started_at = NULL, "
+                    f"owner = NULL, lease_until = NULL WHERE {expired}",
+                    (now,),
+                ).rowcount
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        if requeued:
+            logger.warning("Requeued interrupted jobs", extra={"jobs": requeued})
+        for row in exhausted:
+            logger.warning("Giving up on interrupted job", extra={"job_id": row["id"]})
+            try:
+                os.remove(row["file_path"])
+            except FileNotFoundError:
+                pass
+
+    def prune(self, older_than: float = JOB_RETENTION_SECONDS) -> int:
+        cutoff = time.time() - older_than
+        with self._lock:
+            pruned = self._db.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') "
+                "AND finished_at < ?",
+                (cutoff,),
+            ).rowcount
+        if pruned:
+            logger.info("Pruned finished jobs", extra={"jobs": pruned})
+        return pruned
+
+    async def start(
+        self,
+        handler: Callable[[dict, Callable], Awaitable[dict]],
+        workers: int = JOB_WORKERS,
+    ):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self.requeue_interrupted()
+        self._workers = [
+            asyncio.create_task(self._work(handler)) for _ in range(workers)
+        ]
+        self._maintenance = asyncio.create_task(self._maintain())
+
+    async def stop(self):
+        tasks = self._workers + ([self._maintenance] if self._maintenance else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._maintenance = None
+        self._loop = None
+
+    async def _work(self, handler):
+        while True:
+            job = await asyncio.to_thread(self.claim)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # job bookkeeping is SQLite I/O, kept off the event loop like claim
+            on_stage = functools.partial(asyncio.to_thread, self.mark_stage, job["id"])
+            try:
+                result = await handler(job, on_stage)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Job failed", extra={"job_id": job["id"]})
+                await asyncio.to_thread(
+                    self.fail, job["id"], str(getattr(e, "detail", e))
+                )
+            else:
+                await asyncio.to_thread(self.finish, job["id"], result)
+
+    async def _maintain(self):
+        pruned_at = 0.0
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            try:
+                await asyncio.to_thread(self.renew_leases)
+                # picks up the jobs of processes that died since start()
+                await asyncio.to_thread(self.requeue_interrupted)
+                if time.time() - pruned_at >= JOB_PRUNE_INTERVAL_SECONDS:
+                    await asyncio.to_thread(self.prune)
+                    pruned_at = time.time()
+            except sqlite3.Error:
+                logger.exception("Job queue maintenance failed")
+
+    def _complete(self, job_id, status, result, error):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT stage, stages FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            stages = json.loads(row["stages"])
+            self._close_stage(stages, row["stage"], now)
+            self._db.execute(
+                "UPDATE jobs SET status = ?, stages = ?, result = ?, error = ?, "
+                "finished_at = ? WHERE id = ?",
+                (
+                    status,
+                    json.dumps(stages),
+                    json.dumps(result, default=str) if result is not None else None,
+                    error,
+                    now,
+                    job_id,
+                ),
+            )
+
+    @staticmethod
+    def _close_stage(stages: dict, stage: str, now: float):
+        if stage in stages and stages[stage]["duration_ms"] is None:
+            started_at = stages[stage]["started_at"]
+            stages[stage]["duration_ms"] = round((now - started_at) * 1000, 2)
+
+
+job_queue: Job_Queue = None
+
+
+def get_job_queue() -> Job_Queue:
+    global job_queue
+    if job_queue is None:
+        job_queue = Job_Queue()
+    return job_queue
@@ -1,17 +1,102 @@
+import asyncio
 import os
+import threading
+import time
+from collections import deque
 
-import google.generativeai as genai
 from dotenv import load_dotenv
 
 load_dotenv()
 
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-2.5-flash")
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "gemini")
+FAKE_LLM_FIRST_TOKEN_MS = float(os.environ.get("FAKE_LLM_FIRST_TOKEN_MS", "50"))
+FAKE_LLM_TOKEN_MS = float(os.environ.get("FAKE_LLM_TOKEN_MS", "5"))
+
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
+
+_model = None
+_model_lock = threading.Lock()
+_ttft_samples = deque(maxlen=1000)
+
+
+class Fake_Llm:
+    # deterministic local stand-in, selected with LLM_PROVIDER=fake
+    @staticmethod
+    def answer(prompt: str) -> str:
+        return f"Fake answer based on {len(prompt)} characters: {prompt[:200]}"
+
+    @staticmethod
+    def generate(prompt: str) -> str:
+        time.sleep(FAKE_LLM_FIRST_TOKEN_MS / 1000)
+        return Fake_Llm.answer(prompt)
+
+    @staticmethod
+    async def stream(prompt: str):
+        await asyncio.sleep(FAKE_LLM_FIRST_TOKEN_MS / 1000)
+        for i, word in enumerate(Fake_Llm.answer(prompt).split(" ")):
+            if i:
+                await asyncio.sleep(FAKE_LLM_TOKEN_MS / 1000)
+            yield word if i == 0 else " " + word
 
 
 class LlmService:
+    @staticmethod
+    def model():
+        # the Gemini SDK is slow to import, so it is configured on first use
+        global _model
+        if _model is None:
+            with _model_lock:
+                if _model is None:
+                    import google.generativeai as genai
+
+                    genai.configure(api_key=GEMINI_API_KEY)
+                    _model = genai.GenerativeModel(GEMINI_MODEL)
+        return _model
+
     @staticmethod
     def generate_blog(prompt: str):
-        llm_response = model.generate_content(prompt)
+        if LLM_PROVIDER == "fake":
+            return Fake_Llm.generate(prompt)
+        llm_response = LlmService.model().generate_content(prompt)
         return llm_response.text
+
+    @staticmethod
+    async def stream_blog(prompt: str):
+        started = time.perf_counter()
+        first_token = True
+        if LLM_PROVIDER == "fake":
+            tokens = Fake_Llm.stream(prompt)
+        else:
+            tokens = LlmService._stream_gemini(prompt)
+        async for token in tokens:
+            if first_token:
+                _ttft_samples.append((time.perf_counter() - started) * 1000)
+                first_token = False
+            yield token
+
+    @staticmethod
+    async def _stream_gemini(prompt: str):
+        response = await LlmService.model().generate_content_async(
+            prompt, stream=True
+        )
+        async for chunk in response:
+            # chunks without text parts (e.g. safety metadata) raise on .text
+            try:
+                text = chunk.text
+            except ValueError:
+                continue
+            if text:
+                yield text
+
+    @staticmethod
+    def ttft_stats():
+        samples = sorted(_ttft_samples)
+        if not samples:
+            return {"count": 0}
+        p95_index = min(len(samples) - 1, int(len(samples) * 0.95))
+        return {
+            "count": len(samples),
+            "p50_ms": round(samples[len(samples) // 2], 2),
+            "p95_ms": round(samples[p95_index], 2),
+        }
@@ -0,0 +1,86 @@
+import json
+import logging
+import os
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+
+# set per request by the middleware, and per job by the ingestion worker
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+route_var: ContextVar[str] = ContextVar("route", default="background")
+# client-supplied ids end up in log lines and profile file names
+REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9-]{1,64}")
+
+logger = logging.getLogger("rag_backend")
+
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message",
+    "asctime",
+}
+
+
+class _Context_Filter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        record.route = route_var.get()
+        return True
+
+
+class _Json_Formatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        # anything passed through extra= becomes a top-level field
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    if getattr(configure_logging, "done", False):
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.addFilter(_Context_Filter())
+    if LOG_FORMAT == "json":
+        handler.setFormatter(_Json_Formatter())
+    else:
+        handler.setFormatter(
+            logging.Formatter(
+                "%(asctime)s %(levelname)s [%(request_id)s %(route)s] %(message)s"
+            )
+        )
+    logger.addHandler(handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    configure_logging.done = True
+
+
+def request_id_from(header: str) -> str:
+    if header and REQUEST_ID_PATTERN.fullmatch(header):
+        return header
+    return uuid.uuid4().hex
+
+
+def bind_request(request_id: str, route: str):
+    return request_id_var.set(request_id), route_var.set(route)
+
+
+def reset_request(tokens):
+    request_id_token, route_token = tokens
+    request_id_var.reset(request_id_token)
+    route_var.reset(route_token)
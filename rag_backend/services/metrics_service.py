@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Tuple
+
+from dotenv import load_dotenv
+from rag_backend.services.logging_service import *
+
+load_dotenv()
+
+LATENCY_BUCKETS = tuple(
+    float(x)
+    for x in os.getenv(
+        "METRICS_LATENCY_BUCKETS",
+        "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60",
+    ).split(",")
+)
+
+# per-request stage totals, read back by the middleware for the access log
+stage_totals_var: ContextVar[dict] = ContextVar("stage_totals", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                labels = _labels(self.label_names, label_values)
+                lines.append(f"{self.name}{labels} {value}")
+        return "\n".join(lines)
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label_names: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [
+                    [0] * (len(self.buckets) + 1),
+                    0.0,
+                ]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+            series = [
+                (labels, (list(counts), total)) for labels, (counts, total) in series
+            ]
+        for label_values, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                labels = _labels(self.label_names, label_values, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return "\n".join(lines)
+
+
+class Metrics_Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+metrics_registry = Metrics_Registry()
+request_seconds = metrics_registry.register(
+    Histogram(
+        "rag_http_request_duration_seconds",
+        "Time until the response headers are sent.",
+        ("route", "method", "status"),
+    )
+)
+stage_seconds = metrics_registry.register(
+    Histogram(
+        "rag_stage_duration_seconds",
+        "Time spent in one stage of a request or job.",
+        ("route", "stage"),
+    )
+)
+stage_errors = metrics_registry.register(
+    Counter(
+        "rag_stage_errors_total",
+        "Stages that ended with an exception.",
+        ("route", "stage"),
+    )
+)
+
+
+@contextmanager
+def span(stage: str):
+    route = route_var.get()
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        stage_errors.inc(route, stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, route, stage)
+        totals = stage_totals_var.get()
+        if totals is not None:
+            totals[stage] = round(totals.get(stage, 0) + elapsed * 1000, 2)
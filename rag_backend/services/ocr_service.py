@@ -0,0 +1,258 @@
+import hashlib
+import importlib.util
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator
+
+import numpy as np
+from dotenv import load_dotenv
+from rag_backend.services.logging_service import *
+
+load_dotenv()
+
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", "300"))
+# used for images that carry no DPI metadata: roughly a letter page at 300 DPI
+OCR_MAX_IMAGE_SIDE = int(os.getenv("OCR_MAX_IMAGE_SIDE", "3300"))
+OCR_BINARIZE = os.getenv("OCR_BINARIZE", "true").lower() == "true"
+# every concurrent parse job runs its own OCR pool, so by default the cores
+# are split between PARSE_WORKERS jobs (same default as parsing_service)
+# instead of each job claiming all of them
+_PARSE_JOBS = int(os.getenv("PARSE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+OCR_WORKERS = int(
+    os.getenv("OCR_WORKERS", str(max(1, (os.cpu_count() or 1) // _PARSE_JOBS)))
+)
+# pages with less embedded text than this are treated as scans
+OCR_MIN_PAGE_CHARS = int(os.getenv("OCR_MIN_PAGE_CHARS", "20"))
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "./ocr_cache")
+# the cache is pruned to these bounds, least recently used pages first
+OCR_CACHE_MAX_MB = float(os.getenv("OCR_CACHE_MAX_MB", "512"))
+OCR_CACHE_MAX_AGE_DAYS = float(os.getenv("OCR_CACHE_MAX_AGE_DAYS", "30"))
+OCR_CACHE_PRUNE_INTERVAL_SECONDS = float(
+    os.getenv("OCR_CACHE_PRUNE_INTERVAL_SECONDS", "600")
+)
+# PIL, pypdf, pytesseract and pypdfium2 are imported on first use so that
+# starting the API does not pay for them
+PDFIUM_AVAILABLE = importlib.util.find_spec("pypdfium2") is not None
+
+# one tesseract process per page, each single-threaded, scales better than a
+# few processes fighting over OpenMP threads
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+_last_prune = {"at": 0.0}
+_prune_lock = threading.Lock()
+
+
+def _otsu_threshold(gray: np.ndarray) -> int:
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weight = np.cumsum(histogram) / gray.size
+    mean = np.cumsum(histogram * np.arange(256)) / gray.size
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mean[-1] * weight - mean) ** 2 / (weight * (1 - weight))
+    return int(np.nanargmax(between)) if np.isfinite(between).any() else 127
+
+
+class Ocr_Service:
+    @staticmethod
+    def preprocess(image, source_dpi: float = None):
+        from PIL import Image
+
+        image = image.convert("L")
+        if source_dpi:
+            scale = OCR_TARGET_DPI / source_dpi
+        else:
+            scale = OCR_MAX_IMAGE_SIDE / max(image.size)
+        # only ever shrink; upsampling adds pixels without adding detail
+        if scale < 1:
+            size = (
+                max(1, round(image.width * scale)),
+                max(1, round(image.height * scale)),
+            )
+            image = image.resize(size, Image.Resampling.LANCZOS)
+        if OCR_BINARIZE:
+            gray = np.asarray(image)
+            image = Image.fromarray(
+                np.where(gray > _otsu_threshold(gray), 255, 0).astype(np.uint8)
+            )
+        return image
+
+    @staticmethod
+    def _cache_path(page_hash: str) -> str:
+        return os.path.join(OCR_CACHE_DIR, page_hash[:2], page_hash + ".txt")
+
+    @staticmethod
+    def ocr_image(image, source_dpi: float = None) -> str:
+        import pytesseract
+
+        image = Ocr_Service.preprocess(image, source_dpi)
+        page_hash = hashlib.sha256(
+            f"{OCR_LANG}:{OCR_TARGET_DPI}:{OCR_BINARIZE}:{image.size}".encode()
+            + image.tobytes()
+        ).hexdigest()
+        cache_path = Ocr_Service._cache_path(page_hash)
+        try:
+            with open(cache_path, encoding="utf-8") as f:
+                text = f.read()
+            # a hit refreshes the entry, so pruning drops the coldest pages
+            os.utime(cache_path)
+            return text
+        except FileNotFoundError:
+            pass
+        text = pytesseract.image_to_string(
+            image, lang=OCR_LANG, config=f"--dpi {OCR_TARGET_DPI}"
+        )
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # write then rename, so concurrent workers never read a partial entry
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, cache_path)
+        return text
+
+    @staticmethod
+    def prune_cache(
+        max_bytes: float = OCR_CACHE_MAX_MB * 1024 * 1024,
+        max_age_seconds: float = OCR_CACHE_MAX_AGE_DAYS * 86400,
+    ) -> dict:
+        now = time.time()
+        entries = []
+        removed = 0
+        for dir_path, _, file_names in os.walk(OCR_CACHE_DIR):
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                try:
+                    stat = os.stat(path)
+                    age = now - stat.st_mtime
+                    # a fresh .tmp file is a write still in progress
+                    if file_name.endswith(".tmp"):
+                        expired = age > 3600
+                    else:
+                        expired = age > max_age_seconds
+                        if not expired:
+                            entries.append((stat.st_mtime, stat.st_size, path))
+                    if expired:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        cached_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if cached_bytes <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            cached_bytes -= size
+        return {"removed": removed, "bytes": cached_bytes}
+
+    @staticmethod
+    def prune_cache_if_due():
+        # called after every parse job; at most one prune per interval, and a
+        # job never waits behind another job's prune
+        if time.time() - _last_prune["at"] < OCR_CACHE_PRUNE_INTERVAL_SECONDS:
+            return None
+        if not _prune_lock.acquire(blocking=False):
+            return None
+        try:
+            _last_prune["at"] = time.time()
+            return Ocr_Service.prune_cache()
+        except OSError:
+            logger.exception("Failed to prune the OCR cache")
+            return None
+        finally:
+            _prune_lock.release()
+
+    @staticmethod
+    def _scanned_page_images(reader, pdfium_doc, index: int):
+        # rendering and image extraction are not thread-safe, so they happen
+        # on the calling thread; only preprocessing and OCR go to the pool
+        if pdfium_doc is not None:
+            bitmap = pdfium_doc[index].render(scale=OCR_TARGET_DPI / 72)
+            return [(bitmap.to_pil(), OCR_TARGET_DPI)]
+        page = reader.pages[index]
+        page_inches = float(page.mediabox.width) / 72
+        return [
+            (embedded.image, embedded.image.width / page_inches)
+            for embedded in page.images
+        ]
+
+    @staticmethod
+    def _ocr_images(images, extracted_text: str = "") -> str:
+        text = "\n".join(
+            Ocr_Service.ocr_image(image, source_dpi) for image, source_dpi in images
+        )
+        # a blank scan should not discard a stray page number or heading
+        return text if text.strip() else extracted_text
+
+    @staticmethod
+    def pdf_pages(source) -> Iterator[str]:
+        from pypdf import PdfReader
+
+        reader = PdfReader(source)
+        pdfium_doc = None
+        if PDFIUM_AVAILABLE:
+            import pypdfium2
+
+            if hasattr(source, "seek"):
+                source.seek(0)
+            pdfium_doc = pypdfium2.PdfDocument(source)
+        pending = deque()
+        try:
+            with ThreadPoolExecutor(
+                max_workers=OCR_WORKERS, thread_name_prefix="ocr"
+            ) as pool:
+                for index, page in enumerate(reader.pages):
+                    text = page.extract_text() or ""
+                    if len(text.strip()) >= OCR_MIN_PAGE_CHARS:
+                        pending.append(text)
+                    else:
+                        images = Ocr_Service._scanned_page_images(
+                            reader, pdfium_doc, index
+                        )
+                        pending.append(
+                            pool.submit(Ocr_Service._ocr_images, images, text)
+                        )
+                    # pages come out in order; a bounded window keeps the pool
+                    # busy without holding every rendered page in memory
+                    while pending and (
+                        not isinstance(pending[0], Future)
+                        or len(pending) > 2 * OCR_WORKERS
+                    ):
+                        yield Ocr_Service._page_text(pending.popleft())
+                while pending:
+                    yield Ocr_Service._page_text(pending.popleft())
+        finally:
+            for item in pending:
+                if isinstance(item, Future):
+                    item.cancel()
+            if pdfium_doc is not None:
+                pdfium_doc.close()
+
+    @staticmethod
+    def _page_text(item) -> str:
+        text = item.result() if isinstance(item, Future) else item
+        return text + "\n" if text else ""
+
+    @staticmethod
+    def image_text(source) -> Iterator[str]:
+        from PIL import Image, ImageSequence
+
+        with Image.open(source) as image:
+            dpi = image.info.get("dpi")
+            source_dpi = float(dpi[0]) if dpi and dpi[0] > 1 else None
+            # multi-page TIFF scans are OCR'd frame by frame in parallel
+            frames = [frame.copy() for frame in ImageSequence.Iterator(image)]
+        if len(frames) == 1:
+            yield Ocr_Service.ocr_image(frames[0], source_dpi)
+            return
+        with ThreadPoolExecutor(
+            max_workers=OCR_WORKERS, thread_name_prefix="ocr"
+        ) as pool:
+            yield from pool.map(
+                lambda frame: Ocr_Service.ocr_image(frame, source_dpi) + "\n", frames
+            )
@@ -0,0 +1,154 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from rag_backend.services.ingestion_service import *
+
+load_dotenv()
+
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PARSE_TIMEOUT_SECONDS = float(os.getenv("PARSE_TIMEOUT_SECONDS", "120"))
+PARSE_MAX_DOCUMENT_MB = float(os.getenv("PARSE_MAX_DOCUMENT_MB", "300"))
+PARSE_MAX_IMAGE_MB = float(os.getenv("PARSE_MAX_IMAGE_MB", "30"))
+
+_runner: ThreadPoolExecutor = None
+_runner_lock = threading.Lock()
+_processes = set()
+_processes_lock = threading.Lock()
+
+
+class Parse_Timeout(Exception):
+    pass
+
+
+class Parse_Worker_Crashed(Exception):
+    pass
+
+
+def extract_text_to_file(mime_type, src_path, dst_path) -> int:
+    # runs inside a parse process; text goes to disk so only a count comes back
+    written = 0
+    with open(dst_path, "w", encoding="utf-8") as out:
+        for piece in Ingestion_Service.iter_text(mime_type=mime_type, path=src_path):
+            out.write(piece)
+            written += len(piece)
+    return written
+
+
+def _parse_process_main(conn, mime_type, src_path, dst_path):
+    try:
+        conn.send(("ok", extract_text_to_file(mime_type, src_path, dst_path)))
+    except BaseException as e:
+        conn.send(("error", e))
+    finally:
+        conn.close()
+
+
+def _mp_context():
+    # each job gets a fresh process, and with forkserver that process is
+    # forked from a server that already imported the parsers, so it starts
+    # in milliseconds; spawn is the fallback where forkserver is missing
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(["rag_backend.services.parsing_service"])
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+
+def _run_parse_process(mime_type, src_path, dst_path) -> int:
+    # one process per job, so a timeout kills only that job's process and
+    # everyone else's parses keep running; runs on the runner thread pool,
+    # which caps concurrent jobs at PARSE_WORKERS
+    ctx = _mp_context()
+    reader, writer = ctx.Pipe(duplex=False)
+    process = ctx.Process(
+        target=_parse_process_main,
+        args=(writer, mime_type, src_path, dst_path),
+        name="parse-job",
+        daemon=True,
+    )
+    with _processes_lock:
+        _processes.add(process)
+    try:
+        process.start()
+        writer.close()
+        if not reader.poll(PARSE_TIMEOUT_SECONDS):
+            raise Parse_Timeout()
+        try:
+            status, result = reader.recv()
+        except EOFError:
+            raise Parse_Worker_Crashed()
+        if status == "error":
+            raise result
+        return result
+    finally:
+        reader.close()
+        if process.pid is not None:
+            if process.is_alive():
+                process.kill()
+            process.join()
+        with _processes_lock:
+            _processes.discard(process)
+        Ocr_Service.prune_cache_if_due()
+
+
+class Parsing_Service:
+    @staticmethod
+    def start():
+        global _runner
+        with _runner_lock:
+            if _runner is None:
+                _runner = ThreadPoolExecutor(
+                    max_workers=PARSE_WORKERS, thread_name_prefix="parse"
+                )
+        return _runner
+
+    @staticmethod
+    def shutdown():
+        global _runner
+        with _runner_lock:
+            runner, _runner = _runner, None
+        if runner is not None:
+            runner.shutdown(wait=False, cancel_futures=True)
+        with _processes_lock:
+            for process in list(_processes):
+                if process.is_alive():
+                    process.kill()
+
+    @staticmethod
+    def max_bytes(mime_type) -> int:
+        if mime_type in IMAGE_MIME_TYPES:
+            return int(PARSE_MAX_IMAGE_MB * 1024 * 1024)
+        return int(PARSE_MAX_DOCUMENT_MB * 1024 * 1024)
+
+    @staticmethod
+    async def extract_text(mime_type, file_path) -> str:
+        if mime_type == "text/plain":
+            return file_path
+        fd, text_path = tempfile.mkstemp(
+            prefix="extracted-", suffix=".txt", dir=INGEST_SPOOL_DIR
+        )
+        os.close(fd)
+        future = Parsing_Service.start().submit(
+            _run_parse_process, mime_type, file_path, text_path
+        )
+        try:
+            await asyncio.wrap_future(future)
+        except Parse_Timeout:
+            Ingestion_Service.remove_spool(text_path)
+            raise HTTPException(
+                status_code=422,
+                detail=f"Parsing exceeded {PARSE_TIMEOUT_SECONDS:g}s and was aborted",
+            )
+        except Parse_Worker_Crashed:
+            Ingestion_Service.remove_spool(text_path)
+            raise RuntimeError("Parsing worker crashed")
+        except BaseException:
+            Ingestion_Service.remove_spool(text_path)
+            raise
+        return text_path
@@ -0,0 +1,123 @@
+import collections
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+from rag_backend.services.logging_service import *
+
+load_dotenv()
+
+# 0 disables the profiler; otherwise requests slower than this get a dump
+PROFILE_SLOW_REQUEST_MS = float(os.getenv("PROFILE_SLOW_REQUEST_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_BUFFER_SAMPLES = int(os.getenv("PROFILE_BUFFER_SAMPLES", "200000"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+
+
+# Samples every thread's stack while at least one request is in flight. A slow
+# request gets the samples taken during its lifetime written out in collapsed
+# stack format, which flamegraph.pl and speedscope both read. Samples are
+# process-wide, so overlapping requests show up in each other's dumps.
+class Sampling_Profiler:
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self._samples = deque(maxlen=PROFILE_BUFFER_SAMPLES)
+        self._active = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="sampling-profiler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def enter(self) -> float:
+        with self._lock:
+            self._active += 1
+        return time.monotonic()
+
+    def exit(self, started: float, request_id: str, elapsed_ms: float):
+        with self._lock:
+            self._active -= 1
+        if elapsed_ms < PROFILE_SLOW_REQUEST_MS:
+            return None
+        # collecting and writing the dump stays off the event loop
+        thread = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(self._dump, started, time.monotonic(), request_id, elapsed_ms),
+            name="profile-writer",
+            daemon=True,
+        )
+        thread.start()
+        return thread
+
+    def _dump(self, started, finished, request_id, elapsed_ms):
+        stacks = collections.Counter(
+            stack
+            for taken, stack in list(self._samples)
+            if started <= taken <= finished
+        )
+        if not stacks:
+            return None
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(
+                PROFILE_DIR, f"{int(time.time())}-{request_id}.collapsed"
+            )
+            with open(path, "w") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError:
+            logger.exception("Failed to write request profile")
+            return None
+        logger.warning(
+            "Slow request profiled",
+            extra={
+                "profile": path,
+                "elapsed_ms": elapsed_ms,
+                "samples": sum(stacks.values()),
+            },
+        )
+        return path
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if not self._active:
+                continue
+            now = time.monotonic()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}"
+                        f":{frame.f_lineno})"
+                    )
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self._samples.append((now, ";".join(reversed(stack))))
+
+
+profiler = Sampling_Profiler()
@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+from qdrant_client.http import models as qmodels
+
+load_dotenv()
+
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+QUANTIZATION_OVERSAMPLING = float(os.getenv("QUANTIZATION_OVERSAMPLING", "2.0"))
+QUANTIZATION_RESCORE = os.getenv("QUANTIZATION_RESCORE", "true").lower() == "true"
+QUANTIZATION_ALWAYS_RAM = os.getenv("QUANTIZATION_ALWAYS_RAM", "true").lower() == "true"
+SCALAR_QUANTILE = 0.99
+QUANTIZATION_MODES = ("none", "scalar", "binary")
+
+
+class Quantization_Service:
+    @staticmethod
+    def quantization_config(mode: str = VECTOR_QUANTIZATION):
+        if mode == "scalar":
+            return qmodels.ScalarQuantization(
+                scalar=qmodels.ScalarQuantizationConfig(
+                    type=qmodels.ScalarType.INT8,
+                    quantile=SCALAR_QUANTILE,
+                    always_ram=QUANTIZATION_ALWAYS_RAM,
+                )
+            )
+        if mode == "binary":
+            return qmodels.BinaryQuantization(
+                binary=qmodels.BinaryQuantizationConfig(
+                    always_ram=QUANTIZATION_ALWAYS_RAM
+                )
+            )
+        if mode == "none":
+            return None
+        raise ValueError(f"Unknown quantization mode: {mode}")
+
+    @staticmethod
+    def search_params(
+        mode: str = VECTOR_QUANTIZATION,
+        oversampling: float = QUANTIZATION_OVERSAMPLING,
+        rescore: bool = QUANTIZATION_RESCORE,
+    ):
+        if mode == "none":
+            return None
+        return qmodels.SearchParams(
+            quantization=qmodels.QuantizationSearchParams(
+                ignore=False,
+                rescore=rescore,
+                oversampling=oversampling,
+            )
+        )
+
+    @staticmethod
+    def mode_of(quantization_config) -> str:
+        if isinstance(quantization_config, qmodels.ScalarQuantization):
+            return "scalar"
+        if isinstance(quantization_config, qmodels.BinaryQuantization):
+            return "binary"
+        return "none"
+
+
+# Quantized copy of a local collection's vectors, kept in RAM while the full
+# precision matrix stays memory-mapped on disk for rescoring.
+class Quantized_Index:
+    def __init__(self, mode: str, dim: int, capacity: int):
+        self.mode = mode
+        self.dim = dim
+        self.bounds = None
+        if mode == "scalar":
+            self.codes = np.zeros((capacity, dim), dtype=np.int8)
+        else:
+            self.codes = np.zeros((capacity, (dim + 7) // 8), dtype=np.uint8)
+
+    def fit(self, vectors: np.ndarray):
+        if self.mode == "scalar" and len(vectors):
+            tail = (1 - SCALAR_QUANTILE) / 2
+            low, high = np.quantile(vectors, [tail, 1 - tail])
+            self.bounds = (float(low), float(high) if high > low else float(low) + 1)
+
+    def grow(self, capacity: int):
+        codes = np.zeros((capacity, self.codes.shape[1]), dtype=self.codes.dtype)
+        codes[: len(self.codes)] = self.codes
+        self.codes = codes
+
+    def encode(self, rows, vectors: np.ndarray):
+        if self.mode == "scalar":
+            if self.bounds is None:
+                self.fit(vectors)
+            low, high = self.bounds
+            scaled = (np.clip(vectors, low, high) - low) / (high - low) * 255 - 128
+            self.codes[rows] = np.round(scaled).astype(np.int8)
+        else:
+            self.codes[rows] = np.packbits(vectors > 0, axis=-1)
+
+    def scores(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        codes = self.codes[rows]
+        if self.mode == "scalar":
+            # each component decodes as alpha * code + beta, so the dot product
+            # is approximated without dequantizing the candidate rows
+            low, high = self.bounds
+            alpha = (high - low) / 255
+            beta = low + 128 * alpha
+            query = query.astype(np.float32)
+            return alpha * (codes.astype(np.float32) @ query) + beta * query.sum()
+        query_bits = np.packbits(query > 0)
+        mismatches = np.bitwise_count(codes ^ query_bits).sum(
+            axis=1, dtype=np.int64
+        )
+        return (self.dim - 2 * mismatches).astype(np.float32)
@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from cachetools import TLRUCache
+from dotenv import load_dotenv
+from rag_backend.services.logging_service import *
+
+load_dotenv()
+
+SIGNED_URL_TTL = int(os.getenv("SIGNED_URL_TTL", "3600"))
+# cached URLs are dropped this long before they actually expire, so a client
+# is never handed a link that dies moments later
+SIGNED_URL_REFRESH_MARGIN = int(os.getenv("SIGNED_URL_REFRESH_MARGIN", "300"))
+SIGNED_URL_CACHE_SIZE = int(os.getenv("SIGNED_URL_CACHE_SIZE", "10000"))
+SIGNED_URL_BATCH_SIZE = int(os.getenv("SIGNED_URL_BATCH_SIZE", "100"))
+SIGNED_URL_CONCURRENCY = int(os.getenv("SIGNED_URL_CONCURRENCY", "8"))
+
+_signed_urls = TLRUCache(
+    maxsize=SIGNED_URL_CACHE_SIZE,
+    ttu=lambda _key, value, now: value[1] - SIGNED_URL_REFRESH_MARGIN,
+    timer=time.time,
+)
+_signed_urls_lock = threading.Lock()
+
+
+class Signed_Url_Service:
+    @staticmethod
+    def signed_urls(store, paths: List[str], bucket="user_docs") -> Dict[str, str]:
+        urls = {}
+        missing = []
+        with _signed_urls_lock:
+            for path in paths:
+                entry = _signed_urls.get((bucket, path))
+                if entry is not None:
+                    urls[path] = entry[0]
+                else:
+                    missing.append(path)
+        for start in range(0, len(missing), SIGNED_URL_BATCH_SIZE):
+            urls.update(
+                Signed_Url_Service._sign_batch(
+                    store, bucket, missing[start : start + SIGNED_URL_BATCH_SIZE]
+                )
+            )
+        return urls
+
+    @staticmethod
+    def _sign_batch(store, bucket, paths: List[str]) -> Dict[str, str]:
+        expires_at = time.time() + SIGNED_URL_TTL
+        storage_bucket = store.storage.from_(bucket)
+        try:
+            signed = storage_bucket.create_signed_urls(paths, SIGNED_URL_TTL)
+            urls = {
+                item["path"]: item["signedURL"]
+                for item in signed
+                if not item.get("error") and item.get("signedURL")
+            }
+        except Exception as e:
+            # the batch endpoint is missing or failed: sign one by one, in parallel
+            logger.info("Batch URL signing unavailable, signing individually: %s", e)
+            with ThreadPoolExecutor(
+                max_workers=min(SIGNED_URL_CONCURRENCY, len(paths))
+            ) as pool:
+                signed = pool.map(
+                    lambda path: storage_bucket.create_signed_url(
+                        path, SIGNED_URL_TTL
+                    ),
+                    paths,
+                )
+                urls = dict(zip(paths, (item["signedURL"] for item in signed)))
+        with _signed_urls_lock:
+            for path, url in urls.items():
+                _signed_urls[(bucket, path)] = (url, expires_at)
+        return urls
+
+    @staticmethod
+    def invalidate(paths: List[str], bucket="user_docs"):
+        with _signed_urls_lock:
+            for path in paths:
+                _signed_urls.pop((bucket, path), None)
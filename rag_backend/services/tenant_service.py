@@ -0,0 +1,78 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+from qdrant_client.http import models as qmodels
+
+load_dotenv()
+
+# payload: one shared collection, user_id is a tenant index
+# shard: additionally routes every user to its own custom shard key
+VECTOR_TENANCY = os.getenv("VECTOR_TENANCY", "payload")
+# false drops the global HNSW graph and keeps only per-tenant graphs, which is
+# cheaper to build but makes unfiltered searches fall back to full scans
+VECTOR_GLOBAL_HNSW = os.getenv("VECTOR_GLOBAL_HNSW", "true").lower() == "true"
+TENANCY_MODES = ("payload", "shard")
+
+_shard_keys = set()
+_shard_keys_lock = threading.Lock()
+
+
+class Tenant_Service:
+    @staticmethod
+    def sharded() -> bool:
+        if VECTOR_TENANCY not in TENANCY_MODES:
+            raise ValueError(f"Unknown tenancy mode: {VECTOR_TENANCY}")
+        return VECTOR_TENANCY == "shard"
+
+    @staticmethod
+    def collection_options() -> dict:
+        options = {
+            "hnsw_config": qmodels.HnswConfigDiff(
+                m=16 if VECTOR_GLOBAL_HNSW else 0,
+                ef_construct=100,
+                payload_m=16,
+            )
+        }
+        if Tenant_Service.sharded():
+            options["sharding_method"] = qmodels.ShardingMethod.CUSTOM
+        return options
+
+    @staticmethod
+    def user_index_schema():
+        return qmodels.KeywordIndexParams(
+            type=qmodels.KeywordIndexType.KEYWORD, is_tenant=True
+        )
+
+    @staticmethod
+    def shard_key(user_id):
+        return user_id if Tenant_Service.sharded() and user_id else None
+
+    @staticmethod
+    def ensure_shard(vdb, user_id):
+        shard_key = Tenant_Service.shard_key(user_id)
+        if shard_key is None or shard_key in _shard_keys:
+            return shard_key
+        with _shard_keys_lock:
+            if shard_key not in _shard_keys:
+                try:
+                    vdb.create_shard_key(
+                        collection_name="user_docs", shard_key=shard_key
+                    )
+                except Exception as e:
+                    # another worker may have created it first
+                    if "already exists" not in str(e):
+                        raise
+                _shard_keys.add(shard_key)
+        return shard_key
+
+    @staticmethod
+    def user_filter(user_id, conditions=()):
+        return qmodels.Filter(
+            must=[
+                qmodels.FieldCondition(
+                    key="user_id", match=qmodels.MatchValue(value=user_id)
+                ),
+                *conditions,
+            ]
+        )
@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from dotenv import load_dotenv
+from qdrant_client.http import models as qmodels
+
+load_dotenv()
+
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "256"))
+UPSERT_MAX_IN_FLIGHT = int(os.getenv("UPSERT_MAX_IN_FLIGHT", "4"))
+UPSERT_MAX_RETRIES = int(os.getenv("UPSERT_MAX_RETRIES", "3"))
+UPSERT_RETRY_BACKOFF_SECONDS = float(os.getenv("UPSERT_RETRY_BACKOFF_SECONDS", "0.5"))
+UPSERT_WAIT = os.getenv("UPSERT_WAIT", "false").lower() == "true"
+
+
+# Splits points into batches and keeps up to max_in_flight upserts running.
+# Point ids are deterministic, so a retried batch overwrites rather than
+# duplicates whatever part of it already landed.
+class Bulk_Upserter:
+    def __init__(
+        self,
+        vdb,
+        collection_name="user_docs",
+        batch_size=UPSERT_BATCH_SIZE,
+        max_in_flight=UPSERT_MAX_IN_FLIGHT,
+        wait=UPSERT_WAIT,
+        shard_key=None,
+    ):
+        self.vdb = vdb
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.wait = wait
+        self.shard_key = shard_key
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="qdrant-upsert"
+        )
+        self._buffer: List[qmodels.PointStruct] = []
+        self._in_flight = deque()
+        self._last_batch = None
+        self._started = time.perf_counter()
+        self.points = 0
+        self.batches = 0
+        self.retries = 0
+        self._retries_lock = threading.Lock()
+        self._aborted = threading.Event()
+
+    def add(self, points: List[qmodels.PointStruct]):
+        self._buffer.extend(points)
+        while len(self._buffer) >= self.batch_size:
+            batch = self._buffer[: self.batch_size]
+            del self._buffer[: self.batch_size]
+            self._submit(batch)
+
+    def flush(self) -> dict:
+        try:
+            if self._buffer:
+                self._submit(self._buffer)
+                self._buffer = []
+            while self._in_flight:
+                self._in_flight.popleft().result()
+            if not self.wait and self._last_batch is not None:
+                # updates are applied in order, so waiting on a re-send of the
+                # last batch means every earlier batch is applied as well
+                self._upsert(self._last_batch, wait=True)
+        finally:
+            self._executor.shutdown(wait=True)
+        elapsed = time.perf_counter() - self._started
+        return {
+            "points": self.points,
+            "batches": self.batches,
+            "retries": self.retries,
+            "seconds": round(elapsed, 3),
+            "points_per_second": round(self.points / elapsed, 1) if elapsed else 0,
+        }
+
+    def abort(self):
+        # queued batches are dropped, but running ones are waited for so none
+        # lands after the caller deletes what was written
+        self._aborted.set()
+        self._buffer = []
+        self._in_flight.clear()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _submit(self, batch):
+        # backpressure: block until a slot frees up, surfacing earlier failures
+        while len(self._in_flight) >= self.max_in_flight:
+            self._in_flight.popleft().result()
+        self._in_flight.append(self._executor.submit(self._upsert, batch, self.wait))
+        self._last_batch = batch
+        self.points += len(batch)
+        self.batches += 1
+
+    def _upsert(self, batch, wait):
+        for attempt in range(UPSERT_MAX_RETRIES + 1):
+            try:
+                return self.vdb.upsert(
+                    collection_name=self.collection_name,
+                    points=batch,
+                    wait=wait,
+                    shard_key_selector=self.shard_key,
+                )
+            except Exception:
+                if attempt == UPSERT_MAX_RETRIES:
+                    raise
+                with self._retries_lock:
+                    self.retries += 1
+                # an abort cuts the backoff short instead of retrying
+                if self._aborted.wait(UPSERT_RETRY_BACKOFF_SECONDS * 2**attempt):
+                    raise
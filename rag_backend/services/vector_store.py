@@ -0,0 +1,542 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from qdrant_client.http import models as qmodels
+from rag_backend.services.quantization_service import *
+
+load_dotenv()
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant")
+LOCAL_VECTOR_PATH = os.getenv("LOCAL_VECTOR_PATH", "./local_vectors")
+LOCAL_VECTOR_DTYPE = os.getenv("LOCAL_VECTOR_DTYPE", "float32")
+LOCAL_VECTOR_INITIAL_CAPACITY = 1024
+
+
+# The subset of the QdrantClient API the services rely on. Any backend handed
+# out by vector_database() has to implement it with Qdrant's semantics.
+class Vector_Store(Protocol):
+    def collection_exists(self, collection_name: str) -> bool: ...
+
+    def create_collection(self, collection_name: str, vectors_config, **kwargs): ...
+
+    def get_collection(self, collection_name: str): ...
+
+    def update_collection(self, collection_name: str, **kwargs): ...
+
+    def create_payload_index(
+        self, collection_name: str, field_name: str, field_schema=None, **kwargs
+    ): ...
+
+    def upsert(self, collection_name: str, points, wait: bool = True, **kwargs): ...
+
+    def search(
+        self, collection_name: str, query_vector, query_filter=None, limit=10, **kwargs
+    ) -> List[qmodels.ScoredPoint]: ...
+
+    def scroll(
+        self, collection_name: str, scroll_filter=None, limit=10, offset=None, **kwargs
+    ) -> Tuple[List[qmodels.Record], Optional[Any]]: ...
+
+    def retrieve(self, collection_name: str, ids, **kwargs) -> List[qmodels.Record]: ...
+
+    def count(self, collection_name: str, count_filter=None, exact=True, **kwargs): ...
+
+    def delete(self, collection_name: str, points_selector, wait=True, **kwargs): ...
+
+    def create_shard_key(self, collection_name: str, shard_key, **kwargs): ...
+
+    def close(self): ...
+
+
+def _payload_values(payload: dict, key: str) -> list:
+    value = payload
+    for part in key.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return []
+        value = value[part]
+    return value if isinstance(value, list) else [value]
+
+
+def _top_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def _select_payload(payload: dict, with_payload) -> Optional[dict]:
+    if with_payload is True:
+        return dict(payload)
+    if not with_payload:
+        return None
+    return {key: payload[key] for key in with_payload if key in payload}
+
+
+class _Local_Collection:
+    def __init__(self, path: str, meta: dict):
+        self.path = path
+        self.meta = meta
+        self.dim = meta["dim"]
+        self.dtype = np.dtype(meta["dtype"])
+        self.normalize = meta["distance"] == qmodels.Distance.COSINE.value
+        self._db = sqlite3.connect(
+            os.path.join(path, "payloads.sqlite"), check_same_thread=False
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS points "
+            "(row INTEGER PRIMARY KEY, id TEXT UNIQUE, payload TEXT)"
+        )
+        self.ids: Dict[str, int] = {}
+        self.row_ids: Dict[int, str] = {}
+        self.payloads: Dict[int, dict] = {}
+        self.size = 0
+        for row, point_id, payload in self._db.execute(
+            "SELECT row, id, payload FROM points"
+        ):
+            self.ids[point_id] = row
+            self.row_ids[row] = point_id
+            self.payloads[row] = json.loads(payload)
+            self.size = max(self.size, row + 1)
+        self.size = max(self.size, meta.get("size", 0))
+        self.capacity = max(meta.get("capacity", 0), LOCAL_VECTOR_INITIAL_CAPACITY)
+        self.vectors = self._open_vectors(self.capacity)
+        self.alive = np.zeros(self.capacity, dtype=bool)
+        self.alive[list(self.row_ids)] = True
+        # rows of deleted points are handed to new ones, lowest first, so the
+        # matrix only grows past the most points ever stored at once
+        self.free_rows = np.flatnonzero(~self.alive[: self.size])[::-1].tolist()
+        # keyword inverted index: field -> value -> rows
+        self.index = defaultdict(lambda: defaultdict(set))
+        for field_name in meta.get("indexed_fields", []):
+            self._build_index(field_name)
+        self.quantized: Quantized_Index = None
+        self.set_quantization(meta.get("quantization", "none"))
+
+    def _open_vectors(self, capacity: int) -> np.memmap:
+        vectors_path = os.path.join(self.path, f"vectors.{self.dtype.name}")
+        required = capacity * self.dim * self.dtype.itemsize
+        with open(vectors_path, "ab") as f:
+            if f.tell() < required:
+                f.truncate(required)
+        return np.memmap(
+            vectors_path, dtype=self.dtype, mode="r+", shape=(capacity, self.dim)
+        )
+
+    def _grow(self, needed: int):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self.capacity:
+            return
+        self.vectors.flush()
+        self.vectors = self._open_vectors(capacity)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: self.capacity] = self.alive
+        self.alive = alive
+        self.capacity = capacity
+        if self.quantized is not None:
+            self.quantized.grow(capacity)
+
+    def set_quantization(self, mode: str):
+        self.meta["quantization"] = mode
+        if mode == "none":
+            self.quantized = None
+            return
+        self.quantized = Quantized_Index(mode, self.dim, self.capacity)
+        rows = np.flatnonzero(self.alive[: self.size])
+        vectors = self.vectors[rows].astype(np.float32)
+        self.quantized.fit(vectors)
+        self.quantized.encode(rows, vectors)
+
+    def _build_index(self, field_name: str):
+        field_index = self.index[field_name]
+        field_index.clear()
+        for row, payload in self.payloads.items():
+            for value in _payload_values(payload, field_name):
+                field_index[value].add(row)
+
+    def _index_add(self, row: int, payload: dict):
+        for field_name, field_index in self.index.items():
+            for value in _payload_values(payload, field_name):
+                field_index[value].add(row)
+
+    def _index_remove(self, row: int, payload: dict):
+        for field_name, field_index in self.index.items():
+            for value in _payload_values(payload, field_name):
+                rows = field_index.get(value)
+                if rows is not None:
+                    rows.discard(row)
+                    if not rows:
+                        del field_index[value]
+
+    def add_index(self, field_name: str):
+        if field_name not in self.meta["indexed_fields"]:
+            self.meta["indexed_fields"].append(field_name)
+            self._build_index(field_name)
+
+    def save_meta(self):
+        self.meta.update(size=self.size, capacity=self.capacity)
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(self.meta, f)
+
+    def upsert(self, points: List[qmodels.PointStruct]):
+        new_rows = [p for p in points if str(p.id) not in self.ids]
+        self._grow(self.size + max(0, len(new_rows) - len(self.free_rows)))
+        records = []
+        written = {}
+        for point in points:
+            point_id = str(point.id)
+            row = self.ids.get(point_id)
+            if row is None:
+                if self.free_rows:
+                    row = self.free_rows.pop()
+                else:
+                    row = self.size
+                    self.size += 1
+                self.ids[point_id] = row
+                self.row_ids[row] = point_id
+            else:
+                self._index_remove(row, self.payloads[row])
+            vector = np.asarray(point.vector, dtype=np.float32)
+            if self.normalize:
+                norm = np.linalg.norm(vector)
+                vector = vector / norm if norm else vector
+            self.vectors[row] = vector
+            written[row] = vector
+            self.alive[row] = True
+            payload = dict(point.payload or {})
+            self.payloads[row] = payload
+            self._index_add(row, payload)
+            records.append((row, point_id, json.dumps(payload)))
+        if self.quantized is not None and written:
+            self.quantized.encode(list(written), np.stack(list(written.values())))
+        self._db.executemany(
+            "INSERT OR REPLACE INTO points (row, id, payload) VALUES (?, ?, ?)",
+            records,
+        )
+        self._db.commit()
+        self.vectors.flush()
+        self.save_meta()
+
+    def delete_rows(self, rows):
+        for row in rows:
+            if not self.alive[row]:
+                continue
+            self.alive[row] = False
+            self._index_remove(row, self.payloads.pop(row))
+            del self.ids[self.row_ids.pop(row)]
+            self.free_rows.append(row)
+        self._db.executemany(
+            "DELETE FROM points WHERE row = ?", [(int(row),) for row in rows]
+        )
+        self._db.commit()
+
+    def all_rows(self) -> set:
+        return set(np.flatnonzero(self.alive[: self.size]).tolist())
+
+    def _condition_rows(self, condition) -> set:
+        if isinstance(condition, qmodels.Filter):
+            return self.filter_rows(condition)
+        if isinstance(condition, qmodels.HasIdCondition):
+            return {
+                self.ids[str(point_id)]
+                for point_id in condition.has_id
+                if str(point_id) in self.ids
+            }
+        if isinstance(condition, qmodels.IsEmptyCondition):
+            return {
+                row
+                for row, payload in self.payloads.items()
+                if not any(
+                    value is not None
+                    for value in _payload_values(payload, condition.is_empty.key)
+                )
+            }
+        if isinstance(condition, qmodels.FieldCondition) and condition.match:
+            match = condition.match
+            if isinstance(match, qmodels.MatchValue):
+                wanted = {match.value}
+            elif isinstance(match, qmodels.MatchAny):
+                wanted = set(match.any)
+            elif isinstance(match, qmodels.MatchExcept):
+                excluded = set(match.except_)
+                return {
+                    row
+                    for row, payload in self.payloads.items()
+                    if not excluded.intersection(
+                        _payload_values(payload, condition.key)
+                    )
+                }
+            else:
+                raise NotImplementedError(f"Unsupported match: {type(match)}")
+            field_index = self.index.get(condition.key)
+            if field_index is not None:
+                rows = set()
+                for value in wanted:
+                    rows |= field_index.get(value, set())
+                return rows
+            return {
+                row
+                for row, payload in self.payloads.items()
+                if wanted.intersection(_payload_values(payload, condition.key))
+            }
+        raise NotImplementedError(f"Unsupported condition: {condition!r}")
+
+    def filter_rows(self, query_filter: Optional[qmodels.Filter]) -> set:
+        rows = None
+        if query_filter is None:
+            return self.all_rows()
+        for condition in query_filter.must or []:
+            condition_rows = self._condition_rows(condition)
+            rows = condition_rows if rows is None else rows & condition_rows
+        if query_filter.should:
+            should_rows = set()
+            for condition in query_filter.should:
+                should_rows |= self._condition_rows(condition)
+            rows = should_rows if rows is None else rows & should_rows
+        if rows is None:
+            rows = self.all_rows()
+        for condition in query_filter.must_not or []:
+            rows = rows - self._condition_rows(condition)
+        return rows
+
+    def top_k(self, rows: np.ndarray, query: np.ndarray, limit: int, search_params):
+        quantization = getattr(search_params, "quantization", None)
+        use_quantized = (
+            self.quantized is not None
+            and not getattr(search_params, "exact", False)
+            and not (quantization is not None and quantization.ignore)
+        )
+        if use_quantized:
+            oversampling = getattr(quantization, "oversampling", None) or 1.0
+            rescore = getattr(quantization, "rescore", None)
+            scores = self.quantized.scores(rows, query)
+            if rescore is None or rescore:
+                # rescore an oversampled candidate set with the original vectors
+                k = min(len(rows), max(limit, math.ceil(limit * oversampling)))
+                rows = rows[_top_indices(scores, k)]
+                scores = self.vectors[rows].astype(np.float32) @ query
+        else:
+            # fancy indexing only pages in the candidate rows
+            scores = self.vectors[rows].astype(np.float32) @ query
+        top = _top_indices(scores, min(limit, len(rows)))
+        return rows[top], scores[top]
+
+    def record(self, row: int, with_payload=True, with_vectors=False):
+        return qmodels.Record(
+            id=self.row_ids[row],
+            payload=_select_payload(self.payloads[row], with_payload),
+            vector=(
+                self.vectors[row].astype(np.float32).tolist() if with_vectors else None
+            ),
+        )
+
+    def close(self):
+        self.vectors.flush()
+        self._db.close()
+
+
+# In-process backend: vectors live in a memory-mapped matrix on disk, payloads
+# in a SQLite side table, and keyword payload indexes are kept as in-memory
+# inverted indexes so filtered searches only score matching rows.
+class Local_Vector_Store:
+    def __init__(self, path: str = LOCAL_VECTOR_PATH, dtype: str = LOCAL_VECTOR_DTYPE):
+        self.path = path
+        self.dtype = dtype
+        self._collections: Dict[str, _Local_Collection] = {}
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+
+    def _collection(self, collection_name: str) -> _Local_Collection:
+        collection = self._collections.get(collection_name)
+        if collection is not None:
+            return collection
+        meta_path = os.path.join(self.path, collection_name, "meta.json")
+        if not os.path.exists(meta_path):
+            raise ValueError(f"Collection {collection_name} not found")
+        with open(meta_path) as f:
+            meta = json.load(f)
+        collection = _Local_Collection(os.path.dirname(meta_path), meta)
+        self._collections[collection_name] = collection
+        return collection
+
+    def collection_exists(self, collection_name: str) -> bool:
+        return os.path.exists(os.path.join(self.path, collection_name, "meta.json"))
+
+    def create_collection(self, collection_name: str, vectors_config, **kwargs):
+        with self._lock:
+            if self.collection_exists(collection_name):
+                raise ValueError(f"Collection {collection_name} already exists")
+            distance = qmodels.Distance(vectors_config.distance)
+            if distance not in (qmodels.Distance.COSINE, qmodels.Distance.DOT):
+                raise NotImplementedError(f"Unsupported distance: {distance}")
+            collection_path = os.path.join(self.path, collection_name)
+            os.makedirs(collection_path, exist_ok=True)
+            meta = {
+                "dim": vectors_config.size,
+                "distance": distance.value,
+                "dtype": self.dtype,
+                "indexed_fields": [],
+                "size": 0,
+                "capacity": LOCAL_VECTOR_INITIAL_CAPACITY,
+                "quantization": Quantization_Service.mode_of(
+                    kwargs.get("quantization_config")
+                ),
+            }
+            collection = _Local_Collection(collection_path, meta)
+            collection.save_meta()
+            self._collections[collection_name] = collection
+            return True
+
+    def get_collection(self, collection_name: str):
+        # only the part of Qdrant's CollectionInfo the services read
+        collection = self._collection(collection_name)
+        vectors = qmodels.VectorParams(
+            size=collection.dim, distance=qmodels.Distance(collection.meta["distance"])
+        )
+        return SimpleNamespace(
+            config=SimpleNamespace(params=SimpleNamespace(vectors=vectors))
+        )
+
+    def update_collection(
+        self, collection_name: str, quantization_config=None, **kwargs
+    ):
+        with self._lock:
+            collection = self._collection(collection_name)
+            if quantization_config is not None:
+                collection.set_quantization(
+                    Quantization_Service.mode_of(quantization_config)
+                )
+                collection.save_meta()
+        return True
+
+    def create_payload_index(
+        self, collection_name: str, field_name: str, field_schema=None, **kwargs
+    ):
+        with self._lock:
+            collection = self._collection(collection_name)
+            collection.add_index(field_name)
+            collection.save_meta()
+
+    def upsert(self, collection_name: str, points, wait: bool = True, **kwargs):
+        with self._lock:
+            self._collection(collection_name).upsert(list(points))
+        return qmodels.UpdateResult(
+            operation_id=0, status=qmodels.UpdateStatus.COMPLETED
+        )
+
+    def search(
+        self,
+        collection_name: str,
+        query_vector,
+        query_filter=None,
+        limit=10,
+        with_payload=True,
+        with_vectors=False,
+        search_params=None,
+        **kwargs,
+    ) -> List[qmodels.ScoredPoint]:
+        with self._lock:
+            collection = self._collection(collection_name)
+            rows = np.fromiter(collection.filter_rows(query_filter), dtype=np.int64)
+            if not len(rows) or limit <= 0:
+                return []
+            query = np.asarray(query_vector, dtype=np.float32)
+            if collection.normalize:
+                norm = np.linalg.norm(query)
+                query = query / norm if norm else query
+            rows, scores = collection.top_k(rows, query, limit, search_params)
+            results = []
+            for row, score in zip(rows, scores):
+                record = collection.record(int(row), with_payload, with_vectors)
+                results.append(
+                    qmodels.ScoredPoint(
+                        id=record.id,
+                        version=0,
+                        score=float(score),
+                        payload=record.payload,
+                        vector=record.vector,
+                    )
+                )
+            return results
+
+    def scroll(
+        self,
+        collection_name: str,
+        scroll_filter=None,
+        limit=10,
+        offset=None,
+        with_payload=True,
+        with_vectors=False,
+        **kwargs,
+    ):
+        with self._lock:
+            collection = self._collection(collection_name)
+            rows = sorted(collection.filter_rows(scroll_filter))
+            if offset is not None:
+                start = collection.ids.get(str(offset), 0)
+                rows = [row for row in rows if row >= start]
+            page, rest = rows[:limit], rows[limit:]
+            records = [
+                collection.record(row, with_payload, with_vectors) for row in page
+            ]
+            next_offset = collection.row_ids[rest[0]] if rest else None
+            return records, next_offset
+
+    def retrieve(
+        self,
+        collection_name: str,
+        ids,
+        with_payload=True,
+        with_vectors=False,
+        **kwargs,
+    ):
+        with self._lock:
+            collection = self._collection(collection_name)
+            rows = [
+                collection.ids[str(point_id)]
+                for point_id in ids
+                if str(point_id) in collection.ids
+            ]
+            return [collection.record(row, with_payload, with_vectors) for row in rows]
+
+    def count(self, collection_name: str, count_filter=None, exact=True, **kwargs):
+        with self._lock:
+            collection = self._collection(collection_name)
+            return qmodels.CountResult(count=len(collection.filter_rows(count_filter)))
+
+    def delete(self, collection_name: str, points_selector, wait=True, **kwargs):
+        with self._lock:
+            collection = self._collection(collection_name)
+            if isinstance(points_selector, qmodels.FilterSelector):
+                rows = collection.filter_rows(points_selector.filter)
+            elif isinstance(points_selector, qmodels.Filter):
+                rows = collection.filter_rows(points_selector)
+            else:
+                point_ids = getattr(points_selector, "points", points_selector)
+                rows = {
+                    collection.ids[str(point_id)]
+                    for point_id in point_ids
+                    if str(point_id) in collection.ids
+                }
+            collection.delete_rows(sorted(rows))
+            collection.save_meta()
+        return qmodels.UpdateResult(
+            operation_id=0, status=qmodels.UpdateStatus.COMPLETED
+        )
+
+    def create_shard_key(self, collection_name: str, shard_key, **kwargs):
+        # a single local partition; tenants are still separated by payload
+        return True
+
+    def close(self):
+        with self._lock:
+            for collection in self._collections.values():
+                collection.close()
+            self._collections.clear()
@@ -0,0 +1,20 @@
+from rag_backend.services.cache_service import *
+
+
+def test_answers_without_documents_stay_with_their_user():
+    cache = Answer_Cache()
+    question = [0.6, 0.8, 0.0]
+    cache.store(question, [], [], "user-a", "answer for a")
+    assert cache.lookup(question, [], [], "user-a") == "answer for a"
+    assert cache.lookup(question, [], [], "user-b") is None
+
+
+def test_similar_question_hits_and_file_change_invalidates():
+    cache = Answer_Cache()
+    cache.store([1.0, 0.0, 0.0], ["b.pdf", "a.pdf"], ["2", "1"], "user-a", "cached")
+    # the file set and chunk ids are compared regardless of order
+    key = (["a.pdf", "b.pdf"], ["1", "2"], "user-a")
+    assert cache.lookup([0.99, 0.05, 0.0], *key) == "cached"
+    assert cache.lookup([0.0, 1.0, 0.0], *key) is None
+    cache.invalidate_files(["a.pdf"])
+    assert cache.lookup([1.0, 0.0, 0.0], *key) is None
@@ -0,0 +1,140 @@
+import json
+import os
+import tempfile
+import time
+
+# /ask runs end to end against the same in-process stand-ins the benchmark
+# suite uses. Settings the services read at import time are fixed first.
+_workdir = tempfile.mkdtemp(prefix="rag-test-ask-")
+TEST_JWT_SECRET = "test-secret"
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ["FAKE_LLM_FIRST_TOKEN_MS"] = "1"
+os.environ["FAKE_LLM_TOKEN_MS"] = "0"
+os.environ["SUPABASE_JWT_SECRET"] = TEST_JWT_SECRET
+os.environ["AUTH_STRICT_REMOTE"] = "false"
+os.environ["UPSERT_MAX_IN_FLIGHT"] = "1"
+os.environ.setdefault("JOBS_DB_PATH", os.path.join(_workdir, "jobs.sqlite3"))
+os.environ.setdefault("OCR_CACHE_DIR", os.path.join(_workdir, "ocr_cache"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import pytest  # noqa: E402
+import rag_backend.services.embedding_service as embedding_service  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from jose import jwt  # noqa: E402
+from qdrant_client import QdrantClient  # noqa: E402
+from rag_backend.benchmarks.fakes import *  # noqa: E402
+from rag_backend.main import *  # noqa: E402
+
+TEST_USER_ID = "00000000-0000-0000-0000-0000000a5c01"
+FILE_NAME = "handbook.txt"
+DOCUMENT = (
+    "Expense reports are due on the fifth working day of each month. "
+    "Travel must be booked through the internal portal at least two weeks "
+    "ahead. Laptops are replaced every three years. "
+) * 20
+
+
+def _token() -> str:
+    return jwt.encode(
+        {
+            "sub": TEST_USER_ID,
+            "aud": "authenticated",
+            "role": "authenticated",
+            "exp": int(time.time()) + 3600,
+        },
+        TEST_JWT_SECRET,
+        algorithm="HS256",
+    )
+
+
+def _sse_events(body: str):
+    events = []
+    for frame in body.split("\n\n"):
+        if not frame:
+            continue
+        event_line, data_line = frame.split("\n")
+        assert event_line.startswith("event: ")
+        assert data_line.startswith("data: ")
+        events.append((event_line[len("event: ") :], json.loads(data_line[6:])))
+    return events
+
+
+@pytest.fixture(scope="module")
+def client():
+    embedding_service._engine = Hash_Embedding(EMBEDDING_DIM)
+    db = Fake_Supabase()
+    vdb = QdrantClient(":memory:")
+    bootstrap_vector_schema(vdb)
+    chunks = list(Ingestion_Service.iter_chunks([DOCUMENT]))
+    doc_id = File_Services.create_document(
+        db=db, user_id=TEST_USER_ID, file_name=FILE_NAME, file_size=len(DOCUMENT)
+    )
+    File_Services.store_embeddings(
+        chunks=chunks,
+        embeddings=Embedding_Service.embed_documents(chunks),
+        vdb=vdb,
+        file_name=FILE_NAME,
+        doc_id=doc_id,
+        user_id=TEST_USER_ID,
+        doc_hash=FILE_NAME,
+    )
+    app.dependency_overrides[database] = lambda: db
+    app.dependency_overrides[storage] = lambda: db
+    app.dependency_overrides[vector_database] = lambda: vdb
+    # no lifespan: the warm-up would reach for the real Supabase and Qdrant
+    yield TestClient(app, headers={"Authorization": f"Bearer {_token()}"})
+    app.dependency_overrides.clear()
+
+
+def _ask(client, question, stream):
+    return client.post(
+        "/ask",
+        json={
+            "question": question,
+            "chat_space": "test",
+            "file_names": [FILE_NAME],
+            "stream": stream,
+        },
+    )
+
+
+def test_ask_returns_the_whole_answer(client):
+    response = _ask(client, "when are expense reports due", stream=False)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["success"] is True
+    assert body["data"].startswith("Fake answer based on")
+    assert "Expense reports" in body["data"]
+
+
+def test_ask_streams_tokens_then_done(client):
+    before = LlmService.ttft_stats()["count"]
+    response = _ask(client, "how often are laptops replaced", stream=True)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+
+    events = _sse_events(response.text)
+    names = [name for name, _ in events]
+    assert names[-1] == "done"
+    assert set(names[:-1]) == {"token"}
+    answer = "".join(data["text"] for _, data in events[:-1])
+    assert answer.startswith("Fake answer based on")
+
+    done = events[-1][1]
+    assert set(done) == {"success", "data", "cached", "ttft_ms", "total_ms"}
+    assert done["success"] is True
+    assert done["cached"] is False
+    assert 0 < done["ttft_ms"] <= done["total_ms"]
+    assert LlmService.ttft_stats()["count"] == before + 1
+
+
+def test_streamed_answer_is_stored(client):
+    question = "how far ahead must travel be booked"
+    first = _sse_events(_ask(client, question, stream=True).text)
+    again = _sse_events(_ask(client, question, stream=True).text)
+    assert again[-1][1]["cached"] is True
+    # a cache hit replays the stored answer without a new LLM call
+    assert "".join(data["text"] for _, data in again[:-1]) == "".join(
+        data["text"] for _, data in first[:-1]
+    )
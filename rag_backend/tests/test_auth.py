@@ -0,0 +1,105 @@
+import base64
+import json
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+import rag_backend.services.auth_services as auth_services
+from fastapi import HTTPException
+from jose import jwt
+from rag_backend.benchmarks.fakes import *
+from rag_backend.dependencies import *
+
+SECRET = "test-secret"
+USER_ID = "00000000-0000-0000-0000-0000000a0710"
+
+
+def _token(secret=SECRET, **claims) -> str:
+    claims = {
+        "sub": USER_ID,
+        "aud": "authenticated",
+        "role": "authenticated",
+        "exp": int(time.time()) + 3600,
+        **claims,
+    }
+    return jwt.encode(claims, secret, algorithm="HS256")
+
+
+def _unsigned_rs256_token() -> str:
+    # only the header and claims are read on the remote path
+    def part(value):
+        encoded = base64.urlsafe_b64encode(json.dumps(value).encode("utf-8"))
+        return encoded.rstrip(b"=").decode("ascii")
+
+    header = part({"alg": "RS256", "kid": "rotated", "typ": "JWT"})
+    claims = part({"sub": USER_ID, "exp": int(time.time()) + 3600})
+    return f"{header}.{claims}.{part('signature')}"
+
+
+def _request(token: str):
+    return SimpleNamespace(headers={"Authorization": f"Bearer {token}"})
+
+
+@pytest.fixture(autouse=True)
+def auth_settings(monkeypatch):
+    monkeypatch.setattr(auth_services, "SUPABASE_JWT_SECRET", SECRET)
+    # a JWKS URL is always derived from SUPABASE_URL in deployments
+    monkeypatch.setattr(
+        auth_services, "SUPABASE_JWKS_URL", "https://example.invalid/jwks.json"
+    )
+    monkeypatch.setattr(auth_services, "AUTH_STRICT_REMOTE", False)
+    auth_services._verified_tokens.clear()
+    yield
+    auth_services._verified_tokens.clear()
+
+
+def test_hs256_token_is_verified_locally():
+    db = Fake_Supabase()
+    token = _token(email="a@example.com")
+    user = verify_token(_request(token), db=db)
+    assert user["id"] == USER_ID
+    assert user["email"] == "a@example.com"
+
+
+def test_hs256_token_without_secret_goes_to_supabase(monkeypatch):
+    monkeypatch.setattr(auth_services, "SUPABASE_JWT_SECRET", None)
+    db = Fake_Supabase()
+    token = _token(secret="project-secret-this-service-does-not-have")
+    db.add_user(token, USER_ID)
+    assert Auth_Services.can_verify_locally(token) is False
+    assert verify_token(_request(token), db=db)["id"] == USER_ID
+
+
+def test_unknown_token_without_secret_is_rejected(monkeypatch):
+    monkeypatch.setattr(auth_services, "SUPABASE_JWT_SECRET", None)
+    with pytest.raises(HTTPException) as error:
+        verify_token(_request(_token()), db=Fake_Supabase())
+    assert error.value.status_code == 401
+
+
+def test_forged_hs256_token_is_rejected():
+    token = _token(secret="not-the-project-secret")
+    with pytest.raises(HTTPException) as error:
+        verify_token(_request(token), db=Fake_Supabase())
+    assert error.value.status_code == 401
+
+
+def test_rs256_token_goes_to_supabase_when_jwks_is_unreachable(monkeypatch):
+    def unreachable(force=False):
+        raise httpx.ConnectError("no route to host")
+
+    monkeypatch.setattr(Auth_Services, "_fetch_jwks", staticmethod(unreachable))
+    db = Fake_Supabase()
+    token = _unsigned_rs256_token()
+    db.add_user(token, USER_ID)
+    assert verify_token(_request(token), db=db)["id"] == USER_ID
+
+
+def test_user_details_fills_created_at_from_supabase():
+    db = Fake_Supabase()
+    token = _token()
+    db.add_user(token, USER_ID)
+    db.users[token].created_at = "2024-05-01T10:00:00Z"
+    assert verify_token(_request(token), db=db)["created_at"] is None
+    assert user_details(_request(token), db=db)["created_at"] == "2024-05-01T10:00:00Z"
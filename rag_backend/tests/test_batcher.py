@@ -0,0 +1,47 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+from rag_backend.services.batching_service import *
+
+
+def test_requests_are_batched():
+    calls = []
+
+    def embed_fn(texts):
+        calls.append(list(texts))
+        return np.ones((len(texts), EMBEDDING_DIM), dtype=np.float32)
+
+    async def run():
+        batcher = Embedding_Batcher(embed_fn, max_batch=8, max_wait_ms=20)
+        await batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.embed(f"q{i}") for i in range(5)))
+        finally:
+            await batcher.stop()
+
+    vectors = asyncio.run(run())
+    assert len(vectors) == 5
+    assert calls == [[f"q{i}" for i in range(5)]]
+
+
+def test_stop_fails_the_batch_being_embedded():
+    started, release = threading.Event(), threading.Event()
+
+    def embed_fn(texts):
+        started.set()
+        release.wait(5)
+        return np.ones((len(texts), EMBEDDING_DIM), dtype=np.float32)
+
+    async def run():
+        batcher = Embedding_Batcher(embed_fn, max_batch=8, max_wait_ms=1)
+        await batcher.start()
+        request = asyncio.ensure_future(batcher.embed("in flight"))
+        await asyncio.to_thread(started.wait, 5)
+        await batcher.stop()
+        release.set()
+        with pytest.raises(RuntimeError, match="stopped"):
+            await asyncio.wait_for(request, 1)
+
+    asyncio.run(run())
@@ -0,0 +1,49 @@
+from rag_backend.services.embedding_pool_service import *
+
+
+class _Stub_Worker:
+    def __init__(self, index, startup_error=None):
+        self.index = index
+        self.cores = [index]
+        self.startup_error = startup_error
+        self.closed = False
+
+    def wait_ready(self, timeout):
+        if self.startup_error is not None:
+            raise self.startup_error
+
+    def close(self, graceful=True):
+        self.closed = True
+
+
+def _pool(workers, replacement):
+    pool = Embedding_Pool(core_groups=[worker.cores for worker in workers])
+    pool._workers = list(workers)
+    pool._idle = queue.Queue()
+    pool._spawn = lambda index, cores: replacement
+    return pool
+
+
+def test_restart_replaces_the_failed_worker():
+    dead, other = _Stub_Worker(0), _Stub_Worker(1)
+    replacement = _Stub_Worker(0)
+    pool = _pool([dead, other], replacement)
+    pool._replace(dead)
+    assert dead.closed
+    assert pool._workers == [replacement, other]
+    assert pool._idle.get_nowait() is replacement
+    assert pool.stats()["restarts"] == 1
+    assert pool.error is None
+
+
+def test_restart_config_error_is_reported_not_retried():
+    dead, other = _Stub_Worker(0), _Stub_Worker(1)
+    replacement = _Stub_Worker(0, RuntimeError("model returns 384 dimensions"))
+    pool = _pool([dead, other], replacement)
+    pool._monitor = object()
+    pool._replace(dead)
+    assert dead.closed and replacement.closed
+    assert pool._workers == [other]
+    assert pool._idle.empty()
+    assert "384 dimensions" in pool.error
+    assert not pool.is_warm()
@@ -0,0 +1,35 @@
+import os
+
+import pytest
+from rag_backend.benchmarks.import_time import *
+
+_PACKAGE_PARENT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+
+@pytest.fixture(scope="module")
+def import_report():
+    # best of a few cold interpreters, so one slow disk read is not a failure
+    env = dict(
+        os.environ,
+        LOG_LEVEL="WARNING",
+        PYTHONPATH=os.pathsep.join(
+            filter(None, [_PACKAGE_PARENT, os.environ.get("PYTHONPATH")])
+        ),
+    )
+    return min((measure(env) for _ in range(3)), key=lambda report: report["seconds"])
+
+
+def test_main_imports_within_budget(import_report):
+    elapsed_ms = import_report["seconds"] * 1000
+    slowest = ", ".join(f"{name} {ms:.0f} ms" for ms, name in import_report["slowest"])
+    assert elapsed_ms < IMPORT_BUDGET_MS, (
+        f"import rag_backend.main took {elapsed_ms:.0f} ms, over the "
+        f"{IMPORT_BUDGET_MS} ms budget; slowest imports: {slowest}"
+    )
+
+
+def test_heavy_modules_stay_deferred(import_report):
+    eager = [name for name in DEFERRED_MODULES if name in import_report["modules"]]
+    assert not eager, f"imported at startup but should be lazy: {eager}"
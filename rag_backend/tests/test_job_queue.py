@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+
+from rag_backend.services.job_service import *
+
+
+def _enqueue(queue, file_name="a.txt"):
+    return queue.enqueue("user-1", file_name, "text/plain", "/nonexistent", 1, "h")
+
+
+def _run_one(queue, handler, job_id):
+    async def run():
+        await queue.start(handler=handler, workers=1)
+        try:
+            while queue.get(job_id)["status"] in ("queued", "running"):
+                await asyncio.sleep(0.01)
+        finally:
+            await queue.stop()
+
+    asyncio.run(run())
+    return queue.get(job_id)
+
+
+def test_job_bookkeeping_runs_off_the_event_loop(tmp_path):
+    queue = Job_Queue(str(tmp_path / "jobs.sqlite3"))
+    loop_thread = threading.current_thread()
+    writers = set()
+    for name in ("mark_stage", "finish"):
+        method = getattr(queue, name)
+
+        def record(*args, method=method, **kwargs):
+            writers.add(threading.current_thread())
+            return method(*args, **kwargs)
+
+        setattr(queue, name, record)
+
+    async def handler(job, on_stage):
+        await on_stage("parse")
+        await on_stage("embed_upsert", {"chunks": 3})
+        return {"success": True, "data": "stored"}
+
+    job = _run_one(queue, handler, _enqueue(queue))
+    assert job["status"] == "succeeded"
+    assert list(job["stages"]) == ["parse", "embed_upsert"]
+    assert job["progress"] == {"chunks": 3}
+    assert writers and loop_thread not in writers
+
+
+def test_failed_handler_marks_the_job_failed(tmp_path):
+    queue = Job_Queue(str(tmp_path / "jobs.sqlite3"))
+
+    async def handler(job, on_stage):
+        raise ValueError("unreadable file")
+
+    job = _run_one(queue, handler, _enqueue(queue))
+    assert job["status"] == "failed"
+    assert job["error"] == "unreadable file"
+
+
+def test_prune_drops_only_old_finished_jobs(tmp_path):
+    queue = Job_Queue(str(tmp_path / "jobs.sqlite3"))
+    old_done, old_failed, recent, waiting = (
+        _enqueue(queue, name) for name in ("a", "b", "c", "d")
+    )
+    for _ in range(3):
+        queue.claim()
+    queue.finish(old_done, {"success": True})
+    queue.fail(old_failed, "broken")
+    queue.finish(recent, {"success": True})
+    queue._db.execute(
+        "UPDATE jobs SET finished_at = finished_at - 100 WHERE id IN (?, ?)",
+        (old_done, old_failed),
+    )
+    assert queue.prune(older_than=50) == 2
+    assert queue.get(old_done) is None and queue.get(old_failed) is None
+    assert queue.get(recent)["status"] == "succeeded"
+    assert queue.get(waiting)["status"] == "queued"
+
+
+def test_requeue_leaves_jobs_of_live_processes_alone(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    live, crashed = Job_Queue(path), Job_Queue(path)
+    live_job, crashed_job = _enqueue(live, "a"), _enqueue(live, "b")
+    assert live.claim()["id"] == live_job
+    assert crashed.claim()["id"] == crashed_job
+    # the crashed process stops renewing, so its lease runs out
+    crashed._db.execute(
+        "UPDATE jobs SET lease_until = ? WHERE owner = ?",
+        (time.time() - 1, crashed.owner),
+    )
+    live.renew_leases()
+
+    # a third process starting up must not take over the live one's job
+    Job_Queue(path).requeue_interrupted()
+    assert live.get(live_job)["status"] == "running"
+    requeued = live.get(crashed_job)
+    assert requeued["status"] == "queued"
+    assert requeued["owner"] is None and requeued["attempts"] == 1
@@ -0,0 +1,64 @@
+import uuid
+
+import pytest
+import rag_backend.dependencies as dependencies
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+from rag_backend.benchmarks.fakes import *
+from rag_backend.scripts.reconcile_vectors import *
+
+
+@pytest.fixture
+def vdb(monkeypatch):
+    # the schema flag is process-wide; this client is new
+    monkeypatch.setattr(dependencies, "_schema_ready", False)
+    vdb = QdrantClient(":memory:")
+    bootstrap_vector_schema(vdb)
+    yield vdb
+    vdb.close()
+
+
+def _add_points(vdb, payloads):
+    vdb.upsert(
+        collection_name="user_docs",
+        points=[
+            qmodels.PointStruct(
+                id=str(uuid.uuid4()), vector=[1.0] * EMBEDDING_DIM, payload=payload
+            )
+            for payload in payloads
+        ],
+    )
+
+
+def _file_names(vdb):
+    points, _ = vdb.scroll(collection_name="user_docs", limit=100)
+    return sorted((p.payload["user_id"], p.payload["file_name"]) for p in points)
+
+
+def test_owner_only_points_go_with_the_last_document_of_their_name(vdb):
+    db = Fake_Supabase()
+    kept = File_Services.create_document(db, "alice", "notes.pdf", 1024)
+    File_Services.create_document(db, "alice", "report.pdf", 1024)
+    _add_points(
+        vdb,
+        [
+            # alice still has a notes.pdf, so hers are kept
+            {"user_id": "alice", "file_name": "notes.pdf", "text": "a"},
+            {"user_id": "alice", "file_name": "notes.pdf", "doc_id": kept},
+            # bob has no report.pdf left; alice's does not count
+            {"user_id": "bob", "file_name": "report.pdf", "text": "b"},
+            {"user_id": "bob", "file_name": "report.pdf", "text": "c"},
+            # nor does her notes.pdf for his
+            {"user_id": "bob", "file_name": "notes.pdf", "text": "d"},
+        ],
+    )
+
+    result = reconcile(vdb, db, batch_size=2, dry_run=True, purge_legacy=False)
+    assert result["orphaned_owner_only"] == [
+        ("bob", "notes.pdf"),
+        ("bob", "report.pdf"),
+    ]
+    assert len(_file_names(vdb)) == 5
+
+    reconcile(vdb, db, batch_size=2, dry_run=False, purge_legacy=False)
+    assert _file_names(vdb) == [("alice", "notes.pdf"), ("alice", "notes.pdf")]
@@ -0,0 +1,219 @@
+import uuid
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+from rag_backend.services.vector_store import *
+
+# Every backend vector_database() can hand out has to behave like Qdrant for
+# the calls the services make, so each check runs against both and compares
+# with a brute-force numpy reference.
+DIM = 16
+POINTS = 200
+COLLECTION = "conformance"
+BACKENDS = [
+    ("qdrant", "float32"),
+    ("qdrant", "float16"),
+    ("local", "float32"),
+    ("local", "float16"),
+]
+
+
+def _point_id(n: int) -> str:
+    return str(uuid.UUID(int=n))
+
+
+def _file_filter(*file_names):
+    return qmodels.Filter(
+        must=[
+            qmodels.FieldCondition(
+                key="file_name", match=qmodels.MatchAny(any=list(file_names))
+            )
+        ]
+    )
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(7).normal(size=(POINTS, DIM)).astype(np.float32)
+
+
+@pytest.fixture(params=BACKENDS, ids=["-".join(backend) for backend in BACKENDS])
+def backend(request, tmp_path):
+    kind, dtype = request.param
+    if kind == "qdrant":
+        vdb = QdrantClient(":memory:")
+    else:
+        vdb = Local_Vector_Store(path=str(tmp_path), dtype=dtype)
+    vdb.create_collection(
+        collection_name=COLLECTION,
+        vectors_config=qmodels.VectorParams(
+            size=DIM, distance=qmodels.Distance.COSINE, datatype=dtype
+        ),
+    )
+    vdb.create_payload_index(
+        collection_name=COLLECTION,
+        field_name="file_name",
+        field_schema=qmodels.PayloadSchemaType.KEYWORD,
+    )
+    yield vdb, dtype
+    vdb.close()
+
+
+@pytest.fixture
+def vdb(backend, vectors):
+    vdb, _ = backend
+    vdb.upsert(
+        collection_name=COLLECTION,
+        points=[
+            qmodels.PointStruct(
+                id=_point_id(i),
+                vector=vectors[i].tolist(),
+                payload={"file_name": f"doc-{i % 5}", "n": i},
+            )
+            for i in range(POINTS)
+        ],
+    )
+    return vdb
+
+
+@pytest.fixture
+def score_tolerance(backend):
+    return 1e-2 if backend[1] == "float16" else 1e-5
+
+
+def _expected_hits(vectors, query, rows, limit):
+    scores = _unit(vectors[rows]) @ _unit(query)
+    order = np.argsort(-scores, kind="stable")[:limit]
+    return [int(rows[i]) for i in order], scores[order]
+
+
+def test_upsert_overwrites_existing_ids(vdb, vectors):
+    vdb.upsert(
+        collection_name=COLLECTION,
+        points=[
+            qmodels.PointStruct(
+                id=_point_id(0),
+                vector=vectors[1].tolist(),
+                payload={"file_name": "doc-4", "n": 0},
+            )
+        ],
+    )
+    assert vdb.count(collection_name=COLLECTION, exact=True).count == POINTS
+    (record,) = vdb.retrieve(collection_name=COLLECTION, ids=[_point_id(0)])
+    assert record.payload == {"file_name": "doc-4", "n": 0}
+
+
+def test_search_matches_brute_force(vdb, vectors, score_tolerance):
+    query = np.random.default_rng(11).normal(size=DIM).astype(np.float32)
+    hits = vdb.search(collection_name=COLLECTION, query_vector=query.tolist(), limit=5)
+    ids, scores = _expected_hits(vectors, query, np.arange(POINTS), 5)
+    assert [hit.payload["n"] for hit in hits] == ids
+    assert [hit.score for hit in hits] == pytest.approx(scores, abs=score_tolerance)
+
+
+def test_filtered_search_only_scores_matching_points(vdb, vectors, score_tolerance):
+    query = np.random.default_rng(12).normal(size=DIM).astype(np.float32)
+    hits = vdb.search(
+        collection_name=COLLECTION,
+        query_vector=query.tolist(),
+        query_filter=_file_filter("doc-1", "doc-4"),
+        limit=7,
+    )
+    rows = np.array([i for i in range(POINTS) if i % 5 in (1, 4)])
+    ids, scores = _expected_hits(vectors, query, rows, 7)
+    assert [hit.payload["n"] for hit in hits] == ids
+    assert [hit.score for hit in hits] == pytest.approx(scores, abs=score_tolerance)
+
+
+def test_scroll_pages_through_a_filter(vdb):
+    seen = []
+    offset = None
+    while True:
+        records, offset = vdb.scroll(
+            collection_name=COLLECTION,
+            scroll_filter=_file_filter("doc-2"),
+            limit=15,
+            offset=offset,
+            with_payload=["n"],
+        )
+        seen.extend(record.payload["n"] for record in records)
+        if offset is None:
+            break
+    assert sorted(seen) == [i for i in range(POINTS) if i % 5 == 2]
+    assert len(seen) == len(set(seen))
+
+
+def test_retrieve_skips_unknown_ids(vdb, vectors):
+    records = vdb.retrieve(
+        collection_name=COLLECTION,
+        ids=[_point_id(3), _point_id(9999)],
+        with_vectors=True,
+    )
+    assert [record.payload["n"] for record in records] == [3]
+    assert records[0].vector == pytest.approx(_unit(vectors[3]), abs=1e-3)
+
+
+def test_delete_by_filter_and_by_id(vdb):
+    vdb.delete(
+        collection_name=COLLECTION,
+        points_selector=qmodels.FilterSelector(filter=_file_filter("doc-3")),
+    )
+    vdb.delete(
+        collection_name=COLLECTION,
+        points_selector=qmodels.PointIdsList(points=[_point_id(1)]),
+    )
+    remaining = [i for i in range(POINTS) if i % 5 != 3 and i != 1]
+    assert vdb.count(collection_name=COLLECTION, exact=True).count == len(remaining)
+    assert (
+        vdb.count(
+            collection_name=COLLECTION, count_filter=_file_filter("doc-3"), exact=True
+        ).count
+        == 0
+    )
+    hits = vdb.search(
+        collection_name=COLLECTION, query_vector=[1.0] * DIM, limit=POINTS
+    )
+    assert sorted(hit.payload["n"] for hit in hits) == remaining
+
+
+def test_local_store_reuses_rows_of_deleted_points(tmp_path, vectors):
+    def upsert(vdb, numbers):
+        vdb.upsert(
+            collection_name=COLLECTION,
+            points=[
+                qmodels.PointStruct(
+                    id=_point_id(i),
+                    vector=vectors[i % POINTS].tolist(),
+                    payload={"n": i},
+                )
+                for i in numbers
+            ],
+        )
+
+    vdb = Local_Vector_Store(path=str(tmp_path))
+    vdb.create_collection(
+        collection_name=COLLECTION,
+        vectors_config=qmodels.VectorParams(size=DIM, distance=qmodels.Distance.COSINE),
+    )
+    upsert(vdb, range(100))
+    vdb.delete(
+        collection_name=COLLECTION,
+        points_selector=qmodels.PointIdsList(points=[_point_id(i) for i in range(50)]),
+    )
+    vdb.close()
+
+    # the free rows are found again after a restart
+    vdb = Local_Vector_Store(path=str(tmp_path))
+    upsert(vdb, range(1000, 1060))
+    assert vdb._collection(COLLECTION).size == 110
+    query = vectors[1000 % POINTS].tolist()
+    hits = vdb.search(collection_name=COLLECTION, query_vector=query, limit=1)
+    assert hits[0].payload == {"n": 1000}
+    assert vdb.count(collection_name=COLLECTION, exact=True).count == 110
+    vdb.close()